@@ -0,0 +1,14 @@
+"""
+Benchmarks for parsing, dispatch and end-to-end throughput of scpidev.
+
+Run all benchmarks and write the results as JSON::
+
+    python -m benchmarks -o results.json
+
+Compare two result files, e.g. of two releases::
+
+    python -m benchmarks --compare old.json new.json
+
+On the MicroPython unix port, run ``micropython benchmarks/ubench.py``
+from the repository root.
+"""
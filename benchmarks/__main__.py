@@ -0,0 +1,56 @@
+import argparse
+import json
+import sys
+
+from . import bench_core, bench_network
+from .runner import write_results, compare
+
+parser = argparse.ArgumentParser(
+    prog="python -m benchmarks",
+    description="Run the scpidev benchmarks and print the results as JSON.")
+parser.add_argument(
+    "-o",
+    metavar="OUTPUT",
+    type=str,
+    help="Write the results to OUTPUT instead of stdout.", default=None
+)
+parser.add_argument(
+    "--no-network",
+    help="Skip the loopback TCP and UDP benchmarks.",
+    action="store_true"
+)
+parser.add_argument(
+    "-N",
+    type=int,
+    help="Number of requests for the network benchmarks. Default: 2000",
+    default=2000
+)
+parser.add_argument(
+    "--compare",
+    metavar=("OLD", "NEW"),
+    nargs=2,
+    help="Compare two result files instead of running the benchmarks."
+)
+parser.add_argument(
+    "--stat",
+    type=str,
+    help="The statistic used by --compare. Default: p50", default="p50"
+)
+args = parser.parse_args()
+
+if args.compare:
+    with open(args.compare[0]) as f:
+        old = json.load(f)
+    with open(args.compare[1]) as f:
+        new = json.load(f)
+    compare(old, new, args.stat)
+    sys.exit()
+
+results = bench_core.run()
+if not args.no_network:
+    results.extend(bench_network.run(args.N))
+if args.o is None:
+    write_results(results, sys.stdout)
+else:
+    with open(args.o, "w") as f:
+        write_results(results, f)
@@ -0,0 +1,97 @@
+"""Benchmarks for command parsing, matching and execution. No interfaces
+are involved."""
+from scpidev.command import SCPICommand, SCPICommandList
+from scpidev.parameter import SCPIParameterList
+from scpidev.device import SCPIDevice
+
+from .runner import measure
+
+COMMAND_STRINGS = [
+    "*IDN?",
+    "[SENSe:]VOLTage[:DC]:NULL[:STATe] {ON|OFF}",
+    "MEASure[:VOLTage][:DC]? [{<range>|AUTO|MIN|MAX|DEF} "
+        "[,{<resolution>|MIN|MAX|DEF}]]",
+]
+
+COMMAND_COUNTS = [10, 100, 1000]
+
+
+def action(*args, **kwargs):
+    return "1.234"
+
+
+def create_command_string(i):
+    """Return a command string with a unique first mnemonic for ``i``."""
+    mnemonic = ""
+    for _ in range(3):
+        mnemonic = chr(ord("A") + i % 26) + mnemonic
+        i = i // 26
+    return ("X" + mnemonic + "ure[:VOLTage][:DC]? "
+        "[{<range>|AUTO|MIN|MAX|DEF}[,{<resolution>|MIN|MAX|DEF}]]")
+
+
+def create_command_list(n, lazy=False):
+    command_list = SCPICommandList()
+    for i in range(n):
+        command_list.append(
+            SCPICommand(create_command_string(i), action, lazy=lazy))
+    return command_list
+
+
+def bench_construction():
+    results = list()
+    for cmd_string in COMMAND_STRINGS:
+        results.append(measure("command_construction",
+            lambda: SCPICommand(cmd_string, action),
+            number=200, command=cmd_string))
+        results.append(measure("command_construction_lazy",
+            lambda: SCPICommand(cmd_string, action, lazy=True),
+            number=200, command=cmd_string))
+    return results
+
+
+def bench_get_command():
+    results = list()
+    for n in COMMAND_COUNTS:
+        command_list = create_command_list(n)
+        # The last registered command is the worst case for a linear search.
+        cmd_string = create_command_string(n - 1).split(":")[0] + ":VOLT? 10"
+        results.append(measure("get_command_hit",
+            lambda: command_list.get_command(cmd_string),
+            number=200, commands=n))
+        results.append(measure("get_command_miss",
+            lambda: command_list.get_command("NOPE:VOLT? 10"),
+            number=200, commands=n))
+    return results
+
+
+def bench_parameters():
+    parameter_list = SCPIParameterList()
+    parameter_list.init(
+        "[{<range>|AUTO|MIN|MAX|DEF}[,{<resolution>|MIN|MAX|DEF}]]")
+    results = list()
+    for test_string in ["10,MAX", "AUTO", "1e-3,1e-6", "XYZ"]:
+        results.append(measure("parameter_validation",
+            lambda: test_string in parameter_list, command=test_string))
+    return results
+
+
+def bench_execute():
+    results = list()
+    for n in COMMAND_COUNTS:
+        dev = SCPIDevice()
+        dev.add_command("*IDN?", action)
+        for i in range(n - 1):
+            dev.add_command(create_command_string(i), action)
+        results.append(measure("device_execute",
+            lambda: dev.execute("*IDN?"), commands=n))
+    return results
+
+
+def run():
+    results = list()
+    results.extend(bench_construction())
+    results.extend(bench_get_command())
+    results.extend(bench_parameters())
+    results.extend(bench_execute())
+    return results
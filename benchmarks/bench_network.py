@@ -0,0 +1,87 @@
+"""End-to-end benchmarks. A threaded ``SCPIDevice`` is started with a TCP
+and an UDP interface on the loopback interface. A client sends queries and
+waits for each response."""
+import socket
+import time
+
+from scpidev.device import SCPIDevice
+
+from .runner import create_result
+
+LOCALHOST = "127.0.0.1"
+QUERY = b"*IDN?\n"
+
+
+def find_free_port(type=socket.SOCK_STREAM):
+    sock = socket.socket(socket.AF_INET, type)
+    sock.bind((LOCALHOST, 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def idn(*args, **kwargs):
+    return "scpidev,benchmark,0,0"
+
+
+def recv_line(sock, buffer_size=1024):
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = sock.recv(buffer_size)
+        if not chunk:
+            raise ConnectionError("Connection closed by device.")
+        data = data + chunk
+    return data
+
+
+def request_response(name, protocol, send, recv, number):
+    """Send ``number`` queries and return the result with the latencies
+    in microseconds and the throughput in requests per second."""
+    samples = list()
+    t_start = time.perf_counter()
+    for _ in range(number):
+        t_request = time.perf_counter()
+        send(QUERY)
+        recv()
+        samples.append((time.perf_counter() - t_request) * 1e6)
+    duration = time.perf_counter() - t_start
+    return create_result(name, samples, protocol=protocol,
+        throughput=number / duration)
+
+
+def bench_tcp(port, number):
+    sock = socket.create_connection((LOCALHOST, port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.settimeout(5)
+    try:
+        return request_response("loopback_latency", "tcp", sock.sendall,
+            lambda: recv_line(sock), number)
+    finally:
+        sock.close()
+
+
+def bench_udp(port, number):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(5)
+    addr = (LOCALHOST, port)
+    try:
+        return request_response("loopback_latency", "udp",
+            lambda data: sock.sendto(data, addr),
+            lambda: sock.recvfrom(1024), number)
+    finally:
+        sock.close()
+
+
+def run(number=2000):
+    port_tcp = find_free_port(socket.SOCK_STREAM)
+    port_udp = find_free_port(socket.SOCK_DGRAM)
+    dev = SCPIDevice()
+    dev.add_command("*IDN?", idn)
+    dev.create_interface("tcp", ip=LOCALHOST, port=port_tcp)
+    dev.create_interface("udp", ip=LOCALHOST, port=port_udp)
+    dev.start()
+    try:
+        results = [bench_tcp(port_tcp, number), bench_udp(port_udp, number)]
+    finally:
+        dev.stop(timeout=5)
+    return results
@@ -0,0 +1,318 @@
+"""
+Load generator for a running SCPI device. It drives ``N`` concurrent TCP
+connections from a single ``selectors`` loop. Each connection keeps up to
+``depth`` queries in flight (pipelining). The commands are drawn from a
+weighted command mix, e.g. ``"*IDN?=3,MEASure:VOLTage?=1,*RST=1"``. Only
+queries, i.e. commands whose header ends with ``?``, are answered by the
+device. Commands without a response are sent along with the queries and
+are not timed.
+
+Throughput and latency percentiles are written in the result format of the
+benchmarks. Run against a device which was started with ``--server`` in
+another process, or let the load generator spawn it::
+
+    python -m benchmarks.loadgen --spawn -c 8 -d 4 -t 5 -o load.json
+    python -m benchmarks.loadgen --server --port 5025
+    python -m benchmarks.loadgen --port 5025 -c 8 -d 4 -n 100000
+"""
+import argparse
+import random
+import selectors
+import socket
+import subprocess
+import sys
+import time
+from collections import deque
+
+from .runner import create_result, write_results
+
+LOCALHOST = "127.0.0.1"
+MIX_DEFAULT = "*IDN?"
+
+
+def parse_mix(mix_string):
+    """Return a list of ``(command, weight, is_query)`` tuples from a comma
+    separated list of ``command[=weight]`` entries. ``command`` is ``bytes``
+    terminated by a newline."""
+    mix = list()
+    for entry in mix_string.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        command, _, weight = entry.partition("=")
+        command = command.strip()
+        weight = float(weight) if weight else 1.
+        is_query = command.split(" ")[0].endswith("?")
+        mix.append(((command + "\n").encode("utf8"), weight, is_query))
+    if not any(is_query for _, _, is_query in mix):
+        raise ValueError("The command mix must contain at least one query.")
+    return mix
+
+
+class Connection(object):
+    """A connection with its pending output and the send times of the
+    queries in flight."""
+    __slots__ = ("sock", "out", "inflight", "buffer", "events")
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.out = bytearray()
+        self.inflight = deque()
+        self.buffer = b""
+        self.events = selectors.EVENT_READ
+
+
+def run_load(addr, connections=1, depth=1, mix=None, duration=None,
+        requests=None, seed=0, timeout=5.):
+    """Put load on the device at ``addr``. The run ends after ``duration``
+    seconds or after ``requests`` queries were sent, whichever comes first.
+    Return a benchmark result with the query latencies in microseconds and
+    the throughput in responses per second."""
+    if mix is None:
+        mix = parse_mix(MIX_DEFAULT)
+    if duration is None and requests is None:
+        raise ValueError("Either duration or requests must be given.")
+    rng = random.Random(seed)
+    commands = [command for command, _, _ in mix]
+    weights = [weight for _, weight, _ in mix]
+    queries = set(command for command, _, is_query in mix if is_query)
+
+    selector = selectors.DefaultSelector()
+    conns = list()
+    for _ in range(connections):
+        sock = socket.create_connection(addr, timeout=timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setblocking(False)
+        conn = Connection(sock)
+        conns.append(conn)
+        selector.register(sock, conn.events, conn)
+
+    samples = list()
+    sent = 0
+    sent_other = 0
+    errors = 0
+    t_start = time.perf_counter()
+    t_end = None
+    if duration is not None:
+        t_end = t_start + duration
+
+    def fill(conn, now):
+        nonlocal sent, sent_other
+        while len(conn.inflight) < depth:
+            if requests is not None and sent >= requests:
+                return
+            if t_end is not None and now >= t_end:
+                return
+            command = rng.choices(commands, weights)[0]
+            conn.out += command
+            if command in queries:
+                conn.inflight.append(now)
+                sent += 1
+            else:
+                sent_other += 1
+
+    def update(conn):
+        events = selectors.EVENT_READ
+        if conn.out:
+            events |= selectors.EVENT_WRITE
+        if events != conn.events:
+            conn.events = events
+            selector.modify(conn.sock, events, conn)
+
+    now = time.perf_counter()
+    for conn in conns:
+        fill(conn, now)
+        update(conn)
+    t_last = now
+    try:
+        while any(conn.inflight or conn.out for conn in conns):
+            ready = selector.select(timeout)
+            now = time.perf_counter()
+            if not ready:
+                if now - t_last > timeout:
+                    errors += sum(len(conn.inflight) for conn in conns)
+                    break
+                continue
+            t_last = now
+            for key, events in ready:
+                conn = key.data
+                if events & selectors.EVENT_WRITE and conn.out:
+                    n = conn.sock.send(conn.out)
+                    del conn.out[:n]
+                if events & selectors.EVENT_READ:
+                    data = conn.sock.recv(65536)
+                    if not data:
+                        raise EOFError("Connection closed by the device.")
+                    lines = (conn.buffer + data).split(b"\n")
+                    conn.buffer = lines.pop()
+                    for _ in lines:
+                        if conn.inflight:
+                            samples.append((now - conn.inflight.popleft())
+                                * 1e6)
+                        else:
+                            errors += 1
+                    fill(conn, now)
+                update(conn)
+    finally:
+        for conn in conns:
+            selector.unregister(conn.sock)
+            conn.sock.close()
+        selector.close()
+    elapsed = time.perf_counter() - t_start
+    if not samples:
+        raise RuntimeError("No responses received.")
+    return create_result("loadgen_latency", samples, connections=connections,
+        depth=depth, mix=",".join(
+            "{}={:g}".format(c.decode("utf8").strip(), w)
+            for c, w, _ in mix),
+        throughput=len(samples) / elapsed, duration=elapsed,
+        requests=sent, other_commands=sent_other, errors=errors)
+
+
+def serve(port, mix):
+    """Run a device on localhost which answers the queries of ``mix``."""
+    from scpidev.device import SCPIDevice
+    dev = SCPIDevice()
+    for command, _, is_query in mix:
+        header = command.decode("utf8").split(" ")[0].strip()
+        if is_query:
+            dev.add_command(header, lambda *args, **kwargs: "1.0")
+        else:
+            dev.add_command(header + " [<value>]",
+                lambda *args, **kwargs: None)
+    dev.create_interface("tcp", ip=LOCALHOST, port=port,
+        max_connections=1024)
+    dev.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        dev.stop()
+
+
+def find_free_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind((LOCALHOST, 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def spawn_server(port, mix_string, timeout=10.):
+    """Start ``serve()`` in a subprocess and wait until it accepts
+    connections. Return the ``Popen`` object."""
+    process = subprocess.Popen([sys.executable, "-m", "benchmarks.loadgen",
+        "--server", "--port", str(port), "--mix", mix_string])
+    t_end = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection((LOCALHOST, port), timeout=1).close()
+            return process
+        except OSError:
+            if time.monotonic() > t_end or process.poll() is not None:
+                process.kill()
+                raise RuntimeError("The device did not start.")
+            time.sleep(0.05)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.loadgen",
+        description="Put load on a SCPI device over TCP and report "
+        "throughput and latency as JSON.")
+    parser.add_argument(
+        "--host",
+        type=str,
+        help="The address of the device. Default: {}".format(LOCALHOST),
+        default=LOCALHOST
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        help="The TCP port of the device. Default: 5025", default=5025
+    )
+    parser.add_argument(
+        "-c",
+        metavar="CONNECTIONS",
+        type=int,
+        help="Number of concurrent connections. Default: 1", default=1
+    )
+    parser.add_argument(
+        "-d",
+        metavar="DEPTH",
+        type=int,
+        help="Queries in flight per connection. Default: 1", default=1
+    )
+    parser.add_argument(
+        "-t",
+        metavar="SECONDS",
+        type=float,
+        help="Duration of the run. Default: 5", default=None
+    )
+    parser.add_argument(
+        "-n",
+        metavar="REQUESTS",
+        type=int,
+        help="Total number of queries. Overrides the default duration.",
+        default=None
+    )
+    parser.add_argument(
+        "--mix",
+        type=str,
+        help="Weighted command mix, e.g. '*IDN?=3,MEAS?=1'. Default: {}"
+        .format(MIX_DEFAULT), default=MIX_DEFAULT
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="Seed of the command selection. Default: 0", default=0
+    )
+    parser.add_argument(
+        "--server",
+        help="Run a device which answers the command mix on --port.",
+        action="store_true"
+    )
+    parser.add_argument(
+        "--spawn",
+        help="Start a device in a subprocess on a free port and put load on "
+        "it.",
+        action="store_true"
+    )
+    parser.add_argument(
+        "-o",
+        metavar="OUTPUT",
+        type=str,
+        help="Write the results to OUTPUT instead of stdout.", default=None
+    )
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix)
+
+    if args.server:
+        serve(args.port, mix)
+        return
+    duration = args.t
+    if duration is None and args.n is None:
+        duration = 5.
+    process = None
+    host, port = args.host, args.port
+    if args.spawn:
+        host, port = LOCALHOST, find_free_port()
+        process = spawn_server(port, args.mix)
+    try:
+        result = run_load((host, port), args.c, args.d, mix, duration,
+            args.n, args.seed)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    if args.o is None:
+        write_results([result], sys.stdout)
+    else:
+        with open(args.o, "w") as f:
+            write_results([result], f)
+
+
+if __name__ == "__main__":
+    main()
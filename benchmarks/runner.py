@@ -0,0 +1,90 @@
+"""Timing helpers and the result format of the benchmarks."""
+import json
+import platform
+import sys
+import time
+
+import scpidev
+
+
+def percentile(sorted_samples, p):
+    """Return the ``p``-th percentile (0..100) of ``sorted_samples``."""
+    if not sorted_samples:
+        return None
+    i = int(round((len(sorted_samples) - 1) * p / 100.))
+    return sorted_samples[i]
+
+
+def create_result(name, samples, unit="us", **params):
+    """Return the result dictionary of a benchmark. ``samples`` are the
+    measured times in ``unit``. Additional ``params`` describe the
+    benchmark, e.g. the number of registered commands."""
+    samples = sorted(samples)
+    result = {
+        "name": name,
+        "unit": unit,
+        "samples": len(samples),
+        "min": samples[0],
+        "mean": sum(samples) / len(samples),
+        "p50": percentile(samples, 50),
+        "p90": percentile(samples, 90),
+        "p99": percentile(samples, 99),
+        "p999": percentile(samples, 99.9),
+        "max": samples[-1],
+    }
+    result.update(params)
+    return result
+
+
+def measure(name, fn, number=1000, repeat=5, **params):
+    """Call ``fn`` ``number`` times, ``repeat`` times. Each sample is the
+    mean time per call in microseconds."""
+    samples = list()
+    for _ in range(repeat):
+        t_start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        t_end = time.perf_counter()
+        samples.append((t_end - t_start) * 1e6 / number)
+    return create_result(name, samples, number=number, **params)
+
+
+def get_meta():
+    return {
+        "scpidev_version": scpidev.__version__,
+        "implementation": platform.python_implementation(),
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+    }
+
+
+def write_results(results, f):
+    json.dump({"meta": get_meta(), "results": results}, f, indent=2,
+        sort_keys=True)
+    f.write("\n")
+
+
+def get_key(result):
+    """Return a key which identifies a benchmark independent of the
+    measured values."""
+    params = sorted((k, v) for k, v in result.items()
+        if k in ("commands", "protocol", "command"))
+    return (("name", result["name"]),) + tuple(params)
+
+
+def compare(old, new, stat="p50", f=sys.stdout):
+    """Print the ratio ``new / old`` of ``stat`` for each benchmark which is
+    contained in both result dictionaries."""
+    old_results = dict((get_key(r), r) for r in old["results"])
+    f.write("{:<50} {:>12} {:>12} {:>8}\n".format(
+        "benchmark", "old " + stat, "new " + stat, "ratio"))
+    for result in new["results"]:
+        key = get_key(result)
+        if key not in old_results:
+            continue
+        old_value = old_results[key][stat]
+        new_value = result[stat]
+        label = " ".join(str(v) for _, v in key)[:50]
+        f.write("{:<50} {:>12.2f} {:>12.2f} {:>8.2f}\n".format(
+            label, old_value, new_value, new_value / old_value))
@@ -0,0 +1,97 @@
+"""
+Benchmarks for the MicroPython unix port (and CPython). Only parsing,
+matching and execution are measured, using ``scpidev.udevice``. The
+results are printed as JSON in the same format as ``python -m benchmarks``.
+
+Usage (from the repository root)::
+
+    micropython benchmarks/ubench.py > results.json
+"""
+import sys
+try:
+    import utime as time
+    ticks_us = time.ticks_us
+    ticks_diff = time.ticks_diff
+except ImportError:
+    import time
+    def ticks_us():
+        return int(time.perf_counter() * 1e6)
+    def ticks_diff(a, b):
+        return a - b
+try:
+    import ujson as json
+except ImportError:
+    import json
+
+sys.path.insert(0, ".")
+import scpidev
+from scpidev.command import SCPICommand, SCPICommandList
+from scpidev.udevice import SCPIDevice
+
+COMMAND_STRING = ("MEASure[:VOLTage][:DC]? [{<range>|AUTO|MIN|MAX|DEF}"
+    "[,{<resolution>|MIN|MAX|DEF}]]")
+
+
+def action(*args, **kwargs):
+    return "1.234"
+
+
+def create_command_string(i):
+    mnemonic = ""
+    for _ in range(3):
+        mnemonic = chr(ord("A") + i % 26) + mnemonic
+        i = i // 26
+    return "X" + mnemonic + ":VOLTage? [{<range>|AUTO|MIN|MAX|DEF}]"
+
+
+def measure(name, fn, number=100, repeat=5, **params):
+    samples = list()
+    for _ in range(repeat):
+        t_start = ticks_us()
+        for _ in range(number):
+            fn()
+        samples.append(ticks_diff(ticks_us(), t_start) / number)
+    samples.sort()
+    result = {
+        "name": name,
+        "unit": "us",
+        "samples": len(samples),
+        "min": samples[0],
+        "mean": sum(samples) / len(samples),
+        "p50": samples[len(samples) // 2],
+        "max": samples[-1],
+    }
+    result.update(params)
+    return result
+
+
+def main():
+    results = list()
+    results.append(measure("command_construction",
+        lambda: SCPICommand(COMMAND_STRING, action), command=COMMAND_STRING))
+    results.append(measure("command_construction_lazy",
+        lambda: SCPICommand(COMMAND_STRING, action, lazy=True),
+        command=COMMAND_STRING))
+    for n in (10, 100):
+        command_list = SCPICommandList()
+        for i in range(n):
+            command_list.append(
+                SCPICommand(create_command_string(i), action))
+        cmd_string = create_command_string(n - 1).split(":")[0] + ":VOLT? 10"
+        results.append(measure("get_command_hit",
+            lambda: command_list.get_command(cmd_string), commands=n))
+        dev = SCPIDevice()
+        dev.add_command("*IDN?", action)
+        for i in range(n - 1):
+            dev.add_command(create_command_string(i), action)
+        results.append(measure("device_execute",
+            lambda: dev.execute("*IDN?"), commands=n))
+    meta = {
+        "scpidev_version": scpidev.__version__,
+        "implementation": sys.implementation.name,
+        "platform": sys.platform,
+    }
+    print(json.dumps({"meta": meta, "results": results}))
+
+
+main()
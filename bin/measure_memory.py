@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Measure the memory footprint of SCPI commands. Runs on CPython (using
+``tracemalloc``) and on MicroPython (using ``gc.mem_alloc()``).
+
+Usage: python bin/measure_memory.py [N]
+"""
+import gc
+import sys
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from scpidev.command import SCPICommand, SCPICommandList
+
+COMMAND_STRINGS = [
+    "*IDN?",
+    "MEASure:TEMPerature?",
+    "[SENSe:]VOLTage[:DC]:NULL[:STATe] {ON|OFF}",
+    "MEASure[:VOLTage][:DC]? [{<range>|AUTO|MIN|MAX|DEF} "
+        "[,{<resolution>|MIN|MAX|DEF}]]",
+]
+
+
+def action(*args, **kwargs):
+    pass
+
+
+def allocated():
+    gc.collect()
+    if tracemalloc is not None:
+        return tracemalloc.get_traced_memory()[0]
+    return gc.mem_alloc()
+
+
+def unique_prefix(i):
+    """Return a unique mnemonic for ``i``, e.g. ``XAB:``. Equal mnemonics
+    are shared between commands, so every command gets its own one."""
+    prefix = ""
+    for _ in range(3):
+        prefix = chr(ord("A") + i % 26) + prefix
+        i = i // 26
+    return "X" + prefix + ":"
+
+
+def measure(cmd_string, n):
+    """Return the average amount of bytes allocated by one command."""
+    cmd_strings = [unique_prefix(i) + cmd_string.lstrip("[*")
+        for i in range(n)]
+    command_list = SCPICommandList()
+    start = allocated()
+    for cmd_string in cmd_strings:
+        command_list.append(SCPICommand(cmd_string, action))
+    return (allocated() - start) // n
+
+
+def main():
+    n = 100
+    if len(sys.argv) > 1:
+        n = int(sys.argv[1])
+    if tracemalloc is not None:
+        tracemalloc.start()
+    # Warm up the shared caches, so that they are not accounted to the first
+    # command.
+    measure(COMMAND_STRINGS[0], n)
+    for cmd_string in COMMAND_STRINGS:
+        print("{:>6} bytes  {}".format(measure(cmd_string, n), cmd_string))
+
+
+if __name__ == "__main__":
+    main()
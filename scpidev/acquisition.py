@@ -0,0 +1,142 @@
+"""
+Trigger and acquisition model of SCPI (``INITiate``, ``TRIGger``,
+``ABORt``, ``FETCh?``), see ``SCPIDevice.add_acquisition()``.
+
+``INITiate`` starts a background thread, which waits for the trigger and
+then calls the ``sample`` function of the application ``count`` times with
+``interval`` seconds in between. The samples are stored in a preallocated
+``array``, which is used as a ring buffer. With ``continuous`` set, the
+thread waits for the next trigger after ``count`` samples and overwrites
+the oldest samples when the buffer is full.
+
+``fetch()`` returns the samples as ``memoryview`` slices of the ring
+buffer, so they are sent as a binary block without copying. Consequently,
+the samples of a continuous acquisition which are overwritten while a
+response is still being sent appear in that response.
+"""
+import threading
+from array import array
+
+from . import errors
+
+SOURCE_IMMEDIATE = "IMMediate"
+SOURCE_BUS = "BUS"
+
+STATE_IDLE = 0
+STATE_WAITING = 1
+STATE_ACQUIRING = 2
+
+
+class SCPIAcquisition(object):
+    """Acquire samples of ``sample()`` into a ring buffer of ``size``
+    samples of the ``array`` type ``typecode``."""
+    def __init__(self, sample, size=1024, typecode="d"):
+        self._sample = sample
+        self._size = size
+        self._buffer = array(typecode, [0]) * size
+        # Number of samples written since the acquisition was initiated.
+        self._written = 0
+        self._state = STATE_IDLE
+        self._trigger = threading.Event()
+        self._abort = threading.Event()
+        self._thread = None
+        self.count = size
+        self.interval = 0.
+        self.continuous = False
+        self.trigger_source = SOURCE_IMMEDIATE
+
+    def get_state(self):
+        return self._state
+
+    def get_size(self):
+        return self._size
+
+    def get_points(self):
+        """Return the number of samples in the buffer."""
+        return min(self._written, self._size)
+
+    def initiate(self):
+        """Clear the buffer and start the acquisition. Raise a
+        ``SCPIError`` if it is already running."""
+        if self._thread is not None and self._thread.is_alive():
+            raise errors.SCPIError(errors.ERR_INIT_IGNORED)
+        self._written = 0
+        self._abort.clear()
+        self._trigger.clear()
+        self._state = STATE_WAITING
+        self._thread = threading.Thread(target=self._run,
+            name="SCPIAcquisition")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def trigger(self):
+        """Bus trigger (``*TRG``). Raise a ``SCPIError`` if the acquisition
+        does not wait for a bus trigger."""
+        if self._state != STATE_WAITING \
+                or self.trigger_source != SOURCE_BUS:
+            raise errors.SCPIError(errors.ERR_TRIGGER_IGNORED)
+        self._trigger.set()
+
+    def abort(self, timeout=1.):
+        """Stop the acquisition. The samples stay in the buffer. Return
+        ``False`` if the acquisition thread did not stop within
+        ``timeout`` seconds, e.g. because ``sample()`` blocks."""
+        self._abort.set()
+        self._trigger.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+            if thread.is_alive():
+                return False
+        self._state = STATE_IDLE
+        return True
+
+    def wait(self, timeout=None):
+        """Wait until the acquisition has finished. Return ``False`` on
+        timeout."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    def _run(self):
+        buffer = self._buffer
+        size = self._size
+        sample = self._sample
+        abort = self._abort
+        try:
+            while not abort.is_set():
+                if self.trigger_source == SOURCE_BUS:
+                    self._trigger.wait()
+                    self._trigger.clear()
+                    if abort.is_set():
+                        break
+                self._state = STATE_ACQUIRING
+                interval = self.interval
+                for _ in range(self.count):
+                    # Store the sample first, so readers never see an
+                    # incomplete one.
+                    buffer[self._written % size] = sample()
+                    self._written += 1
+                    if interval > 0:
+                        if abort.wait(interval):
+                            break
+                    elif abort.is_set():
+                        break
+                if not self.continuous:
+                    break
+                self._state = STATE_WAITING
+        finally:
+            self._state = STATE_IDLE
+
+    def fetch(self):
+        """Return the samples from the oldest to the newest as a tuple of at
+        most two ``memoryview`` slices of the ring buffer."""
+        written = self._written
+        size = self._size
+        view = memoryview(self._buffer)
+        if written <= size:
+            return (view[:written],)
+        start = written % size
+        return (view[start:], view[:start])
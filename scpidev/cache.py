@@ -0,0 +1,139 @@
+"""
+Response cache for queries whose response only changes when a setting of
+the device changes, e.g. ``*IDN?`` or read-backs of configuration values.
+
+Caching is opt-in per command, see ``SCPIDevice.add_command(cache=...)``.
+The cache is keyed by the sanitized program message, so queries with
+different parameters are cached separately. A cached response is returned
+by ``SCPIDevice.execute()`` before the command is matched, i.e. neither
+matching nor the action runs.
+
+An entry is dropped when
+
+- its time to live has elapsed,
+- a command which shares one of its tags was executed,
+- ``invalidate()`` is called, e.g. by the application when the hardware
+  state changed by other means than SCPI.
+"""
+try:
+    import utime as time
+except ImportError:
+    import time
+
+try:
+    _clock = time.monotonic
+except AttributeError:
+    _clock = time.time
+
+
+class SCPIResponseCache(object):
+    """Holds at most ``max_entries`` responses. When it is full, the oldest
+    entry is dropped."""
+    def __init__(self, max_entries=256):
+        self._max_entries = max_entries
+        # Caching policy per command: (ttl, tags)
+        self._policies = dict()
+        # Tags which are invalidated by the execution of a command.
+        self._invalidates = dict()
+        # Cache entries: command string -> (response, expiry time, tags,
+        # command)
+        self._entries = dict()
+        self._tags = dict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def set_policy(self, cmd, ttl=None, tags=()):
+        """Cache the responses of ``cmd`` for ``ttl`` seconds. With ``ttl``
+        of ``None``, a response is cached until it is invalidated."""
+        self._policies[cmd] = (ttl, tuple(tags))
+
+    def set_invalidates(self, cmd, tags):
+        """Drop the cached responses with one of the ``tags`` whenever
+        ``cmd`` was executed."""
+        self._invalidates[cmd] = tuple(tags)
+
+    def lookup(self, command_string):
+        """Return ``(cmd, response)`` for the cached response of
+        ``command_string``. ``None`` if there is no valid entry."""
+        entry = self._entries.get(command_string)
+        if entry is None:
+            return None
+        if entry[1] is not None and _clock() >= entry[1]:
+            self._remove(command_string)
+            return None
+        self.hits += 1
+        return (entry[3], entry[0])
+
+    def get(self, command_string):
+        """Return the cached response of ``command_string``. ``None`` if
+        there is no valid entry."""
+        entry = self.lookup(command_string)
+        if entry is None:
+            return None
+        return entry[1]
+
+    def put(self, cmd, command_string, response):
+        """Store ``response`` if ``cmd`` is cached. Invalidate the tags of
+        ``cmd`` if it is a setter."""
+        tags = self._invalidates.get(cmd)
+        if tags:
+            self.invalidate(tags)
+        policy = self._policies.get(cmd)
+        if policy is None:
+            return
+        self.misses += 1
+        if response is None:
+            return
+        ttl, tags = policy
+        if command_string not in self._entries \
+                and len(self._entries) >= self._max_entries:
+            self._remove(next(iter(self._entries)))
+        expires = None
+        if ttl is not None:
+            expires = _clock() + ttl
+        self._entries[command_string] = (response, expires, tags, cmd)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(command_string)
+
+    def _remove(self, command_string):
+        entry = self._entries.pop(command_string, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(command_string)
+
+    def invalidate(self, tags=None):
+        """Drop the entries with one of the ``tags``. All entries if
+        ``tags`` is ``None``."""
+        if tags is None:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._tags.clear()
+            return
+        if isinstance(tags, str):
+            tags = (tags,)
+        for tag in tags:
+            for command_string in self._tags.pop(tag, ()):
+                if command_string in self._entries:
+                    self.invalidations += 1
+                    self._remove(command_string)
+
+    def get_hit_rate(self):
+        """Return the fraction of the lookups of cached commands which were
+        served from the cache. ``None`` if there were no lookups."""
+        lookups = self.hits + self.misses
+        if not lookups:
+            return None
+        return self.hits / lookups
+
+    def get_summary(self):
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": self.get_hit_rate(),
+        }
@@ -0,0 +1,139 @@
+"""
+Channel lists (SCPI-99, chapter 8.3.2), e.g. ``(@1,3,5:8)`` or, for
+multi-dimensional channels like slot and channel, ``(@1!1:1!8,2!1)``.
+
+A ``SCPIChannelList`` keeps the ranges of the list instead of the expanded
+channels, so a list like ``(@1:1000)`` costs a few objects. A range of
+multi-dimensional channels spans the rectangle between its corners, e.g.
+``1!1:2!2`` contains ``1!1``, ``1!2``, ``2!1`` and ``2!2``. Ranges may be
+descending.
+
+Parsed channel lists are immutable and cached by ``create_channel_list()``,
+because scan lists are typically sent again and again.
+"""
+from array import array
+
+# Largest channel number. Channels are stored as unsigned 16 bit values by
+# ``to_array()``.
+MAX_CHANNEL = 0xFFFF
+
+# Number of cached channel lists.
+MAX_CACHED = 256
+
+
+def _create_range(first, last):
+    if not (0 <= first <= MAX_CHANNEL and 0 <= last <= MAX_CHANNEL):
+        raise ValueError("Channel out of range.")
+    if first <= last:
+        return range(first, last + 1)
+    return range(first, last - 1, -1)
+
+
+def _iter_product(ranges):
+    """Yield the channel tuples of the rectangle spanned by ``ranges``."""
+    if len(ranges) == 1:
+        for i in ranges[0]:
+            yield (i,)
+        return
+    for i in ranges[0]:
+        for rest in _iter_product(ranges[1:]):
+            yield (i,) + rest
+
+
+class SCPIChannelList(object):
+    """A parsed channel list. Iterating yields the channel numbers or, for
+    multi-dimensional lists, tuples of channel numbers. Raise a
+    ``ValueError`` if ``channel_list_string`` is not a valid channel
+    list."""
+    __slots__ = ("_entries", "_dimensions", "_length")
+
+    def __init__(self, channel_list_string):
+        body = channel_list_string.strip()
+        if not (body.startswith("(@") and body.endswith(")")):
+            raise ValueError("Not a channel list: {!r}".format(
+                channel_list_string))
+        entries = list()
+        dimensions = None
+        length = 0
+        for entry in body[2:-1].split(","):
+            first, separator, last = entry.partition(":")
+            first = [int(i) for i in first.split("!")]
+            if separator:
+                last = [int(i) for i in last.split("!")]
+            else:
+                last = first
+            if dimensions is None:
+                dimensions = len(first)
+            if len(first) != dimensions or len(last) != dimensions:
+                raise ValueError("Mixed dimensions in channel list {!r}"
+                    .format(channel_list_string))
+            ranges = tuple(_create_range(a, b) for a, b in zip(first, last))
+            n = 1
+            for r in ranges:
+                n *= len(r)
+            length += n
+            entries.append(ranges)
+        self._entries = tuple(entries)
+        self._dimensions = dimensions
+        self._length = length
+
+    def __repr__(self):
+        return "<SCPIChannelList {!r}>".format(str(self))
+
+    def __str__(self):
+        entries = list()
+        for ranges in self._entries:
+            first = "!".join(str(r[0]) for r in ranges)
+            last = "!".join(str(r[-1]) for r in ranges)
+            if first == last:
+                entries.append(first)
+            else:
+                entries.append(first + ":" + last)
+        return "(@" + ",".join(entries) + ")"
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        if self._dimensions == 1:
+            for ranges in self._entries:
+                for channel in ranges[0]:
+                    yield channel
+        else:
+            for ranges in self._entries:
+                for channel in _iter_product(ranges):
+                    yield channel
+
+    def get_dimensions(self):
+        return self._dimensions
+
+    def get_ranges(self):
+        """Return the entries of the list as tuples of one ``range`` per
+        dimension, e.g. ``((range(1, 9),), (range(12, 13),))`` for
+        ``(@1:8,12)``."""
+        return self._entries
+
+    def to_array(self):
+        """Return the channels as ``array("H")``. The channel tuples of
+        multi-dimensional lists are concatenated."""
+        channels = array("H")
+        if self._dimensions == 1:
+            for ranges in self._entries:
+                channels.extend(array("H", ranges[0]))
+        else:
+            for channel in self:
+                channels.extend(channel)
+        return channels
+
+
+_CHANNEL_LIST_CACHE = dict()
+
+def create_channel_list(channel_list_string):
+    """Return a shared ``SCPIChannelList`` for ``channel_list_string``."""
+    channel_list = _CHANNEL_LIST_CACHE.get(channel_list_string)
+    if channel_list is None:
+        channel_list = SCPIChannelList(channel_list_string)
+        if len(_CHANNEL_LIST_CACHE) >= MAX_CACHED:
+            _CHANNEL_LIST_CACHE.clear()
+        _CHANNEL_LIST_CACHE[channel_list_string] = channel_list
+    return channel_list
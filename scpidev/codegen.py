@@ -0,0 +1,108 @@
+"""
+Generate a precompiled command table. Parsing the SCPI command strings is
+expensive on small MicroPython boards. This tool parses a command table
+on the host and writes a Python module which only contains tuples of
+strings, integers and booleans. The module can be frozen into the
+firmware or compiled with ``mpy-cross``.
+
+The command table is a text file with one command per line. The first
+word is the name of the action, the rest of the line is the SCPI command
+string. Empty lines and lines starting with ``#`` are ignored::
+
+    meas_volt   MEASure[:VOLTage]?
+    meas_temp   MEASure:TEMPerature?
+    idn         *IDN?
+
+Usage::
+
+    python -m scpidev.codegen commands.txt -o commands_compiled.py
+
+On the device, the table is loaded with::
+
+    import commands_compiled
+    dev.add_command_table(commands_compiled.COMMAND_TABLE, globals())
+"""
+import argparse
+import sys
+
+from .command import SCPICommand
+
+TABLE_NAME_DEFAULT = "COMMAND_TABLE"
+
+
+def _no_action(*args, **kwargs):
+    pass
+
+
+def read_command_table(lines):
+    """Return a list of ``(action_name, scpi_string)`` tuples from the
+    ``lines`` of a command table file."""
+    command_table = list()
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        action_name, scpi_string = line.split(None, 1)
+        command_table.append((action_name, scpi_string))
+    return command_table
+
+
+def compile_command_table(command_table):
+    """Return a tuple of ``(action_name, compiled_command)`` entries for a
+    list of ``(action_name, scpi_string)`` tuples."""
+    compiled_table = list()
+    for action_name, scpi_string in command_table:
+        cmd = SCPICommand(scpi_string, _no_action)
+        compiled_table.append((action_name, cmd.to_tuple()))
+    return tuple(compiled_table)
+
+
+def generate(command_table, table_name=TABLE_NAME_DEFAULT, source=""):
+    """Return the source code of a module which defines the compiled
+    ``command_table`` as ``table_name``."""
+    lines = list()
+    lines.append("\"\"\"Generated by scpidev.codegen from {!r}. Do not edit."
+        "\"\"\"".format(source))
+    lines.append("{} = (".format(table_name))
+    for entry in compile_command_table(command_table):
+        lines.append("    {!r},".format(entry))
+    lines.append(")")
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate a precompiled SCPI command table module.")
+    parser.add_argument(
+        "table",
+        metavar="TABLE",
+        type=str,
+        help="The command table file. Each line contains an action name "
+        "followed by the SCPI command string."
+    )
+    parser.add_argument(
+        "-o",
+        metavar="OUTPUT",
+        type=str,
+        help="The output file. Default: stdout", default=None
+    )
+    parser.add_argument(
+        "--name",
+        type=str,
+        help="The name of the table in the generated module. Default: {}"
+        .format(TABLE_NAME_DEFAULT), default=TABLE_NAME_DEFAULT
+    )
+    args = parser.parse_args(argv)
+
+    with open(args.table) as f:
+        command_table = read_command_table(f)
+    code = generate(command_table, args.name, args.table)
+    if args.o is None:
+        sys.stdout.write(code)
+    else:
+        with open(args.o, "w") as f:
+            f.write(code)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,42 +3,109 @@ try:
 except ImportError:
     import ure as re
 
+from . import errors
+from . import lexer
 from . import utils
 from .keyword import SCPIKeyword, SCPIKeywordList
 from .parameter import SCPIParameter, SCPIParameterList
 
 
 class SCPICommand():
-    def __init__(self, scpi_string, action, name="", description=""):
-        scpi_string = utils.sanitize(scpi_string)
+    __slots__ = ("_action", "_description", "_keyword_list",
+        "_parameter_list", "_keyword_string", "_parameter_string", "_name",
+        "_is_query", "_source")
+
+    def __init__(self, scpi_string, action, name="", description="",
+            compiled=None, lazy=False):
+        """Create a command from ``scpi_string``. If ``compiled`` is given,
+        it must be a tuple as returned by ``to_tuple()``. In that case,
+        ``scpi_string`` is ignored and no parsing is done. See
+        ``scpidev.codegen``.
+
+        If ``lazy`` is ``True``, only ``scpi_string`` is stored. It will be
+        parsed when the command is used for the first time."""
         self._action = action
         self._description = description
-        self._keyword_string, self._parameter_string = utils.create_command_tuple(scpi_string)
-        self._keyword_list = SCPIKeywordList()
-        self._keyword_list.init(self._keyword_string)
-        self._parameter_list = SCPIParameterList()
-        self._parameter_list.init(self._parameter_string)
-        self._scpi_string = self._keyword_string + " " + self._parameter_string
-        if name:
-            self._name = name
+        self._name = name
+        self._source = None
+        self._keyword_list = None
+        self._parameter_list = None
+        if compiled is not None:
+            (self._keyword_string, self._parameter_string, compiled_keywords,
+                compiled_parameters) = compiled
+            self._is_query = self._keyword_string.endswith("?")
+            parameter_list = SCPIParameterList()
+            parameter_list.init_compiled(compiled_parameters)
+            self._parameter_list = parameter_list
+            keyword_list = SCPIKeywordList()
+            keyword_list.init_compiled(compiled_keywords)
+            self._keyword_list = keyword_list
+        elif lazy:
+            self._source = scpi_string
         else:
-            self.name = self._keyword_string
+            self._init_from_scpi_string(scpi_string)
+
+    def _init_from_scpi_string(self, scpi_string):
+        scpi_string = utils.sanitize(scpi_string)
+        self._keyword_string, self._parameter_string = \
+            utils.create_command_tuple(scpi_string)
+        self._parameter_string = self._parameter_string.replace(" ", "")
         self._is_query = self._keyword_string.endswith("?")
+        parameter_list = SCPIParameterList()
+        parameter_list.init(self._parameter_string)
+        self._parameter_list = parameter_list
+        # The keyword list is set last. It indicates that the command is
+        # completely parsed.
+        keyword_list = SCPIKeywordList()
+        keyword_list.init(self._keyword_string)
+        self._keyword_list = keyword_list
+
+    def _compile(self):
+        """Parse the command string of a lazy command, if not yet done."""
+        if self._keyword_list is None:
+            self._init_from_scpi_string(self._source)
+            self._source = None
+
+    def is_compiled(self):
+        return self._keyword_list is not None
+
+    def get_index_keys(self):
+        """Return the keys under which the command is indexed in a
+        ``SCPICommandList``. See ``utils.create_index_keys()``."""
+        if self._keyword_list is None:
+            return utils.create_index_keys(self._source.strip())
+        return utils.create_index_keys(self._keyword_string)
 
     def __repr__(self):
         ret = "\n"
-        for key, val in self.__dict__.items():
-            ret = ret + str(key) + ": " + str(val) + "\n"
+        for key in self.__slots__:
+            ret = ret + key + ": " + str(getattr(self, key)) + "\n"
         return str(ret)
 
     def __str__(self):
-        return self._scpi_string
+        self._compile()
+        return self._keyword_string + " " + self._parameter_string
 
     def __lt__(self, other):
         a = str(self)
         b = str(other)
         return a < b
 
+    def to_tuple(self):
+        """Return the compiled representation of the command, which only
+        consists of tuples, strings, integers and booleans."""
+        self._compile()
+        return (self._keyword_string, self._parameter_string,
+            self._keyword_list.to_tuple(), self._parameter_list.to_tuple())
+
+    def get_name(self):
+        """Return the name of the command. Defaults to the keyword string."""
+        self._compile()
+        return self._name or self._keyword_string
+
+    def get_action(self):
+        return self._action
+
     def get_action_name(self):
         try:
             return self._action.__name__
@@ -47,15 +114,19 @@ class SCPICommand():
             return ""
 
     def get_keyword_string(self):
+        self._compile()
         return self._keyword_string
 
     def get_keyword_list(self):
+        self._compile()
         return self._keyword_list
 
     def get_parameter_string(self):
+        self._compile()
         return self._parameter_string
 
     def get_parameter_list(self):
+        self._compile()
         return self._parameter_list
 
     def get_parameter_string_list(self):
@@ -74,14 +145,25 @@ class SCPICommand():
             return None
         return self.execute(command_string)
 
-    def execute(self, command_string):
+    def execute(self, command_string, args=None):
         """Execute the attached action. The first parameter will alwas be the
         full ``command_string``. After that, a list of parsed parameters will
-        follow."""
-        parameter_string = utils.create_command_tuple(command_string)[1]
-        args = list()
-        if parameter_string:
-            args = args + parameter_string.split(",")
+        follow, see ``SCPIParameterList.parse()``: Numeric values are
+        ``float`` scaled by their suffix and quoted strings are passed
+        without their quotes. The numeric suffixes of the header, see
+        ``get_suffixes()``, precede the parameters.
+
+        ``args`` are the already parsed parameters as returned by
+        ``SCPICommandList.match_command()``. They are parsed from
+        ``command_string`` if not given."""
+        if args is None:
+            mnemonics, is_query, parameters = lexer.tokenize(command_string)
+            args = self.get_parameter_list().parse(parameters)
+            if args is None:
+                args = [utils.unquote(token[1]) for token in parameters]
+            suffixes = self.get_suffixes(mnemonics, is_query)
+            if suffixes:
+                args = list(suffixes) + args
         # Todo: create a named list, which corresponds to parameter names
         # defined in the command creation string.
         # The ``command_string`` can be read from kwargs
@@ -90,65 +172,193 @@ class SCPICommand():
         return self._action(*args, **kwargs)
 
     def is_query(self):
+        self._compile()
         return self._is_query
 
     def match(self, command_string):
         """Return ``True`` if ``command_string`` matches the instance's
         keyword AND parameters. ``False`` otherwise."""
-        keyword_string, parameter_string = utils.create_command_tuple(command_string)
-        matches_keyword = self.match_keyword(keyword_string)
-        matches_parameter = self.match_parameters(parameter_string)
-        return matches_keyword and matches_parameter
+        try:
+            message = lexer.tokenize(command_string)
+        except errors.SCPIError:
+            return False
+        return self.match_message(message)
+
+    def match_message(self, message):
+        """Like ``match()`` for a ``message`` as returned by
+        ``lexer.tokenize()``."""
+        mnemonics, is_query, parameters = message
+        return self.match_mnemonics(mnemonics, is_query) \
+            and self.get_parameter_list().match_parameters(parameters)
 
     def match_keyword(self, keyword_string):
         """Return ``True`` if ``keyword_string`` matches the instances
         keyword. ``False`` otherwise."""
-        keyword_string = keyword_string.lower()
-        # Check if the command is a query. If True, remove the trailing '?'.
-        if keyword_string.endswith("?"):
-            if self.is_query():
-                keyword_string = keyword_string.replace("?", "")
-            else:
-                return False
-        elif self.is_query():
-            return False
+        keyword_string = keyword_string.lower().lstrip(":")
+        is_query = keyword_string.endswith("?")
+        if is_query:
+            keyword_string = keyword_string[:-1]
+        return self.match_mnemonics(keyword_string.split(":"), is_query)
 
-        # Split keywords into a test string list against which each keyword
-        # will be tested.
-        test_string_list = keyword_string.split(":")
+    def match_mnemonics(self, test_string_list, is_query):
+        """Return ``True`` if the lower case mnemonics ``test_string_list``
+        of a received header match the instances keyword."""
+        return self.get_suffixes(test_string_list, is_query) is not None
+
+    def get_suffixes(self, test_string_list, is_query):
+        """Return the numeric suffixes of the mnemonics ``test_string_list``
+        as a tuple with one entry per keyword which takes a suffix, e.g.
+        ``(2,)`` for ``["sour2", "volt"]`` and ``SOURce#:VOLTage``. A
+        missing suffix is 1. Return ``None`` if the mnemonics do not
+        match."""
+        if is_query != self.is_query():
+            return None
 
         # Iterate over all keywords. Leave the procedure as soon as a mismatch
         # is detected. When the loop finishes ordinarily, the matching was
         # succesful.
+        suffixes = ()
         keyword_i = 0
         for keyword in self.get_keyword_list():
             if keyword_i >= len(test_string_list):
                 if not keyword.is_optional():
-                    return False
+                    return None
+                if keyword.has_suffix():
+                    suffixes = suffixes + (1,)
                 continue
             test_string = test_string_list[keyword_i]
+            if keyword.has_suffix():
+                end = len(test_string)
+                while end > 1 and test_string[end - 1].isdigit():
+                    end -= 1
+                suffix = test_string[end:]
+                test_string = test_string[:end]
+            digits = keyword.get_digits()
+            if digits:
+                if test_string.endswith(digits):
+                    test_string = test_string[:-len(digits)]
+                else:
+                    test_string = ""
             req_string = keyword[0].lower()
             opt_string = req_string + keyword[1].lower()
             if not test_string.startswith(req_string):
                 if keyword.is_optional():
+                    if keyword.has_suffix():
+                        suffixes = suffixes + (1,)
                     continue
                 else:
-                    return False
+                    return None
             if not opt_string.startswith(test_string):
-                return False
+                return None
+            if keyword.has_suffix():
+                suffixes = suffixes + (int(suffix) if suffix else 1,)
             keyword_i += 1
         if keyword_i < len(test_string_list):
-            return False
-        return True
+            return None
+        return suffixes
 
     def match_parameters(self, test_string):
-        test_string = utils.sanitize(test_string, remove_all_spaces=True)
-        return test_string in self.get_parameter_list()
+        return test_string.strip() in self.get_parameter_list()
 
 
 class SCPICommandList(list):
+    """A list of commands. The commands are indexed by the short forms of
+    their leading keywords. When a command is searched, only the commands
+    whose index key is a prefix of the first mnemonic of the command string
+    are tested. Every change of the list drops the index, it is rebuilt by
+    the next search."""
+    __slots__ = ("_index",)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self._index = None
+
+    def _get_index(self):
+        if self._index is None:
+            index = dict()
+            for cmd in self:
+                for key in cmd.get_index_keys():
+                    bucket = index.get(key)
+                    if bucket is None:
+                        index[key] = [cmd]
+                    elif bucket[-1] is not cmd:
+                        bucket.append(cmd)
+            self._index = index
+        return self._index
+
+    def append(self, cmd):
+        super().append(cmd)
+        self._index = None
+
+    def extend(self, cmds):
+        super().extend(cmds)
+        self._index = None
+
+    def insert(self, i, cmd):
+        super().insert(i, cmd)
+        self._index = None
+
+    def remove(self, cmd):
+        super().remove(cmd)
+        self._index = None
+
+    def pop(self, *args):
+        self._index = None
+        return super().pop(*args)
+
+    def clear(self):
+        super().clear()
+        self._index = None
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._index = None
+
+    def reverse(self):
+        super().reverse()
+        self._index = None
+
+    def __setitem__(self, i, value):
+        super().__setitem__(i, value)
+        self._index = None
+
+    def __delitem__(self, i):
+        super().__delitem__(i)
+        self._index = None
+
+    def __iadd__(self, cmds):
+        self.extend(cmds)
+        return self
+
+    def __imul__(self, n):
+        self._index = None
+        return super().__imul__(n)
+
+    def get_candidates(self, keyword_string):
+        """Return the commands which might match ``keyword_string`` in the
+        order they were added."""
+        return self.get_mnemonic_candidates(
+            utils.get_first_mnemonic(keyword_string))
+
+    def get_mnemonic_candidates(self, mnemonic):
+        """Return the commands which might match a header starting with the
+        lower case ``mnemonic`` in the order they were added."""
+        index = self._get_index()
+        candidates = None
+        for i in range(1, len(mnemonic) + 1):
+            bucket = index.get(mnemonic[:i])
+            if bucket is None:
+                continue
+            if candidates is None:
+                candidates = bucket
+            else:
+                # Rare case: more than one bucket matches. Restore the
+                # order of the list.
+                candidates = [cmd for cmd in self
+                    if cmd in candidates or cmd in bucket]
+        if candidates is None:
+            return ()
+        return candidates
 
     def __str__(self):
         ret = "[\n"
@@ -160,14 +370,71 @@ class SCPICommandList(list):
     def __contains__(self, val):
         return self.get_command(val, match_parameters=True) is not None
 
-    def get_command(self, command_string, match_parameters=True):
-        keyword_string, parameter_string = utils.create_command_tuple(
-            command_string)
-        for cmd in self:
-            if match_parameters:
-                if cmd.match(command_string):
-                    return cmd
+    def init_compiled(self, command_table, actions):
+        """Append the commands of a compiled ``command_table`` as generated by
+        ``scpidev.codegen``. ``command_table`` is a tuple of
+        ``(action_name, compiled_command)`` entries. ``actions`` is either a
+        dictionary or an object, e.g. a module, from which the actions are
+        looked up by name."""
+        for action_name, compiled in command_table:
+            if isinstance(actions, dict):
+                action = actions[action_name]
             else:
+                action = getattr(actions, action_name)
+            self.append(SCPICommand("", action, compiled=compiled))
+
+    def get_command(self, command_string, match_parameters=True):
+        """Return the first command which matches ``command_string`` or
+        ``None``."""
+        if not match_parameters:
+            keyword_string = utils.create_keyword_string(
+                utils.sanitize(command_string))
+            for cmd in self.get_candidates(keyword_string):
                 if cmd.match_keyword(keyword_string):
                     return cmd
+            return None
+        try:
+            message = lexer.tokenize(command_string)
+        except errors.SCPIError:
+            return None
+        if not message[0]:
+            return None
+        for cmd in self.get_mnemonic_candidates(message[0][0]):
+            if cmd.match_message(message):
+                return cmd
         return None
+
+    def match_command(self, message):
+        """Return ``(cmd, args)`` for the first command which matches the
+        ``message`` as returned by ``lexer.tokenize()``. ``args`` are the
+        header suffixes and the parsed parameters for
+        ``SCPICommand.execute()``. If no command matches, ``args`` is
+        ``None`` and ``cmd`` is the first command whose keyword matches or
+        ``None``.
+
+        If a value is invalid or out of its limits and no other command
+        matches, the ``SCPIError`` is raised."""
+        mnemonics, is_query, parameters = message
+        if not mnemonics:
+            return (None, None)
+        first = None
+        error = None
+        for cmd in self.get_mnemonic_candidates(mnemonics[0]):
+            suffixes = cmd.get_suffixes(mnemonics, is_query)
+            if suffixes is None:
+                continue
+            if first is None:
+                first = cmd
+            try:
+                args = cmd.get_parameter_list().parse(parameters)
+            except errors.SCPIError as e:
+                if error is None:
+                    error = e
+                continue
+            if args is not None:
+                if suffixes:
+                    args = list(suffixes) + args
+                return (cmd, args)
+        if error is not None:
+            raise error
+        return (first, None)
@@ -3,14 +3,10 @@ try:
 except ImportError:
     import time
 try:
-    import logging
-except ImportError:
-    import scpidev.logging_mockup as logging
-try:
-    from queue import Queue, Empty
+    from queue import Queue
 except ImportError:
     # Python2 compatibility
-    from Queue import Queue, Empty
+    from Queue import Queue
 
 
 try:
@@ -21,14 +17,58 @@ except ImportError:
     print("Info: No threading available. Using single threaded mode")
     USE_THREADING = False
 
+from . import log
 from . import utils
+from . import errors
+from . import lexer
+from .metrics import SCPIMetrics, STAGE_QUEUE, STAGE_WRITE
+from .metrics import render_openmetrics
+from .cache import SCPIResponseCache
+from .channel import create_channel_list
+from .value import VALTYPE_CHANNEL_LIST
+from .settings import SCPISettings
+from .snapshot import SCPISnapshots, parse_slot
 from .command import SCPICommand, SCPICommandList
-if False: # USE_THREADING:
+if USE_THREADING:
     from .interface import SCPIInterfaceTCP, SCPIInterfaceUDP, SCPIInterfaceSerial
+    from .interface import SCPIInterfaceMetrics
+    from .watchdog import SCPIWatchdog
+    from . import worker
+    from .recorder import SCPIRecorder, DEFAULT_SIZE as RECORDER_SIZE
+    from .acquisition import SCPIAcquisition, SOURCE_BUS, SOURCE_IMMEDIATE
 else:
     from .uinterface import SCPIInterfaceTCP
 
 
+# Responses of these types are sent as they are. A tuple is a sequence of
+# buffers, see ``utils.create_block_data()``.
+_BUFFER_TYPES = (tuple, bytes, bytearray, memoryview)
+
+
+def _create_batch_action(action, parameter_list):
+    """Return an action which passes channel lists to ``action`` as
+    ``SCPIChannelList`` objects and formats the returned sequence in one
+    step. Only the arguments of the parameters in ``parameter_list`` which
+    are declared as channel lists are converted."""
+    indices = frozenset(i for i, parameter in enumerate(parameter_list)
+        if any(value.get_type() == VALTYPE_CHANNEL_LIST
+            for value in parameter.get_value_list()))
+
+    def batch_action(*args, **kwargs):
+        args = [create_channel_list(arg) if i in indices
+            and isinstance(arg, str) and arg.startswith("(@") else arg
+            for i, arg in enumerate(args)]
+        result = action(*args, **kwargs)
+        if result is None or isinstance(result, str):
+            return result
+        return utils.format_array(result)
+    try:
+        batch_action.__name__ = action.__name__
+    except AttributeError:
+        pass
+    return batch_action
+
+
 class SCPIDevice():
     """``SCPIDevice`` is the main class for the SCPI device. It contains a
     list with all valid commands. Each command requires a callback function to
@@ -42,17 +82,79 @@ class SCPIDevice():
         ``SCPIDevice(cmd_dict=cmd_dict)``.
         The dictionary's keys are the SCPI strings and the values represent
         the function callbacks.
+
+        With ``SCPIDevice(lazy=True)`` the command strings are parsed when
+        the commands are used for the first time instead of in
+        ``add_command()``.
+
+        With ``SCPIDevice(metrics=True)`` latencies and counters are
+        recorded. See ``get_metrics()``. The ``SYSTem:STATistics?`` query
+        returns the metrics as definite length block data.
+
+        The watchdog checks the device every ``watchdog_interval`` seconds
+        (default 1). It flags actions which run longer than their deadline.
+        ``deadline`` sets the default deadline in seconds for all commands
+        (default ``None``, i.e. no deadline). Data handlers without a
+        heartbeat for ``heartbeat_timeout`` seconds (default 5) are flagged
+        as stalled. See ``scpidev.watchdog``.
+
+        Actions of commands with a timeout are executed by a pool of at
+        most ``workers`` threads (default 4). See ``scpidev.worker``. The
+        actions of process commands are executed by at most ``processes``
+        processes (default: the number of cores). See ``add_command()``.
+
+        ``cache_size`` limits the number of cached responses (default 256).
+        See ``add_command()`` and ``scpidev.cache``.
         """
         self._command_list = SCPICommandList()
+        self._lazy = kwargs.get("lazy", False)
+        self._deadline = kwargs.get("deadline")
+        # Deadlines of single commands. Kept here instead of in the command
+        # objects, because only few commands have a deadline.
+        self._deadlines = dict()
+        self._timeouts = dict()
+        self._worker_pool = None
+        # Process commands and the ``data`` functions of their actions.
+        # The pool is created by the first process command.
+        self._process_commands = dict()
+        self._process_pool = None
+        self._processes = kwargs.get("processes")
+        self._recorder = None
+        # Created by the first command which uses the cache.
+        self._cache = None
+        self._cache_size = kwargs.get("cache_size", 256)
+        # Created by the first setting. See ``add_setting()``.
+        self._settings = None
+        self._setting_commands = dict()
+        # See ``set_snapshot_file()``.
+        self._snapshots = None
+        # See ``add_acquisition()``.
+        self._acquisition = None
+        self._acquisition_settings = None
+        self._status = 0
+        self._running_action = None
+        self._metrics = None
+        if kwargs.get("metrics", False):
+            self._metrics = SCPIMetrics()
+            self.add_command("SYSTem:STATistics?", self._syst_statistics)
         self._command_history = list()
         self._alarm_state = False
         self._alarm_trace = list()
         self._interface_list = list()
+        self._interface_specs = list()
         self._interface_type_list = list()
+        self._thread_list = list()
         if USE_THREADING:
             self._is_running = threading.Event()
             self._thread = None
             self._watchdog_running = threading.Event()
+            self._watchdog_wakeup = threading.Event()
+            self._watchdog_thread = None
+            self._watchdog = SCPIWatchdog(self,
+                interval=kwargs.get("watchdog_interval", 1.),
+                heartbeat_timeout=kwargs.get("heartbeat_timeout", 5.))
+            self._worker_pool = worker.SCPIWorkerPool(
+                kwargs.get("workers", 4))
         if "cmd_dict" in kwargs:
             for cmd_string in kwargs["cmd_dict"]:
                 self.add_command(
@@ -64,19 +166,337 @@ class SCPIDevice():
         """Return a list of command objects."""
         return self._command_list
 
+    def get_metrics(self):
+        """Return the ``SCPIMetrics`` of the device. ``None`` if the device
+        was not created with ``metrics=True``."""
+        return self._metrics
+
+    def get_cache(self):
+        """Return the ``SCPIResponseCache`` of the device. ``None`` if no
+        command uses the cache."""
+        return self._cache
+
+    def invalidate_cache(self, tags=None):
+        """Drop the cached responses with one of the ``tags``. All cached
+        responses if ``tags`` is ``None``."""
+        if self._cache is not None:
+            self._cache.invalidate(tags)
+
+    def get_gauges(self):
+        """Return the current state of the device as a list of ``(name,
+        help, samples)`` tuples. See ``metrics.render_openmetrics()``."""
+        gauges = list()
+        gauges.append(("scpidev_error_queue_length",
+            "Number of entries in the error queue.",
+            [((), len(self._alarm_trace))]))
+        samples = list()
+        for interface in self._interface_list:
+            samples.append(((("interface", interface),),
+                len(interface.get_sessions())))
+        gauges.append(("scpidev_sessions",
+            "Number of open sessions per interface.", samples))
+        recv_queue = getattr(self, "_recv_queue", None)
+        if recv_queue is not None:
+            gauges.append(("scpidev_receive_queue_length",
+                "Number of messages waiting for dispatch.",
+                [((), recv_queue.qsize())]))
+        if self._cache is not None:
+            gauges.append(("scpidev_cache_entries",
+                "Number of entries of the response cache.",
+                [((), self._cache.get_summary()["entries"])]))
+        if USE_THREADING:
+            threads = list(self._thread_list)
+            for t in (self._thread, self._watchdog_thread):
+                if t is not None:
+                    threads.append(t)
+            gauges.append(("scpidev_thread_alive",
+                "1 if the thread is alive.",
+                [((("thread", t.name),), int(t.is_alive())) for t in threads]))
+        return gauges
+
+    def get_counters(self):
+        """Return the counters of the device which are not part of the
+        ``SCPIMetrics``, e.g. the hits of the response cache, as a list of
+        ``(name, help, samples)`` tuples."""
+        counters = list()
+        cache = self._cache
+        if cache is not None:
+            for field in ("hits", "misses", "invalidations"):
+                counters.append(("scpidev_cache_" + field,
+                    "Number of {} of the response cache.".format(field),
+                    [((), getattr(cache, field))]))
+        return counters
+
+    def render_metrics(self):
+        """Return the metrics and the device state in the OpenMetrics text
+        format."""
+        return render_openmetrics(self._metrics, self.get_gauges(),
+            self.get_counters())
+
+    def _syst_statistics(self, *args, **kwargs):
+        return utils.create_block_data_string(self._metrics.render_text())
+
+    def start_recording(self, path, size=None):
+        """Record all program messages which are received by the interfaces
+        into the ring file ``path`` with a data area of ``size`` bytes. See
+        ``scpidev.recorder`` and ``scpidev.replay``. Return the
+        ``SCPIRecorder``."""
+        if size is None:
+            size = RECORDER_SIZE
+        self.stop_recording()
+        self._recorder = SCPIRecorder(path, size)
+        return self._recorder
+
+    def stop_recording(self):
+        recorder = self._recorder
+        self._recorder = None
+        if recorder is not None:
+            recorder.close()
+
     def get_command_history(self):
         """Return a list which contains all succesfully executed commands."""
         return self._command_history
 
-    def add_command(self, scpi_string, action, name="", description=""):
-        """Add a command string and an associated action."""
+    def add_command(self, scpi_string, action, name="", description="",
+            lazy=None, deadline=None, timeout=None, cache=None, tags=(),
+            batch=False, process=False, data=None):
+        """Add a command string and an associated action. If ``lazy`` is
+        ``None``, the device's default is used. ``deadline`` overrides the
+        device's default deadline of the action in seconds.
+
+        If ``timeout`` (in seconds) is given, a blocking action is executed
+        by a worker thread and abandoned when the timeout elapsed. An action
+        which is a coroutine function is cancelled instead. In both cases,
+        a hardware error (-240) is queued and the dispatcher continues with
+        the next message. Timeouts require threading.
+
+        With ``cache=True``, the responses of a query are cached until they
+        are invalidated. A number sets the time to live in seconds. The
+        cached responses are invalidated by the execution of any command
+        without ``cache``, which shares one of the ``tags``, e.g.::
+
+            dev.add_command("VOLTage?", get_voltage, cache=True,
+                tags=("voltage",))
+            dev.add_command("VOLTage <value>", set_voltage, tags=("voltage",))
+
+        See ``scpidev.cache``.
+
+        With ``batch=True``, channel list parameters are passed to the action
+        as ``SCPIChannelList`` objects, which iterate over the channels
+        without expanding the list. See ``scpidev.channel``. The action
+        measures all channels at once and returns a sequence of values,
+        e.g. an ``array`` or a NumPy array, which is formatted in one
+        step::
+
+            def meas_volt(channels, **kwargs):
+                return array("d", [adc.read(ch) for ch in channels])
+
+            dev.add_command("MEASure:VOLTage? <channel_list>", meas_volt,
+                batch=True)
+
+        With ``process=True``, the action is CPU-bound and executed by
+        another process, so it does not hold the GIL of the device process.
+        ``data`` is an optional function, which is called by the dispatch
+        thread and whose result, e.g. the ``memoryview`` slices returned by
+        ``SCPIAcquisition.fetch()``, is passed as first argument. Large
+        buffers are passed through shared memory. The action must be a
+        function defined at module level::
+
+            def calc_mean(samples, **kwargs):
+                return sum(samples) / len(samples)
+
+            dev.add_command("CALCulate:MEAN?", calc_mean, process=True,
+                data=dev.get_acquisition().fetch)
+
+        A process whose action exceeds its ``timeout`` is killed. See
+        ``scpidev.process``. Process commands require threading and cannot
+        be batch commands.
+        """
+        if lazy is None:
+            lazy = self._lazy
+        if process and (batch or not USE_THREADING):
+            raise ValueError("Process commands require threading and "
+                "cannot be batch commands.")
+        if batch:
+            # The parameters are parsed right away, also for lazy commands,
+            # to find the channel lists.
+            action = _create_batch_action(action,
+                SCPICommand(scpi_string, None).get_parameter_list())
         new_cmd = SCPICommand(
             scpi_string=scpi_string,
             action=action,
             name=name,
             description=description,
+            lazy=lazy,
         )
         self._command_list.append(new_cmd)
+        if deadline is not None:
+            self._deadlines[new_cmd] = deadline
+        if timeout is not None:
+            self._timeouts[new_cmd] = timeout
+        if process:
+            self._process_commands[new_cmd] = data
+            if self._process_pool is None:
+                # Imported on demand, ``multiprocessing.shared_memory`` is
+                # not available everywhere, e.g. before Python 3.8.
+                from .process import SCPIProcessPool
+                self._process_pool = SCPIProcessPool(self._processes)
+        if cache or tags:
+            if self._cache is None:
+                self._cache = SCPIResponseCache(self._cache_size)
+            if cache:
+                ttl = None
+                if cache is not True:
+                    ttl = cache
+                self._cache.set_policy(new_cmd, ttl, tags)
+            else:
+                self._cache.set_invalidates(new_cmd, tags)
+
+    def add_setting(self, scpi_string, type=float, range=None, default=None,
+            description="", tags=()):
+        """Add a setting and generate its set command and query, e.g.
+        ``add_setting("SOURce:VOLTage", type=float, range=(0, 10))`` adds::
+
+            SOURce:VOLTage {<value>|MINimum|MAXimum|DEFault}
+            SOURce:VOLTage? [{MINimum|MAXimum|DEFault}]
+
+        ``type`` is ``float``, ``int`` or ``bool``. ``MINimum`` and
+        ``MAXimum`` are only accepted if a ``range`` is given. The set
+        command invalidates the cached responses with one of the ``tags``.
+        Values out of range are rejected with error -222. Return the
+        ``SCPISetting``. See ``scpidev.settings``."""
+        if self._settings is None:
+            self._settings = SCPISettings()
+        setting = self._settings.add(scpi_string, type, range, default)
+        set_string, query_string = setting.get_command_strings()
+        self.add_command(set_string, setting.get_action(False),
+            description=description, tags=tags)
+        self._setting_commands[self._command_list[-1]] = (setting, False)
+        self.add_command(query_string, setting.get_action(True),
+            description=description)
+        self._setting_commands[self._command_list[-1]] = (setting, True)
+        return setting
+
+    def get_settings(self):
+        """Return the ``SCPISettings`` store. ``None`` if neither a setting
+        nor a snapshot file was added."""
+        return self._settings
+
+    def set_snapshot_file(self, path, slots=10, log=None):
+        """Store snapshots of the settings in ``slots`` slots of the file
+        ``path`` and add the commands ``*SAV <n>`` and ``*RCL <n>``. The
+        file is a memory-mapped file of fixed slots or, if ``mmap`` is not
+        available or ``log`` is ``True``, an append-only log. The file is
+        opened on first use. The slots grow with the settings added
+        afterwards. See ``scpidev.snapshot``."""
+        if self._snapshots is not None:
+            self._snapshots.close()
+        else:
+            self.add_command("*SAV <value>", self._sav)
+            self.add_command("*RCL <value>", self._rcl)
+        if self._settings is None:
+            self._settings = SCPISettings()
+        self._snapshots = SCPISnapshots(self._settings, path, slots, log)
+
+    def save_state(self, n):
+        """Save a snapshot of all settings into slot ``n``."""
+        self._snapshots.save(n)
+
+    def recall_state(self, n):
+        """Restore all settings from the snapshot in slot ``n``. The
+        response cache is invalidated."""
+        self._snapshots.recall(n)
+        self.invalidate_cache()
+
+    def _sav(self, *args, **kwargs):
+        self.save_state(parse_slot(args))
+
+    def _rcl(self, *args, **kwargs):
+        self.recall_state(parse_slot(args))
+
+    def add_acquisition(self, sample, size=1024, typecode="d"):
+        """Add the trigger and acquisition subsystem. ``sample`` is called
+        without arguments and returns one sample. The samples are stored in
+        a ring buffer of ``size`` samples of the ``array`` type
+        ``typecode``. The following commands are added::
+
+            INITiate[:IMMediate]
+            INITiate:CONTinuous {ON|OFF}
+            ABORt
+            TRIGger:SOURce {IMMediate|BUS}
+            TRIGger[:IMMediate]
+            *TRG
+            SAMPle:COUNt {<value>|MINimum|MAXimum|DEFault}
+            SAMPle:TIMer {<value>|MINimum|MAXimum|DEFault}
+            FETCh?
+            DATA:POINts?
+
+        ``FETCh?`` returns the samples in the buffer as a binary block in
+        the machine's byte order. Acquisition requires threading. Return the
+        ``SCPIAcquisition``. See ``scpidev.acquisition``."""
+        if not USE_THREADING:
+            raise Exception("Acquisition requires threading.")
+        if self._acquisition is not None:
+            raise Exception("The acquisition was already added.")
+        self._acquisition = SCPIAcquisition(sample, size, typecode)
+        self._acquisition_settings = (
+            self.add_setting("SAMPle:COUNt", int, (1, size), size),
+            self.add_setting("SAMPle:TIMer", float, (0, 3600), 0),
+            self.add_setting("INITiate:CONTinuous", bool),
+        )
+        self.add_command("INITiate[:IMMediate]", self._initiate)
+        self.add_command("ABORt", self._abort)
+        self.add_command("TRIGger:SOURce {IMMediate|BUS}",
+            self._trigger_source)
+        self.add_command("TRIGger:SOURce?", self._trigger_source_query)
+        self.add_command("TRIGger[:IMMediate]", self._trigger)
+        self.add_command("*TRG", self._trigger)
+        self.add_command("FETCh?", self._fetch)
+        self.add_command("DATA:POINts?", self._data_points)
+        return self._acquisition
+
+    def get_acquisition(self):
+        return self._acquisition
+
+    def _initiate(self, *args, **kwargs):
+        acquisition = self._acquisition
+        count, interval, continuous = self._acquisition_settings
+        acquisition.count = count.get()
+        acquisition.interval = interval.get()
+        acquisition.continuous = continuous.get()
+        acquisition.initiate()
+
+    def _abort(self, *args, **kwargs):
+        if not self._acquisition.abort():
+            raise errors.SCPIError(errors.ERR_HARDWARE,
+                "Acquisition did not stop")
+
+    def _trigger_source(self, *args, **kwargs):
+        if args[0].upper().startswith("BUS"):
+            self._acquisition.trigger_source = SOURCE_BUS
+        else:
+            self._acquisition.trigger_source = SOURCE_IMMEDIATE
+
+    def _trigger_source_query(self, *args, **kwargs):
+        if self._acquisition.trigger_source == SOURCE_BUS:
+            return "BUS"
+        return "IMM"
+
+    def _trigger(self, *args, **kwargs):
+        self._acquisition.trigger()
+
+    def _fetch(self, *args, **kwargs):
+        return utils.create_block_data(*self._acquisition.fetch())
+
+    def _data_points(self, *args, **kwargs):
+        return self._acquisition.get_points()
+
+    def add_command_table(self, command_table, actions):
+        """Add the commands of a precompiled command table, which was
+        generated by ``scpidev.codegen``. The actions are looked up by name
+        in ``actions``, which is a dictionary or an object like a module.
+        No parsing of command strings is done."""
+        self._command_list.init_compiled(command_table, actions)
 
     def list_commands(self):
         """Return a list of command strings which were added to the device."""
@@ -85,12 +505,17 @@ class SCPIDevice():
             commands.append(str(cmd))
         return commands
 
+    def push_error(self, code, info=""):
+        """Set an alarm for the SCPI error ``code``. See ``errors``."""
+        self.set_alarm(errors.format_error(code, info))
+
     def set_alarm(self, message):
-        """Set an alarm with the content of ``message``."""
+        """Set an alarm with the content of ``message``. Alarms are logged at
+        INFO level with a rate limit, see ``log.limited()``."""
         alarm_string = message
         self._alarm_state = True
         self._alarm_trace.append(alarm_string)
-        logging.info(alarm_string)
+        log.limited(log.INFO, "alarm", alarm_string)
 
     def get_alarm(self, clear_alarm_when_empty=True):
         """Return the most recent alarm and remove it from the alarm trace. If
@@ -112,6 +537,36 @@ class SCPIDevice():
         if clear_history:
             self._alarm_trace = list()
 
+    def get_status(self):
+        """Return the status bits which were set by the watchdog. See
+        ``scpidev.watchdog``."""
+        return self._status
+
+    def set_status(self, bits):
+        self._status |= bits
+
+    def clear_status(self, bits=None):
+        """Clear the status ``bits``. All bits if ``bits`` is ``None``."""
+        if bits is None:
+            self._status = 0
+        else:
+            self._status &= ~bits
+
+    def get_running_action(self):
+        """Return a ``(command, start_time)`` tuple of the action which is
+        currently executed. ``None`` if no action is running."""
+        return self._running_action
+
+    def get_deadline(self, cmd):
+        """Return the deadline of ``cmd`` in seconds. ``None`` if the command
+        has no deadline."""
+        return self._deadlines.get(cmd, self._deadline)
+
+    def get_handlers(self):
+        """Return a list of ``(interface, thread)`` tuples of the running
+        data handlers."""
+        return list(zip(self._interface_list, self._thread_list))
+
     def create_interface(self, type, *args, **kwargs):
         """Create a communication interface. The actual instantiation will be
         done when the interface is actually needed. The application programmer
@@ -122,6 +577,8 @@ class SCPIDevice():
         - TCP
         - UDP (not on micropython)
         - Serial (not yet implemented, not on micropython)
+        - Metrics (HTTP endpoint for the OpenMetrics/Prometheus format,
+          not on micropython)
 
         When threading is not available, only one interface is allowed.
         """
@@ -143,30 +600,117 @@ class SCPIDevice():
             interface = SCPIInterfaceUDP(*args, **kwargs)
         elif type == "serial":
             interface = SCPIInterfaceSerial(*args, **kwargs)
+        elif type == "metrics":
+            interface = SCPIInterfaceMetrics(self.render_metrics,
+                *args, **kwargs)
+        interface.set_clear_handler(self.device_clear)
+        interface.set_talk_handler(self.request_response)
+        interface.set_metrics(self._metrics)
         return interface
 
+    def device_clear(self, session=None):
+        """Device clear (IEEE 488.2 DCL/SDC): Discard the input buffer, input
+        queue and output queue of ``session``. Responses of a command which
+        is currently executed for the session will be discarded as well. If
+        ``session`` is ``None``, all sessions of all interfaces are cleared.
+        The clear is silent, i.e. the error queue is not affected."""
+        if session is None:
+            sessions = list()
+            for interface in self._interface_list:
+                sessions.extend(interface.get_sessions())
+        else:
+            sessions = [session]
+        for session in sessions:
+            session.clear()
+
+    def request_response(self, session):
+        """The client of ``session`` requests the next response (IEEE
+        488.2: the device is addressed to talk). If there is no response for
+        the request, i.e. no query is left whose response was not requested
+        yet, error -420 (Query UNTERMINATED) is reported. Return ``False``
+        in this case. See ``SCPISession.request_response()``."""
+        if session.request_response():
+            return True
+        self.push_error(errors.ERR_QUERY_UNTERMINATED)
+        return False
+
     def execute(self, command_string):
         """Search a matching command and execute it. If exceptions arise
         during execution, they are catched and an alarm is set.
 
+        Return the response as ``str`` with a trailing newline. Responses of
+        actions which return ``bytes``, another buffer or a tuple of buffers
+        (binary blocks, see ``utils.create_block_data()``) are returned
+        unchanged.
+
         TODO:
         - Implement multiple commands in one line, e.g. MEAS?;MEAS:CURR?\n
         - Implement parallelism in execution tasks
         """
         executed = False
+        timed_out = False
+        scpi_error = None
         result = None
         result_string = None
         reason = "No reason."
+        metrics = self._metrics
+        if metrics is not None:
+            t_start = time.perf_counter()
+            t_action = None
         command_string = utils.sanitize(command_string)
-        cmd = self._command_list.get_command(command_string,
-            match_parameters=False)
+        cache = self._cache
+        if cache is not None:
+            entry = cache.lookup(command_string)
+            if entry is not None:
+                if metrics is not None:
+                    # Served without matching and without calling the
+                    # action, so kept out of the latency histograms.
+                    metrics.record_cache_hit(entry[0])
+                return entry[1]
+        settings = self._settings
+        if settings is not None:
+            keyword_string, _, parameter_string = command_string.partition(
+                " ")
+            entry = settings.lookup(keyword_string)
+            if entry is not None:
+                # The parameters are parsed like in the matched path, e.g.
+                # with suffixes. Others are left to the matched path.
+                try:
+                    args = entry[0].get_parameter_list().parse(
+                        lexer.tokenize_parameters(parameter_string))
+                except errors.SCPIError:
+                    args = None
+                if args is not None:
+                    return self._execute_setting(entry, command_string,
+                        args)
+        # The message is tokenized and the parameters are parsed once for
+        # matching and the action.
+        try:
+            cmd, args = self._command_list.match_command(
+                lexer.tokenize(command_string))
+        except errors.SCPIError as e:
+            cmd, args = None, None
+            scpi_error = e
         if cmd:
-            if self._command_list.get_command(command_string,
-                    match_parameters=True) is not None:
+            if args is not None:
                 fn_name = cmd.get_action_name()
                 try:
-                    result = cmd.execute(command_string)
-                    if result is not None:
+                    if metrics is not None:
+                        t_action = time.perf_counter()
+                    if USE_THREADING:
+                        self._running_action = (cmd, time.monotonic())
+                        timeout = self._timeouts.get(cmd)
+                        if cmd in self._process_commands:
+                            result = self._call_process(cmd, command_string,
+                                timeout, args)
+                        else:
+                            result = worker.call(self._worker_pool, cmd,
+                                command_string, timeout, args)
+                    else:
+                        result = cmd.execute(command_string, args)
+                    if isinstance(result, _BUFFER_TYPES):
+                        result_string = result
+                    elif result is not None:
                         result_string = str(result)
                         if not result_string.endswith("\n"):
                             result_string = result_string + "\n"
@@ -174,24 +718,84 @@ class SCPIDevice():
                         # cs=command_string, fn=fn_name, res=result_string)
                     # self._command_history.append(cmd_hist_string)
                     executed = True
+                    if cache is not None:
+                        cache.put(cmd, command_string, result_string)
+                    if settings is not None:
+                        entry = self._setting_commands.get(cmd)
+                        if entry is not None:
+                            settings.remember(command_string.partition(
+                                " ")[0], (cmd,) + entry)
                 except Exception as e:
+                    if USE_THREADING and isinstance(e, worker.ActionTimeout):
+                        timed_out = True
+                    elif isinstance(e, errors.SCPIError):
+                        scpi_error = e
                     reason = (
                         "Exception during execution of function {!r}: {}."
                         .format(fn_name, e))
+                self._running_action = None
             else:
                 reason = "Parameter mismatch."
         else:
             reason = "No match found."
+        if metrics is not None:
+            t_end = time.perf_counter()
+            if t_action is None:
+                t_action = t_end
+            metrics.record_command(cmd, int((t_action - t_start) * 1e6),
+                int((t_end - t_action) * 1e6), executed)
         if not executed:
-            self.set_alarm("Could not execute command {c!r}. {r}"
-                .format(c=command_string, r=reason))
+            if scpi_error is not None:
+                self.push_error(scpi_error.code, scpi_error.info)
+            elif timed_out:
+                self.push_error(errors.ERR_HARDWARE,
+                    "Action of {!r} timed out after {} s".format(
+                        cmd.get_name(), timeout))
+            else:
+                self.set_alarm("Could not execute command {c!r}. {r}"
+                    .format(c=command_string, r=reason))
+        return result_string
+
+    def _call_process(self, cmd, command_string, timeout, args):
+        data = self._process_commands[cmd]
+        if data is not None:
+            args = [data()] + list(args)
+        return self._process_pool.call(cmd.get_action(), args,
+            command_string, timeout)
+
+    def _execute_setting(self, entry, command_string, args):
+        """Execute the set command or query of a setting whose header was
+        remembered with the parsed ``args``. No matching is done and no
+        action is called."""
+        cmd, setting, is_query = entry
+        metrics = self._metrics
+        if metrics is not None:
+            t_start = time.perf_counter()
+        executed = False
+        result_string = None
+        try:
+            result_string = setting.execute(is_query,
+                ",".join(map(str, args)))
+            executed = True
+        except errors.SCPIError as e:
+            self.push_error(e.code, e.info)
+        if metrics is not None:
+            metrics.record_command(cmd, 0,
+                int((time.perf_counter() - t_start) * 1e6), executed)
+        if executed and self._cache is not None:
+            self._cache.put(cmd, command_string, result_string)
         return result_string
 
     def start(self):
         """Instantiate the interfaces. If threading is available: Instantiate a
         thread and run the ``run()`` routine."""
-        # Instantiate the interfaces.
+        self._instantiate_interfaces()
+        if USE_THREADING:
+            self._start_threaded()
+
+    def _instantiate_interfaces(self):
         self._interface_list = list()
+        self._interface_specs = list()
         for interface_type in self._interface_type_list:
             type = interface_type[0]
             args = interface_type[1]
@@ -199,113 +803,253 @@ class SCPIDevice():
             try:
                 interface = self._instantiate_interface(type, *args, **kwargs)
                 self._interface_list.append(interface)
+                self._interface_specs.append(interface_type)
             except Exception as e:
-                logging.error("Could not instantiate interface '{}'. "
-                    "Exception: {}".format(interface_type, e))
+                log.error("Could not instantiate interface '{}'. "
+                    "Exception: {}", interface_type, e)
         if not self._interface_list:
             raise Exception("There is no interface which could be "
                             "instantiated.")
-        logging.debug("Instantiated {} interfaces.".format(
-            len(self._interface_list)))
-        if USE_THREADING:
-            self._start_threaded()
+        log.debug("Instantiated {} interfaces.", len(self._interface_list))
 
     def _start_threaded(self):
-        if self._thread is None:
-            self._thread = threading.Thread(
-                name="SCPIDevice",
-                target=self._run_threaded)
-            self._thread.start()
-            return True
-        else:
+        """Start the data handlers, the watchdog and the dispatch thread. All
+        threads are started before this method returns, so ``stop()`` can be
+        called right away."""
+        if self._thread is not None:
             return False
+        if not self._interface_type_list:
+            log.error("Cannot run: No interfaces were specified.")
+            return False
+        self._recv_queue = Queue() # TODO: Maxsize
+        self._is_running.set()
+
+        # Create threads for each interface's data handler.
+        self._thread_list = list()
+        for interface in self._interface_list:
+            self._thread_list.append(self._start_data_handler(interface))
+
+        self.start_watchdog()
+
+        # The dispatch thread is a daemon thread, so that an action which
+        # never returns does not prevent the process from exiting.
+        self._thread = threading.Thread(
+            name="SCPIDevice",
+            target=self._run_threaded)
+        self._thread.daemon = True
+        self._thread.start()
+        return True
+
+    def _start_hosted(self, recv_queue, thread, worker_pool,
+            get_process_pool):
+        """Start the device as part of a ``SCPIDeviceHost``. The sockets of
+        interfaces which can share an event loop are watched by the I/O
+        ``thread`` of the host, the other interfaces get a data handler
+        thread. Program messages are put into ``recv_queue``. The pools of
+        the host replace the pools of the device. ``get_process_pool()`` is
+        only called if the device has process commands. See
+        ``scpidev.host``."""
+        self._instantiate_interfaces()
+        self._recv_queue = recv_queue
+        self._worker_pool = worker_pool
+        if self._process_pool is not None:
+            self._process_pool = get_process_pool()
+        self._is_running.set()
+        self._thread_list = list()
+        for interface in self._interface_list:
+            if interface.get_inputs() is None:
+                self._thread_list.append(self._start_data_handler(interface))
+            else:
+                self._thread_list.append(thread)
+
+    def _stop_hosted(self):
+        """Stop receiving and abort the acquisition. The interfaces are
+        closed by the host."""
+        self._is_running.clear()
+        if self._acquisition is not None:
+            self._acquisition.abort(0)
+        for interface in self._interface_list:
+            interface.stop()
+        if self._recorder is not None:
+            self._recorder.flush()
+        self._close_snapshots()
 
     def _get_data_from_queue(self):
         """Get data from the queue which will be written by the interface
-        data handlers. This "timeout => continue" loop is necessary because
-        otherwise, Queue.get() would block KeyboardInterrupts."""
-        data_recv = None
-        while self._is_running.is_set():
-            try:
-                data_recv = self._recv_queue.get(timeout=1)
-                break
-            except Empty:
-                continue
-        return data_recv
+        data handlers. ``stop()`` puts ``None`` into the queue to wake up the
+        dispatch thread."""
+        return self._recv_queue.get()
 
     def _run_threaded(self):
-        """Start listening on the previously by ``create_interface()`` defined
-        interfaces and execute commands when a message is received. This
-        function will run until ``stop()`` is called.
+        """Execute commands when a message is received. This function will
+        run until ``stop()`` is called.
 
         TODO:
         - Implement parallel execution tasks
         """
-        self._recv_queue = Queue() # TODO: Maxsize
-        self._thread_list = list()
-
-        if not self._interface_type_list:
-            logging.error("Cannot run: No interfaces were specified.")
-            return
-
-        self.start_watchdog()
-
-        # Create threads for each interface's data handler.
-        for interface in self._interface_list:
-            args = (self._recv_queue,)
-            t = threading.Thread(
-                target=interface.data_handler, name=str(interface), args=args)
-            self._thread_list.append(t)
-            t.start()
-
         # As long as we did not receive a stop command, we try to get the data
         # from the receive queue and execute a command.
-        self._is_running.set()
         while self._is_running.is_set():
-            data_recv = self._get_data_from_queue()
-
-            # Execute the received command string and return the result (if
-            # any).
-            if data_recv is not None:
-                interface = data_recv[0]
-                command_string = data_recv[1]
-                result = self.execute(command_string)
-                if result is not None:
-                    try:
-                        interface.write(str(result))
-                    except Exception as e:
-                        logging.info("Could not send data to {}. Exception: "
-                            "{}.".format(interface, e))
-
-        # Do not forget to clean-up.
-        self.stop_watchdog()
-        logging.debug("'run()' has finished.")
+            session = self._get_data_from_queue()
+            if session is not None and self._is_running.is_set():
+                self._process_session(session)
+        log.debug("'run()' has finished.")
 
-    def stop(self, timeout=None):
-        pass
+    def _start_data_handler(self, interface):
+        t = threading.Thread(target=interface.data_handler,
+            name=str(interface), args=(self._recv_queue,))
+        t.daemon = True
+        t.start()
+        return t
+
+    def restart_interface(self, interface, timeout=5.):
+        """Replace ``interface`` by a new instance with fresh sockets and
+        start its data handler. The sessions of ``interface`` are closed. A
+        running data handler is stopped first, waiting at most ``timeout``
+        seconds. Return the new interface."""
+        i = self._interface_list.index(interface)
+        interface.stop()
+        thread = self._thread_list[i]
+        if thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=timeout)
+        try:
+            interface.close()
+        except Exception as e:
+            log.warning("Could not close {}: {}", interface, e)
+        type, args, kwargs = self._interface_specs[i]
+        new_interface = self._instantiate_interface(type, *args, **kwargs)
+        self._interface_list[i] = new_interface
+        self._thread_list[i] = self._start_data_handler(new_interface)
+        return new_interface
+
+    def _process_session(self, session):
+        """Execute the next program message of ``session`` and send the
+        response (if any). Messages of sessions which were cleared or closed
+        in the meantime are skipped."""
+        command_string = session.get_input()
+        if command_string is None:
+            return
+        try:
+            self._execute_input(session, command_string)
+        finally:
+            session.end_input()
+
+    def _execute_input(self, session, command_string):
+        metrics = self._metrics
+        if metrics is not None and session.input_time is not None:
+            metrics.record(STAGE_QUEUE,
+                int((time.perf_counter() - session.input_time) * 1e6))
+        # IEEE 488.2 6.3.2.3: When a new program message is received before
+        # the response of the previous query was read, the output queue is
+        # discarded and a query error is reported.
+        if session.clear_output():
+            self.push_error(errors.ERR_QUERY_INTERRUPTED)
+        generation = session.get_generation()
+        recorder = self._recorder
+        if recorder is None:
+            result = self.execute(command_string)
+        else:
+            t_execute = time.perf_counter()
+            result = self.execute(command_string)
+            response = b""
+            if result is not None:
+                response = utils.join_response(result)
+            recorder.record(time.time(), session.id, command_string,
+                response,
+                int((time.perf_counter() - t_execute) * 1e6))
+        if result is not None:
+            try:
+                if metrics is None:
+                    session.write(result, generation)
+                else:
+                    t_write = time.perf_counter()
+                    if session.write(result, generation):
+                        metrics.record_sent(session.interface,
+                            utils.get_response_length(result))
+                    metrics.record(STAGE_WRITE,
+                        int((time.perf_counter() - t_write) * 1e6))
+            except Exception as e:
+                log.info("Could not send data to {}. Exception: "
+                    "{}.", session, e)
 
-    def _stop_threaded(self, timeout=None):
+    def stop(self, timeout=5.):
+        """Stop the device. The data handlers are woken up and stop receiving
+        immediately. Queued messages are discarded. The action which is
+        currently executed may finish within ``timeout`` seconds (``None``:
+        no limit). The sockets of all interfaces are closed before this
+        method returns, even if a data handler did not finish in time.
+        Return ``True`` if all threads finished in time."""
+        if not USE_THREADING:
+            for interface in self._interface_list:
+                interface.close()
+            self._close_snapshots()
+            return True
+        if timeout is not None:
+            t_end = time.monotonic() + timeout
         self._is_running.clear()
+        self.stop_watchdog()
+        if self._acquisition is not None:
+            self._acquisition.abort(0)
         for interface in self._interface_list:
             interface.stop()
-        for thread in self._thread_list:
-            logging.debug("Waiting for Thread '{}' to finish."
-                .format(thread.name))
-            thread.join(timeout=timeout)
-        self._thread.join(timeout=timeout)
+        recv_queue = getattr(self, "_recv_queue", None)
+        if recv_queue is not None:
+            recv_queue.put(None)
+        threads = list(self._thread_list)
+        if self._thread is not None:
+            threads.append(self._thread)
+        stopped = True
+        for thread in threads:
+            remaining = None
+            if timeout is not None:
+                remaining = max(t_end - time.monotonic(), 0.)
+            thread.join(timeout=remaining)
+            if thread.is_alive():
+                log.warning("Thread '{}' did not finish within {} s.",
+                    thread.name, timeout)
+                stopped = False
+        for interface, thread in self.get_handlers():
+            if thread.is_alive():
+                interface.close()
+        self._worker_pool.shutdown()
+        if self._process_pool is not None:
+            self._process_pool.shutdown()
+        if self._recorder is not None:
+            self._recorder.flush()
+        self._close_snapshots()
         self._thread = None
-        logging.debug("All data handlers have finished.")
+        log.debug("Device has stopped.")
+        return stopped
+
+    def close(self):
+        """Stop the device, stop the recording and close the snapshot
+        file. Return ``True`` if all threads finished in time."""
+        stopped = self.stop()
+        self.stop_recording()
+        return stopped
+
+    def _close_snapshots(self):
+        # The snapshot file is opened again on the next *SAV or *RCL.
+        if self._snapshots is not None:
+            self._snapshots.close()
+
+    def get_watchdog(self):
+        return self._watchdog
 
     def start_watchdog(self):
         self._watchdog_thread = threading.Thread(
             target=self._watchdog_handler, name="Watchdog")
         self._watchdog_thread.daemon = False
         self._watchdog_running.set()
+        self._watchdog_wakeup.clear()
         self._watchdog_thread.start()
 
     def stop_watchdog(self):
         self._watchdog_running.clear()
-        self._watchdog_thread.join()
+        self._watchdog_wakeup.set()
+        if self._watchdog_thread is not None:
+            self._watchdog_thread.join()
+            self._watchdog_thread = None
 
     def recv(self, *args, **kwargs):
         data_recv = None
@@ -320,34 +1064,18 @@ class SCPIDevice():
                 try:
                     interface.write(str(result))
                 except Exception as e:
-                    logging.info("Could not send data to {}. Exception: "
-                        "{}.".format(interface, e))
+                    log.info("Could not send data to {}. Exception: "
+                        "{}.", interface, e)
             interface.close()
 
     def _watchdog_handler(self):
-        """The watchdog should periodically check for deadlocks or other
-        inconsistencies.
-
-        TODO: Implement an intelligent watchdog
-        Ideas:
-        - restart data_handler thread
-        """
-        iterations = 0
+        """Run the watchdog checks until ``stop_watchdog()`` is called. See
+        ``scpidev.watchdog``."""
         while self._watchdog_running.is_set():
-            if iterations < 9:
-                iterations += 1
-            else:
-                logging.debug("{}: Watchdog alive. Alarms: {}."
-                    .format(time.time(), len(self._alarm_trace)))
-                alive_threads = 0
-                for t in self._thread_list:
-                    if t.is_alive():
-                        alive_threads += 1
-                    else:
-                        logging.warning("Watchdog: Thread {!r} is not alive"
-                            .format(t))
-                if alive_threads == len(self._thread_list):
-                    logging.debug("Watchdog: All threads alive.")
-                iterations = 0
-            time.sleep(1)
-        logging.info("Watchdog has stopped.")
+            try:
+                wait = self._watchdog.check()
+            except Exception as e:
+                log.error("Watchdog check failed: {}", e)
+                wait = 1.
+            self._watchdog_wakeup.wait(wait)
+        log.info("Watchdog has stopped.")
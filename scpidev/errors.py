@@ -0,0 +1,64 @@
+"""
+SCPI error codes as defined by the SCPI-99 standard, chapter 21.8. Only
+the codes which are actually raised by this package are listed here.
+Entries in the error queue are formatted as ``<code>,"<message>"``.
+"""
+
+ERR_NO_ERROR = 0
+ERR_INVALID_CHARACTER = -101
+ERR_SYNTAX = -102
+ERR_INVALID_SUFFIX = -131
+ERR_INVALID_STRING_DATA = -151
+ERR_INVALID_BLOCK_DATA = -161
+ERR_TRIGGER_IGNORED = -211
+ERR_INIT_IGNORED = -213
+ERR_SETTINGS_CONFLICT = -221
+ERR_DATA_OUT_OF_RANGE = -222
+ERR_ILLEGAL_PARAMETER_VALUE = -224
+ERR_HARDWARE = -240
+ERR_SYSTEM = -310
+ERR_QUERY_INTERRUPTED = -410
+ERR_QUERY_UNTERMINATED = -420
+
+ERROR_MESSAGES = {
+    ERR_NO_ERROR: "No error",
+    ERR_INVALID_CHARACTER: "Invalid character",
+    ERR_SYNTAX: "Syntax error",
+    ERR_INVALID_SUFFIX: "Invalid suffix",
+    ERR_INVALID_STRING_DATA: "Invalid string data",
+    ERR_INVALID_BLOCK_DATA: "Invalid block data",
+    ERR_TRIGGER_IGNORED: "Trigger ignored",
+    ERR_INIT_IGNORED: "Init ignored",
+    ERR_SETTINGS_CONFLICT: "Settings conflict",
+    ERR_DATA_OUT_OF_RANGE: "Data out of range",
+    ERR_ILLEGAL_PARAMETER_VALUE: "Illegal parameter value",
+    ERR_HARDWARE: "Hardware error",
+    ERR_SYSTEM: "System error",
+    ERR_QUERY_INTERRUPTED: "Query INTERRUPTED",
+    ERR_QUERY_UNTERMINATED: "Query UNTERMINATED",
+}
+
+
+class SCPIError(Exception):
+    """An error with a SCPI error ``code``. Raised by actions, the device
+    queues it with ``code`` instead of a generic alarm."""
+    def __init__(self, code, info=""):
+        super().__init__(code, info)
+        self.code = code
+        self.info = info
+
+    def __str__(self):
+        return format_error(self.code, self.info)
+
+
+def format_error(code, info=""):
+    """Return the error queue representation of the error ``code``.
+    Additional device dependent ``info`` is appended to the standard
+    message separated by a semicolon."""
+    message = ERROR_MESSAGES.get(code, "")
+    if info:
+        if message:
+            message = message + ";" + info
+        else:
+            message = info
+    return "{},\"{}\"".format(code, message.replace("\"", "'"))
@@ -0,0 +1,336 @@
+"""
+Many devices in one process, e.g. to simulate hundreds of instruments.
+
+A started ``SCPIDevice`` runs a dispatch thread, a data handler thread per
+interface and a watchdog thread. A ``SCPIDeviceHost`` runs any number of
+devices with a fixed number of threads instead:
+
+- One I/O thread watches the sockets of the TCP and UDP interfaces of all
+  devices with one ``selectors`` event loop. Interfaces which cannot share
+  the loop, e.g. serial interfaces, get their own data handler thread.
+- ``dispatchers`` threads execute the received program messages. The
+  messages of one device are executed one after another in the order of
+  reception. Devices with pending messages take turns message by message.
+- One watchdog thread checks the actions of all devices.
+- Actions with a timeout and process commands are executed by a worker
+  pool and a process pool, which are shared by all devices.
+
+::
+
+    host = SCPIDeviceHost()
+    for i in range(1000):
+        dev = SCPIDevice()
+        dev.add_command("*IDN?", idn)
+        dev.create_interface("tcp", port=5025 + i)
+        host.add_device(dev)
+    host.start()
+"""
+import selectors
+import socket
+import threading
+import time
+from collections import deque
+try:
+    from queue import Queue
+except ImportError:
+    # Python2 compatibility
+    from Queue import Queue
+
+from . import log
+from .worker import SCPIWorkerPool
+
+
+class _DeviceQueue(object):
+    """The receive queue of a hosted device. Sessions which received a
+    program message are scheduled on the dispatchers of the host."""
+    __slots__ = ("device", "sessions", "scheduled", "_host")
+
+    def __init__(self, host, device):
+        self.device = device
+        self.sessions = deque()
+        # ``True`` while the device is in the ready queue of the host or
+        # executes a message.
+        self.scheduled = False
+        self._host = host
+
+    def put(self, session):
+        self._host._schedule(self, session)
+
+    def qsize(self):
+        return len(self.sessions)
+
+
+class _SelectorInputs(object):
+    """The sockets of one interface in the event loop of the host. The
+    interface uses it like the list of sockets of its own select loop."""
+    def __init__(self, selector, interface, recv_queue):
+        self._selector = selector
+        self._interface = interface
+        self._recv_queue = recv_queue
+        self._socks = set()
+        self._outputs = set()
+
+    def __contains__(self, sock):
+        return sock in self._socks
+
+    def append(self, sock):
+        self._selector.register(sock, selectors.EVENT_READ, self._handle)
+        self._socks.add(sock)
+
+    def remove(self, sock):
+        self._socks.discard(sock)
+        self._outputs.discard(sock)
+        self._selector.unregister(sock)
+
+    def update_outputs(self):
+        """Watch the sockets of sessions with pending output for
+        writability."""
+        outputs = set(self._interface.get_outputs()) & self._socks
+        for sock in outputs ^ self._outputs:
+            events = selectors.EVENT_READ
+            if sock in outputs:
+                events |= selectors.EVENT_WRITE
+            self._selector.modify(sock, events, self._handle)
+        self._outputs = outputs
+
+    def _handle(self, sock, mask):
+        if mask & selectors.EVENT_READ:
+            self._interface.handle_readable(sock, self, self._recv_queue)
+        if mask & selectors.EVENT_WRITE and sock in self._socks:
+            self._interface.handle_writable(sock)
+        self.update_outputs()
+
+
+class SCPIDeviceHost(object):
+    """Run the devices added by ``add_device()`` with ``dispatchers``
+    dispatch threads, one I/O thread and one watchdog thread. The shared
+    pools execute at most ``workers`` actions with a timeout and
+    ``processes`` process commands (default: the number of cores) at
+    once."""
+    SELECT_TIMEOUT = 1
+
+    def __init__(self, dispatchers=4, workers=16, processes=None):
+        self._devices = list()
+        self._queues = list()
+        self._dispatchers = dispatchers
+        self._worker_pool = SCPIWorkerPool(workers, name="SCPIHostWorker")
+        self._processes = processes
+        # Created for the first device with process commands.
+        self._process_pool = None
+        self._lock = threading.Lock()
+        self._ready = Queue()
+        self._is_running = threading.Event()
+        self._selector = None
+        self._inputs = dict()
+        # Interfaces whose sessions got pending output from a dispatcher.
+        self._dirty = set()
+        self._wakeup_r = None
+        self._wakeup_w = None
+        self._watchdog_wakeup = threading.Event()
+        self._threads = list()
+        self._io_thread = None
+
+    def add_device(self, device):
+        """Add ``device``, whose interfaces were specified with
+        ``SCPIDevice.create_interface()``. Devices cannot be added while
+        the host is running. A hosted device is stopped by ``stop()`` of
+        the host."""
+        if self._io_thread is not None:
+            raise Exception("Devices must be added before start().")
+        self._devices.append(device)
+
+    def get_devices(self):
+        return list(self._devices)
+
+    def get_threads(self):
+        """Return the threads of the host. Data handler threads of
+        interfaces which do not share the event loop are not included."""
+        return list(self._threads)
+
+    def start(self):
+        """Instantiate the interfaces of all devices and start the threads.
+        Devices whose interfaces cannot be instantiated are logged and
+        skipped."""
+        if self._io_thread is not None:
+            return False
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(0)
+        self._wakeup_w.setblocking(0)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ,
+            self._handle_wakeup)
+        self._is_running.set()
+        self._watchdog_wakeup.clear()
+        self._io_thread = threading.Thread(target=self._run_loop,
+            name="SCPIHost")
+        self._io_thread.daemon = True
+        self._inputs = dict()
+        self._queues = list()
+        for device in self._devices:
+            queue = _DeviceQueue(self, device)
+            try:
+                device._start_hosted(queue, self._io_thread,
+                    self._worker_pool, self._get_process_pool)
+            except Exception as e:
+                log.error("Could not start device {}: {}", device, e)
+                continue
+            self._queues.append(queue)
+            for interface, thread in device.get_handlers():
+                if thread is not self._io_thread:
+                    continue
+                inputs = _SelectorInputs(self._selector, interface, queue)
+                for sock in interface.get_inputs():
+                    inputs.append(sock)
+                self._inputs[interface] = inputs
+        self._threads = [self._io_thread]
+        for i in range(self._dispatchers):
+            self._threads.append(threading.Thread(target=self._dispatch,
+                name="SCPIHostDispatcher-{}".format(i)))
+        self._threads.append(threading.Thread(target=self._run_watchdog,
+            name="SCPIHostWatchdog"))
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+        log.info("Host started {} devices.", len(self._queues))
+        return True
+
+    def _get_process_pool(self):
+        if self._process_pool is None:
+            # Imported on demand like in ``SCPIDevice.add_command()``.
+            from .process import SCPIProcessPool
+            self._process_pool = SCPIProcessPool(self._processes)
+        return self._process_pool
+
+    def _wakeup(self):
+        try:
+            self._wakeup_w.send(b"\0")
+        except Exception:
+            # A wakeup is pending anyway or the host was stopped.
+            pass
+
+    def _handle_wakeup(self, sock, mask):
+        try:
+            while sock.recv(64):
+                pass
+        except Exception:
+            pass
+        with self._lock:
+            dirty = self._dirty
+            self._dirty = set()
+        for interface in dirty:
+            inputs = self._inputs.get(interface)
+            if inputs is not None:
+                inputs.update_outputs()
+
+    def _run_loop(self):
+        selector = self._selector
+        while self._is_running.is_set():
+            events = selector.select(SCPIDeviceHost.SELECT_TIMEOUT)
+            for key, mask in events:
+                try:
+                    key.data(key.fileobj, mask)
+                except Exception as e:
+                    log.error("Host: Could not handle socket {}: {}",
+                        key.fileobj, e)
+        log.debug("Host I/O loop has stopped.")
+
+    def _schedule(self, queue, session):
+        with self._lock:
+            queue.sessions.append(session)
+            if queue.scheduled:
+                return
+            queue.scheduled = True
+        self._ready.put(queue)
+
+    def _dispatch(self):
+        while True:
+            queue = self._ready.get()
+            if queue is None or not self._is_running.is_set():
+                break
+            with self._lock:
+                session = queue.sessions.popleft()
+            try:
+                queue.device._process_session(session)
+            except Exception as e:
+                log.error("Host: Could not process message of {}: {}",
+                    session, e)
+            if session.has_pending_output():
+                # The response is sent by the I/O thread when the client
+                # reads again.
+                with self._lock:
+                    self._dirty.add(session.interface)
+                self._wakeup()
+            with self._lock:
+                queue.scheduled = bool(queue.sessions)
+                if not queue.scheduled:
+                    continue
+            self._ready.put(queue)
+
+    def _run_watchdog(self):
+        """Check all devices. The next check is due when the earliest
+        check of a device is due. See ``scpidev.watchdog``."""
+        while self._is_running.is_set():
+            wait = None
+            for queue in self._queues:
+                try:
+                    next_check = queue.device.get_watchdog().check()
+                except Exception as e:
+                    log.error("Watchdog check of {} failed: {}",
+                        queue.device, e)
+                    next_check = 1.
+                if wait is None or next_check < wait:
+                    wait = next_check
+            if wait is None:
+                wait = 1.
+            self._watchdog_wakeup.wait(wait)
+        log.info("Host watchdog has stopped.")
+
+    def stop(self, timeout=5.):
+        """Stop all devices. Queued messages are discarded. Actions which
+        are currently executed may finish within ``timeout`` seconds
+        (``None``: no limit). The sockets of all interfaces are closed
+        before this method returns. Return ``True`` if all threads finished
+        in time."""
+        if self._io_thread is None:
+            return True
+        if timeout is not None:
+            t_end = time.monotonic() + timeout
+        self._is_running.clear()
+        self._wakeup()
+        self._watchdog_wakeup.set()
+        for _ in range(self._dispatchers):
+            self._ready.put(None)
+        handlers = list()
+        for queue in self._queues:
+            queue.device._stop_hosted()
+            handlers.extend(queue.device.get_handlers())
+        threads = list(self._threads)
+        threads.extend(thread for _, thread in handlers
+            if thread is not self._io_thread)
+        stopped = True
+        for thread in threads:
+            remaining = None
+            if timeout is not None:
+                remaining = max(t_end - time.monotonic(), 0.)
+            thread.join(timeout=remaining)
+            if thread.is_alive():
+                log.warning("Thread '{}' did not finish within {} s.",
+                    thread.name, timeout)
+                stopped = False
+        for interface, thread in handlers:
+            if thread is self._io_thread or thread.is_alive():
+                try:
+                    interface.close()
+                except Exception as e:
+                    log.warning("Could not close {}: {}", interface, e)
+        self._selector.close()
+        self._wakeup_r.close()
+        self._wakeup_w.close()
+        self._inputs = dict()
+        self._ready = Queue()
+        self._worker_pool.shutdown()
+        if self._process_pool is not None:
+            self._process_pool.shutdown()
+        self._io_thread = None
+        log.debug("Host has stopped.")
+        return stopped
@@ -1,7 +1,3 @@
-try:
-    import logging
-except ImportError:
-    import scpidev.logging_mockup as logging
 import socket
 import time
 import threading
@@ -22,63 +18,172 @@ except ImportError:
         "communication interface will not work. Try to install the package "
         "with `python -m pip install pyserial`.")
 
+from . import log
 from . import utils
+from . import metrics
+from .session import SCPISession
 
 
 class SCPIInterfaceBase(object):
     """The abstract base class for interfaces. Inherited classes must
-    implement the abstract methods."""
+    implement the abstract methods.
+
+    Each interface creates an ``SCPISession`` for every client. Received
+    program messages are put into the session's input queue and the session
+    is put into the ``recv_queue`` of the device once per message.
+
+    ``stop()`` wakes up the data handler immediately through a socket pair,
+    whose reading end is part of the select loop.
+    """
     def __init__(self):
         self._is_running = threading.Event()
-        self._recv_string_rest = ""
+        self._is_running.set()
+        self._session_last = None
+        self._clear_handler = None
+        self._talk_handler = None
+        self._metrics = None
+        self._heartbeat = None
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(0)
+        self._wakeup_w.setblocking(0)
 
     def stop(self):
+        """Let the data handler finish. Can be called before the data handler
+        was started."""
         self._is_running.clear()
+        try:
+            self._wakeup_w.send(b"\0")
+        except Exception:
+            # The buffer is full, i.e. a wakeup is pending anyway, or the
+            # interface is already closed.
+            pass
 
-    def _parselines(self, recv_data):
-        """Returns a list of lines with line end characters. ``None`` if the
-        recv_data is an empty string. An empty list is return if no newline
-        character was received.
+    def is_running(self):
+        """Return ``False`` after ``stop()`` was called."""
+        return self._is_running.is_set()
 
-        Todo: This function is quite a plague to implement. Need to find out
-        better methods...
-        """
-        if not recv_data:
-            # Remote host closed the connection when an empty string is
-            # received. In that case, the rest string buffer is cleared.
-            self._recv_string_rest = ""
-            return None
-        recv_string_list = list([""])
-        recv_string = self._recv_string_rest + recv_data.decode("utf8")
-        if "\n" in recv_string:
-            # TODO:
-            # - splitlines is also splitting lines for \r and others.
-            # Usuall only \n is should be used as command delimiter.
-            recv_string_list = recv_string.splitlines(True)
-            last_string = recv_string_list.pop()
-            if "\n" in last_string:
-                self._recv_string_rest = ""
-                recv_string_list.append(last_string)
-            else:
-                self._recv_string_rest = last_string
+    def _drain_wakeup(self):
+        try:
+            while self._wakeup_r.recv(64):
+                pass
+        except Exception:
+            pass
+
+    def _close_wakeup(self):
+        self._wakeup_r.close()
+        self._wakeup_w.close()
+
+    def close(self):
+        """Close all sessions and release the resources, e.g. sockets. Called
+        at the end of ``data_handler()``, by the watchdog if the data handler
+        has died and by ``SCPIDevice.stop()`` if the data handler did not
+        finish in time."""
+        for session in self.get_sessions():
+            session.close()
+        self._close_wakeup()
+
+    def get_heartbeat(self):
+        """Return the time (``time.monotonic()``) of the last iteration of the
+        data handler loop. ``None`` if the interface does not report
+        heartbeats, e.g. because its loop blocks while idle."""
+        return self._heartbeat
+
+    def set_clear_handler(self, clear_handler):
+        """Set the function which is called with the session as argument
+        when a device clear was requested by a client."""
+        self._clear_handler = clear_handler
+
+    def set_talk_handler(self, talk_handler):
+        """Set the function which is called with the session as argument
+        when a client requested a response. It returns ``False`` if no
+        response is pending."""
+        self._talk_handler = talk_handler
+
+    def set_metrics(self, metrics):
+        """Set the ``SCPIMetrics`` instance which records the traffic of this
+        interface. Must be called before ``data_handler()`` is started."""
+        self._metrics = metrics
+
+    def _create_session(self, send, name):
+        return SCPISession(self, send=send, name=name,
+            timed=self._metrics is not None)
+
+    def device_clear(self, session):
+        """Discard all pending work of ``session``."""
+        if self._clear_handler is not None:
+            self._clear_handler(session)
         else:
-            self._recv_string_rest = recv_string
-        return recv_string_list
+            session.clear()
+
+    def request_response(self, session):
+        """The client of ``session`` requests a response. Return ``False``
+        if no response is pending."""
+        if self._talk_handler is not None:
+            return self._talk_handler(session)
+        return session.request_response()
+
+    def _put_messages(self, session, recv_data, recv_queue):
+        """Feed ``recv_data`` into the session and notify the device for
+        each complete program message."""
+        n = session.feed(recv_data)
+        if self._metrics is not None:
+            self._metrics.record_received(self, len(recv_data), n)
+        self._session_last = session
+        for _ in range(n):
+            recv_queue.put(session)
 
-    @abc.abstractmethod
     def write(self, data):
+        """Write ``data`` to the client which most recently sent data."""
         bytes_written = 0
+        if self._session_last is not None:
+            bytes_written = self._session_last.write(data)
         return bytes_written
 
+    def get_inputs(self):
+        """Return the sockets which are watched for incoming data, e.g. the
+        listening socket. ``None`` if the interface cannot share an event
+        loop, because ``data_handler()`` blocks otherwise. See
+        ``scpidev.host``."""
+        return None
+
+    def get_outputs(self):
+        """Return the sockets of sessions with pending output."""
+        return []
+
+    def handle_readable(self, sock, inputs, recv_queue):
+        """Handle incoming data on ``sock``, which is one of ``inputs``.
+        Sockets of new connections are appended to ``inputs`` and closed
+        sockets are removed."""
+        raise NotImplementedError()
+
+    def handle_writable(self, sock):
+        """Send the pending output of the session of ``sock``."""
+        pass
+
     @abc.abstractmethod
     def data_handler(self, recv_queue):
         while self._is_running.is_set():
-            time.sleep(1)
+            select.select([self._wakeup_r], [], [], 1)
+            self._drain_wakeup()
 
 
 class SCPIInterfaceTCP(SCPIInterfaceBase):
+    """TCP interface. Every client connection gets its own session. When a
+    ``control_port`` is given, an additional control socket is bound. A
+    client sending ``DCL <port>`` on a control connection clears its own
+    session, i.e. the connection from the same host and the local ``port``
+    of the client. Other sessions are not affected. The control connection
+    acknowledges the clear by echoing ``DCL`` or answers ``ERR`` if there
+    is no such session.
+
+    ``MTA <port>`` requests the next response of the session like
+    addressing a GPIB device to talk. The control connection answers
+    ``MTA`` if there is a response for the request, i.e. a query was sent
+    before. Otherwise, error -420 (Query UNTERMINATED) is reported and
+    ``-420`` is answered."""
     SELECT_TIMEOUT = 1
     BUFFER_SIZE = 1024
+    MAX_CONNECTIONS = 8
 
     def __init__(self, *args, **kwargs):
         """Instantiates a TCP interface and binds to the socket. Exceptions
@@ -94,113 +199,225 @@ class SCPIInterfaceTCP(SCPIInterfaceBase):
             port = kwargs["port"]
         else:
             port = 5025
+        if "max_connections" in kwargs:
+            self._max_connections = kwargs["max_connections"]
+        else:
+            self._max_connections = SCPIInterfaceTCP.MAX_CONNECTIONS
 
         # Initialize member variables.
         self._addr = (local_host, port)
-        self._socket_remote = None
-        self._remote_addr = None
-        self._recv_string_rest = ""
+        self._sessions = dict()
+        self._control_connections = list()
+        self._inputs = list()
 
         # Bind to TCP socket. Exceptions must be handled by instance holder.
-        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self._socket.setblocking(0)
-        self._socket.bind(self._addr)
-        logging.info("TCP socket bound to {}. Waiting for client connection"
-            .format(self._addr))
+        # The socket listens right away, so clients can connect before the
+        # data handler runs.
+        self._socket = self._bind(self._addr)
+        self._socket.listen(self._max_connections)
+        log.info("TCP socket bound to {}. Waiting for client connection",
+            self._addr)
+        self._socket_control = None
+        if kwargs.get("control_port") is not None:
+            self._addr_control = (local_host, kwargs["control_port"])
+            self._socket_control = self._bind(self._addr_control)
+            self._socket_control.listen(1)
+            log.info("TCP control socket bound to {}.", self._addr_control)
 
     def __str__(self):
         return "TCP Interface {}".format(self._addr)
 
-    def write(self, data):
-        bytes_written = None
-        if self._socket_remote:
-            bytes_written = self._socket_remote.send(data.encode("utf8"))
-        return bytes_written
+    def _bind(self, addr):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setblocking(0)
+        sock.bind(addr)
+        return sock
+
+    def get_sessions(self):
+        """Return a list of the currently open sessions."""
+        return list(self._sessions.values())
+
+    def _accept(self, inputs):
+        sock_remote, addr_remote = self._socket.accept()
+        if len(self._sessions) >= self._max_connections:
+            log.warning("TCP connection from {} refused. Too many "
+                "connections.", addr_remote)
+            sock_remote.close()
+            return
+        sock_remote.setblocking(0)
+        session = self._create_session(sock_remote.send, str(addr_remote))
+        self._sessions[sock_remote] = session
+        inputs.append(sock_remote)
+        log.info("TCP client connection established: {}", addr_remote)
+
+    def _close(self, sock, inputs):
+        if sock in inputs:
+            inputs.remove(sock)
+        session = self._sessions.pop(sock, None)
+        if session is not None:
+            session.close()
+            if session is self._session_last:
+                self._session_last = None
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except Exception:
+            pass
+        sock.close()
+
+    def _handle_control(self, sock, inputs):
+        try:
+            recv_data = sock.recv(SCPIInterfaceTCP.BUFFER_SIZE)
+        except Exception:
+            recv_data = b""
+        if not recv_data:
+            inputs.remove(sock)
+            self._control_connections.remove(sock)
+            sock.close()
+            return
+        for line in recv_data.upper().split(b"\n"):
+            request = line.split()
+            if not request or request[0] not in (b"DCL", b"MTA"):
+                continue
+            session = None
+            if len(request) == 2 and request[1].isdigit():
+                session = self._find_session(
+                    (sock.getpeername()[0], int(request[1])))
+            if session is None:
+                log.info("TCP control request for unknown session: {!r}",
+                    line)
+                reply = b"ERR\n"
+            elif request[0] == b"MTA":
+                reply = b"MTA\n"
+                if not self.request_response(session):
+                    reply = b"-420\n"
+            else:
+                self.device_clear(session)
+                log.info("TCP device clear requested for {}.", session)
+                reply = b"DCL\n"
+            try:
+                sock.send(reply)
+            except Exception:
+                pass
+
+    def _find_session(self, addr):
+        """Return the session of the client connection from ``addr``."""
+        for sock, session in self._sessions.items():
+            try:
+                if sock.getpeername()[:2] == addr:
+                    return session
+            except OSError:
+                pass
+        return None
+
+    def get_inputs(self):
+        inputs = [self._socket]
+        if self._socket_control is not None:
+            inputs.append(self._socket_control)
+        return inputs
+
+    def get_outputs(self):
+        return [sock for sock, session in self._sessions.items()
+            if session.has_pending_output()]
+
+    def handle_readable(self, sock, inputs, recv_queue):
+        if sock is self._socket:
+            # The server is able to accept connections.
+            self._accept(inputs)
+        elif sock is self._socket_control:
+            sock_control, _ = sock.accept()
+            sock_control.setblocking(0)
+            self._control_connections.append(sock_control)
+            inputs.append(sock_control)
+        elif sock in self._control_connections:
+            self._handle_control(sock, inputs)
+        elif sock in self._sessions:
+            # The client has sent data.
+            try:
+                recv_data = sock.recv(SCPIInterfaceTCP.BUFFER_SIZE)
+            except Exception as e:
+                log.debug("TCP recv exception: {}", e)
+                recv_data = b""
+            log.debug("TCP received data: {!r}", recv_data)
+            if not recv_data:
+                # Received empty string => Connection closed by client.
+                # Pending work of the session is discarded.
+                self._close(sock, inputs)
+                log.info("TCP connection closed by client.")
+            else:
+                self._put_messages(self._sessions[sock], recv_data,
+                    recv_queue)
+
+    def handle_writable(self, sock):
+        session = self._sessions.get(sock)
+        if session is not None:
+            session.flush()
 
     def data_handler(self, recv_queue):
         """The ``data_handler()`` function will handle the connections to the
-        clients, receive data and fill the ``recv_queue`` with received
-        commands. It will run until ``stop()`` is called.
+        clients, receive data and fill the ``recv_queue`` with sessions which
+        have received commands. It will run until ``stop()`` is called.
 
         TODO: Currently, I commented the exception handler out. This is
         because I want some errors during development to pop up. For
         production code, the data_handler should be self-sustaining.
         """
-        inputs = [self._socket]
-        self._socket.listen(1)
+        inputs = self.get_inputs() + [self._wakeup_r]
+        self._inputs = inputs
 
-        self._is_running.set()
-        while self._is_running.is_set() and inputs:
-            # A timeout must be set to be able to catch the stop() event.
+        while self._is_running.is_set():
+            self._heartbeat = time.monotonic()
+            # Sockets of sessions with pending output are checked for
+            # writability, so that responses for slow clients are sent as
+            # soon as possible.
+            outputs = self.get_outputs()
+            # The timeout keeps the heartbeat going while idle. ``stop()``
+            # wakes the select up through the wakeup socket.
             readables, writeables, exceptionals = select.select(
-                inputs, [], inputs, SCPIInterfaceTCP.SELECT_TIMEOUT)
+                inputs, outputs, inputs, SCPIInterfaceTCP.SELECT_TIMEOUT)
 
             for readable in readables:
-                if readable is self._socket:
-                    # The server is able to accept connections.
-                    if self._socket_remote is None:
-                        self._socket_remote, self._remote_addr = \
-                            readable.accept()
-                        self._socket_remote.setblocking(0)
-                        inputs.append(self._socket_remote)
-                        logging.info("TCP client connection established: {}"
-                            .format(self._remote_addr))
+                if readable is self._wakeup_r:
+                    self._drain_wakeup()
                 else:
-                    # The client has sent data.
-                    try:
-                        recv_data = readable.recv(SCPIInterfaceTCP.BUFFER_SIZE)
-                    except Exception as e:
-                        logging.debug("TCP recv exception: {}".format(e))
-                        recv_data = b""
-                    logging.debug("TCP received data: {!r}".format(recv_data))
-                    recv_data_list = self._parselines(recv_data)
-                    if recv_data_list is None:
-                        # Received empty string => Connection closed by
-                        # client.
-                        inputs.remove(readable)
-                        readable.close()
-                        if readable is self._socket_remote:
-                            self._socket_remote = None
-                            self._remote_addr = None
-                        logging.info("TCP connection closed by client.")
-                    else:
-                        # Received ordinary data. Parse lines and put into the
-                        # receive queue.
-                        for recv_string in recv_data_list:
-                            if recv_string:
-                                data = (self, recv_string)
-                                recv_queue.put(data)
+                    self.handle_readable(readable, inputs, recv_queue)
 
-            for exceptional in exceptionals:
-                logging.warning("TCP Handler: Got one exceptional: {}"
-                    .format(exceptional))
-                inputs.remove(exceptional)
-                exceptional.close()
+            for writeable in writeables:
+                self.handle_writable(writeable)
 
-        # Close all open sockets.
-        try:
-            self._socket_remote.shutdown(socket.SHUT_RDWR)
-        except:
-            pass
-        try:
-            self._socket_remote.close()
-        except:
-            pass
-        self._socket_remote = None
-        self._remote_addr = None
-        for s in inputs:
+            for exceptional in exceptionals:
+                log.warning("TCP Handler: Got one exceptional: {}",
+                    exceptional)
+                if exceptional in self._sessions:
+                    self._close(exceptional, inputs)
+
+        self.close()
+        log.info("TCP handler has stopped. {}", self._addr)
+
+    def close(self):
+        """Close all sessions, control connections and the bound sockets."""
+        for sock in list(self._sessions):
+            self._close(sock, self._inputs)
+        socks = [self._socket] + self._control_connections
+        if self._socket_control is not None:
+            socks.append(self._socket_control)
+        for s in socks:
             try:
                 s.shutdown(socket.SHUT_RDWR)
             except:
                 pass
             s.close()
-        logging.info("TCP handler has stopped. {}".format(self._addr))
+        self._control_connections = list()
+        self._inputs = list()
+        self._close_wakeup()
 
 
 class SCPIInterfaceUDP(SCPIInterfaceBase):
+    """UDP interface. Every remote address gets its own session. Responses
+    are sent to the address from which the command was received."""
     SELECT_TIMEOUT = 1
     BUFFER_SIZE = 1024
+    MAX_SESSIONS = 32
 
     def __init__(self, *args, **kwargs):
         SCPIInterfaceBase.__init__(self)
@@ -217,46 +434,212 @@ class SCPIInterfaceUDP(SCPIInterfaceBase):
 
         # Initialize member variables.
         self._addr = (local_host, port)
-        self._addr_target = None,
+        self._sessions = dict()
 
         # Bind server socket.
         self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self._socket.setblocking(0)
         self._socket.bind(self._addr)
-        logging.info("UDP socket bound to {}.".format(self._addr))
+        log.info("UDP socket bound to {}.", self._addr)
 
     def __str__(self):
         return "UDP Interface {}".format(self._addr)
 
-    def write(self, data):
-        """Data will be sent to the host which most recently sent data to
-        this interface."""
-        bytes_written = 0
-        if self._addr_target is not None:
-            data = data.encode("utf8")
-            bytes_written = self._socket.sendto(data, self._addr_target)
-        return bytes_written
+    def get_sessions(self):
+        """Return a list of the currently known sessions."""
+        return list(self._sessions.values())
+
+    def _get_session(self, addr_remote):
+        session = self._sessions.get(addr_remote)
+        if session is None:
+            if len(self._sessions) >= SCPIInterfaceUDP.MAX_SESSIONS:
+                # Drop the oldest session.
+                addr_oldest = next(iter(self._sessions))
+                self._sessions.pop(addr_oldest).close()
+            sock = self._socket
+            def send(data):
+                return sock.sendto(data, addr_remote)
+            session = self._create_session(send, str(addr_remote))
+            self._sessions[addr_remote] = session
+        return session
+
+    def get_inputs(self):
+        return [self._socket]
+
+    def handle_readable(self, sock, inputs, recv_queue):
+        recv_data, addr_remote = sock.recvfrom(SCPIInterfaceUDP.BUFFER_SIZE)
+        log.debug("UDP received data from {}: {!r}", addr_remote, recv_data)
+        if recv_data:
+            self._put_messages(self._get_session(addr_remote), recv_data,
+                recv_queue)
 
     def data_handler(self, recv_queue):
-        inputs = [self._socket]
+        inputs = self.get_inputs() + [self._wakeup_r]
 
-        self._is_running.set()
-        while self._is_running.is_set() and inputs:
+        while self._is_running.is_set():
+            self._heartbeat = time.monotonic()
             readables, _, _ = select.select(
                 inputs, [], inputs, SCPIInterfaceUDP.SELECT_TIMEOUT)
 
             for readable in readables:
-                recv_data, self._addr_target = readable.recvfrom(
-                    SCPIInterfaceUDP.BUFFER_SIZE)
-                logging.debug("UDP received data from {}: {!r}".format(
-                    self._addr_target, recv_data))
-                recv_string_list = self._parselines(recv_data)
-                if recv_string_list is not None:
-                    for recv_string in recv_string_list:
-                        data = (self, recv_string)
-                        recv_queue.put(data)
+                if readable is self._wakeup_r:
+                    self._drain_wakeup()
+                else:
+                    self.handle_readable(readable, inputs, recv_queue)
+        self.close()
+        log.info("UDP handler has stopped. {}", self._addr)
+
+    def close(self):
+        for session in self.get_sessions():
+            session.close()
+        self._sessions = dict()
         self._socket.close()
-        logging.info("UDP handler has stopped. {}".format(self._addr))
+        self._close_wakeup()
+
+class SCPIInterfaceMetrics(SCPIInterfaceBase):
+    """A minimal HTTP server which serves the device metrics in the
+    OpenMetrics text format on ``GET /metrics``. It does not receive SCPI
+    commands. ``render`` is a function which returns the metrics text."""
+    SELECT_TIMEOUT = 1
+    BUFFER_SIZE = 1024
+
+    def __init__(self, render, *args, **kwargs):
+        SCPIInterfaceBase.__init__(self)
+        self._render = render
+
+        # Check input variables.
+        if "ip" in kwargs:
+            local_host = kwargs["ip"]
+        else:
+            local_host = "0.0.0.0"
+        if "port" in kwargs:
+            port = kwargs["port"]
+        else:
+            port = 9100
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.setblocking(0)
+        self._socket.bind((local_host, port))
+        self._socket.listen(5)
+        self._addr = self._socket.getsockname()
+        self._inputs = [self._socket, self._wakeup_r]
+        # Sessions hold the responses which are not sent yet.
+        self._sessions = dict()
+        log.info("Metrics HTTP socket bound to {}.", self._addr)
+
+    def __str__(self):
+        return "Metrics Interface {}".format(self._addr)
+
+    def get_address(self):
+        return self._addr
+
+    def get_sessions(self):
+        return []
+
+    def _respond(self, request):
+        """Return the HTTP response to ``request`` as a tuple of buffers."""
+        request_line = request.split(b"\r\n", 1)[0].split()
+        if (len(request_line) >= 2 and request_line[0] == b"GET"
+                and request_line[1].split(b"?")[0] == b"/metrics"):
+            status = "200 OK"
+            content_type = metrics.OPENMETRICS_CONTENT_TYPE
+            try:
+                body = self._render().encode("utf8")
+            except Exception as e:
+                log.warning("Could not render metrics: {}", e)
+                status = "500 Internal Server Error"
+                content_type = "text/plain"
+                body = b""
+        else:
+            status = "404 Not Found"
+            content_type = "text/plain"
+            body = b""
+        header = ("HTTP/1.1 {}\r\nContent-Type: {}\r\nContent-Length: {}"
+            "\r\nConnection: close\r\n\r\n".format(
+                status, content_type, len(body)))
+        return (header.encode("utf8"), body)
+
+    def _send(self, sock, data=None):
+        """Put ``data`` into the output queue of the session of ``sock`` and
+        send as much as possible without blocking. The rest is sent when the
+        socket is writable. The connection is closed when all data was
+        sent."""
+        session = self._sessions[sock]
+        try:
+            if data is None:
+                session.flush()
+            else:
+                session.write(data)
+        except Exception as e:
+            log.debug("Metrics send exception: {}", e)
+            session.clear_output()
+        if not session.has_pending_output():
+            self._close(sock)
+
+    def _close(self, sock):
+        if sock in self._inputs:
+            self._inputs.remove(sock)
+        session = self._sessions.pop(sock, None)
+        if session is not None:
+            session.close()
+        sock.close()
+
+    def data_handler(self, recv_queue):
+        inputs = self._inputs
+        requests = dict()
+
+        while self._is_running.is_set():
+            self._heartbeat = time.monotonic()
+            # Responses for slow scrapers are sent when their socket is
+            # writable, so that the loop never blocks.
+            outputs = [sock for sock, session in self._sessions.items()
+                if session.has_pending_output()]
+            readables, writeables, _ = select.select(
+                inputs, outputs, [], self.SELECT_TIMEOUT)
+
+            for readable in readables:
+                if readable is self._wakeup_r:
+                    self._drain_wakeup()
+                    continue
+                if readable is self._socket:
+                    sock, addr_remote = readable.accept()
+                    sock.setblocking(0)
+                    inputs.append(sock)
+                    requests[sock] = b""
+                    self._sessions[sock] = self._create_session(sock.send,
+                        str(addr_remote))
+                    continue
+                try:
+                    recv_data = readable.recv(SCPIInterfaceMetrics.BUFFER_SIZE)
+                except Exception:
+                    recv_data = b""
+                request = requests[readable] + recv_data
+                requests[readable] = request
+                if recv_data and b"\r\n\r\n" not in request:
+                    continue
+                del requests[readable]
+                # The request is complete. Further data is not read.
+                inputs.remove(readable)
+                if recv_data:
+                    self._send(readable, self._respond(request))
+                else:
+                    self._close(readable)
+
+            for writeable in writeables:
+                if writeable in self._sessions:
+                    self._send(writeable)
+        self.close()
+        log.info("Metrics handler has stopped. {}", self._addr)
+
+    def close(self):
+        for sock in list(self._sessions):
+            self._close(sock)
+        for s in self._inputs:
+            s.close()
+        self._inputs = list()
+        self._wakeup_w.close()
+
 
 class SCPIInterfaceSerial(SCPIInterfaceBase):
     def __init__(self, *args, **kwargs):
@@ -271,20 +654,37 @@ class SCPIInterfaceSerial(SCPIInterfaceBase):
         # self._port = kwargs["port"]
         # self._baud = kwargs["baudrate"]
         self._serial = serial.Serial(*args, **kwargs)
+        self._session = None
 
     def __str__(self):
         return "Serial"
 
-    def write(self, data):
-        raise NotImplementedError
+    def get_sessions(self):
+        if self._session is None:
+            return []
+        return [self._session]
 
     def data_handler(self, recv_queue):
+        self._session = self._create_session(self._serial.write,
+            self._serial.port)
         if not self._serial.is_open:
             self._serial.open()
-        self._is_running.set()
         while self._is_running.is_set():
-            recv_string = self._serial.readline().decode("utf8")
-            data = (self, recv_string)
-            recv_queue.put(data)
-            time.sleep(1)
+            recv_data = self._serial.readline()
+            if recv_data:
+                self._put_messages(self._session, recv_data, recv_queue)
+        self.close()
+
+    def stop(self):
+        SCPIInterfaceBase.stop(self)
+        try:
+            # Interrupt a blocking readline(). Available since pyserial 3.1.
+            self._serial.cancel_read()
+        except Exception:
+            pass
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
         self._serial.close()
+        self._close_wakeup()
@@ -1,13 +1,35 @@
+from . import utils
+
+
 class SCPIKeyword():
-    def __init__(self, keyword_tuple, is_optional=False):
-        self._keyword_tuple = keyword_tuple
+    """A mnemonic of a command definition. If ``has_suffix`` is ``True``,
+    the mnemonic takes a numeric suffix, e.g. ``SOURce#`` matches ``SOUR``,
+    ``SOUR2`` and ``SOURCE12``. Literal digits at the end of the mnemonic
+    belong to the short and the long form, e.g. ``OUTPut2`` matches
+    ``OUTP2`` and ``OUTPUT2``."""
+    __slots__ = ("_keyword_tuple", "_is_optional", "_has_suffix", "_digits")
+
+    def __init__(self, keyword_tuple, is_optional=False, has_suffix=False):
+        req, opt = keyword_tuple
+        part = opt if opt else req
+        end = len(part)
+        while end > 0 and part[end - 1].isdigit():
+            end -= 1
+        self._digits = utils.intern(part[end:])
+        if opt:
+            opt = opt[:end]
+        else:
+            req = req[:end]
+        self._keyword_tuple = (utils.intern(req), utils.intern(opt))
         self._is_optional = is_optional
+        self._has_suffix = has_suffix
 
     def __str__(self):
+        suffix = "#" if self._has_suffix else ""
         if self.is_optional():
-            return "[{}]".format(repr(self._keyword_tuple))
+            return "[{}{}]".format(repr(self._keyword_tuple), suffix)
         else:
-            return "{}".format(repr(self._keyword_tuple))
+            return "{}{}".format(repr(self._keyword_tuple), suffix)
 
     def __getitem__(self, key):
         return self._keyword_tuple[key]
@@ -15,24 +37,86 @@ class SCPIKeyword():
     def is_optional(self):
         return self._is_optional
 
+    def has_suffix(self):
+        return self._has_suffix
+
+    def get_digits(self):
+        """Return the literal digits of the mnemonic, e.g. ``"2"`` for
+        ``OUTPut2``."""
+        return self._digits
+
+    def to_tuple(self):
+        """Return the compiled representation ``(req, opt, is_optional)``
+        or, if the keyword takes a numeric suffix, ``(req, opt, is_optional,
+        True)``."""
+        opt = self._keyword_tuple[1] + self._digits
+        if self._has_suffix:
+            return (self._keyword_tuple[0], opt, self._is_optional, True)
+        return (self._keyword_tuple[0], opt, self._is_optional)
+
+
+# Keywords are immutable. Equal keywords of different commands share the same
+# instance.
+_KEYWORD_CACHE = dict()
+
+def create_keyword(req, opt, is_optional, has_suffix=False):
+    """Return a shared ``SCPIKeyword`` instance."""
+    key = (req, opt, is_optional, has_suffix)
+    keyword = _KEYWORD_CACHE.get(key)
+    if keyword is None:
+        keyword = SCPIKeyword((req, opt), is_optional, has_suffix)
+        _KEYWORD_CACHE[key] = keyword
+    return keyword
+
 
 class SCPIKeywordList(list):
+    __slots__ = ()
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
+    def init_compiled(self, compiled_keywords):
+        """Initialize from a tuple of compiled keywords as returned by
+        ``to_tuple()``."""
+        for compiled in compiled_keywords:
+            self.append(create_keyword(*compiled))
+
+    def to_tuple(self):
+        return tuple(keyword.to_tuple() for keyword in self)
+
     def init(self, keyword_string):
+        """Parse ``keyword_string``. A numeric suffix of a mnemonic is
+        declared by ``#`` or ``<n>``, e.g. ``SOURce#:VOLTage`` or
+        ``SOURce<n>:VOLTage``. Other digits are part of the mnemonic, e.g.
+        ``OUTPut2:STATe``."""
         is_optional = False
+        has_suffix = False
+        in_placeholder = False
         str_req = str_opt = ""
 
         for c in keyword_string:
+            if in_placeholder:
+                in_placeholder = c != ">"
+                continue
             if c.isupper() or c == "*":
                 str_req = str_req + c
                 continue
             if c.islower():
                 str_opt = str_opt + c
                 continue
+            if c.isdigit() and str_req:
+                if str_opt:
+                    str_opt = str_opt + c
+                else:
+                    str_req = str_req + c
+                continue
+            if c == "#" or c == "<":
+                has_suffix = True
+                in_placeholder = c == "<"
+                continue
             if str_req:
-                keyword = SCPIKeyword((str_req, str_opt), is_optional)
+                keyword = create_keyword(str_req, str_opt, is_optional,
+                    has_suffix)
                 self.append(keyword)
             if c == "[":
                 is_optional = True
@@ -41,10 +125,12 @@ class SCPIKeywordList(list):
             # if c == ":":
             #     pass
             str_req = str_opt = ""
+            has_suffix = False
 
         # If we reached here and the str_req is not an empty string, all
         # characters were processed without finding any special character.
         # In other words: The keyword string only contains one word.
         if str_req:
-            keyword = SCPIKeyword((str_req, str_opt), is_optional)
+            keyword = create_keyword(str_req, str_opt, is_optional,
+                has_suffix)
             self.append(keyword)
@@ -0,0 +1,292 @@
+"""
+Lexer for received program messages (IEEE 488.2, chapter 7).
+
+``tokenize()`` turns a message into ``(mnemonics, is_query, parameters)``
+in one pass over a ``bytes`` buffer:
+
+- ``mnemonics``: The lower case mnemonics of the header, e.g.
+  ``["meas", "volt"]`` for ``":MEAS:VOLT? 10 mV"``.
+- ``is_query``: ``True`` if the header ends with ``?``.
+- ``parameters``: One token ``(type, text, number, suffix)`` per parameter.
+  ``number`` and ``suffix`` are set for numeric tokens only, e.g.
+  ``(TOKEN_NUMERIC, "10 mV", "10", "mV")``. The text of a block token is
+  the ``bytes`` payload.
+
+The lexer is driven by a table of character classes and needs neither
+regular expressions nor ``str`` methods beyond ``decode()`` and
+``lower()``, so it runs on MicroPython as well.
+"""
+from . import errors
+
+TOKEN_EMPTY = 0
+TOKEN_CHARACTER = 1
+TOKEN_NUMERIC = 2
+TOKEN_STRING = 3
+TOKEN_EXPRESSION = 4
+TOKEN_BLOCK = 5
+# Returned by ``create_token()`` for text which is not one valid parameter.
+TOKEN_INVALID = 6
+
+EMPTY_TOKEN = (TOKEN_EMPTY, "", "", "")
+
+# Character classes. Mnemonics consist of the classes 1 to 3.
+C_OTHER = 0
+C_ALPHA = 1
+C_DIGIT = 2
+C_UNDERSCORE = 3
+C_SPACE = 4
+C_SIGN = 5
+C_POINT = 6
+C_COLON = 7
+C_QUERY = 8
+C_STAR = 9
+C_QUOTE = 10
+C_OPEN = 11
+C_CLOSE = 12
+C_COMMA = 13
+C_HASH = 14
+
+
+def _create_classes():
+    classes = bytearray(256)
+    for c in b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz":
+        classes[c] = C_ALPHA
+    for c in b"0123456789":
+        classes[c] = C_DIGIT
+    for c in b" \t\r\n":
+        classes[c] = C_SPACE
+    for c, cls in ((b"_", C_UNDERSCORE), (b"+", C_SIGN), (b"-", C_SIGN),
+            (b".", C_POINT), (b":", C_COLON), (b"?", C_QUERY),
+            (b"*", C_STAR), (b"'", C_QUOTE), (b'"', C_QUOTE),
+            (b"(", C_OPEN), (b")", C_CLOSE), (b",", C_COMMA),
+            (b"#", C_HASH)):
+        classes[c[0]] = cls
+    return bytes(classes)
+
+CLASSES = _create_classes()
+
+_EXPONENT = (ord("e"), ord("E"))
+
+
+def _error(code, data, i):
+    return errors.SCPIError(code, "at {}: {!r}".format(
+        i, bytes(data[i:i + 8])))
+
+
+def _skip_space(data, i, n):
+    while i < n and CLASSES[data[i]] == C_SPACE:
+        i += 1
+    return i
+
+
+def _scan_mnemonic(data, i, n):
+    """Return the end of the mnemonic starting at ``i``."""
+    if i >= n or CLASSES[data[i]] != C_ALPHA:
+        raise _error(errors.ERR_SYNTAX, data, i)
+    i += 1
+    while i < n and C_ALPHA <= CLASSES[data[i]] <= C_UNDERSCORE:
+        i += 1
+    return i
+
+
+def _scan_header(data, i, n):
+    """Return ``(end, mnemonics, is_query)`` of the header at ``i``."""
+    mnemonics = list()
+    if CLASSES[data[i]] == C_STAR:
+        end = _scan_mnemonic(data, i + 1, n)
+        mnemonics.append(data[i:end].decode().lower())
+        i = end
+    else:
+        if CLASSES[data[i]] == C_COLON:
+            i += 1
+        while True:
+            end = _scan_mnemonic(data, i, n)
+            mnemonics.append(data[i:end].decode().lower())
+            i = end
+            if i < n and CLASSES[data[i]] == C_COLON:
+                i += 1
+                continue
+            break
+    is_query = False
+    if i < n and CLASSES[data[i]] == C_QUERY:
+        is_query = True
+        i += 1
+    if i < n and CLASSES[data[i]] != C_SPACE:
+        raise _error(errors.ERR_INVALID_CHARACTER, data, i)
+    return i, mnemonics, is_query
+
+
+def _scan_numeric(data, i, n):
+    start = i
+    if CLASSES[data[i]] == C_SIGN:
+        i += 1
+    digits = 0
+    while i < n and CLASSES[data[i]] == C_DIGIT:
+        i += 1
+        digits += 1
+    if i < n and CLASSES[data[i]] == C_POINT:
+        i += 1
+        while i < n and CLASSES[data[i]] == C_DIGIT:
+            i += 1
+            digits += 1
+    if not digits:
+        raise _error(errors.ERR_SYNTAX, data, start)
+    # An "E" which is not followed by digits starts the suffix, e.g. "EX".
+    if i < n and data[i] in _EXPONENT:
+        j = i + 1
+        if j < n and CLASSES[data[j]] == C_SIGN:
+            j += 1
+        if j < n and CLASSES[data[j]] == C_DIGIT:
+            i = j
+            while i < n and CLASSES[data[i]] == C_DIGIT:
+                i += 1
+    number = data[start:i].decode()
+    j = _skip_space(data, i, n)
+    k = j
+    while k < n and CLASSES[data[k]] == C_ALPHA:
+        k += 1
+    if k == j:
+        return i, (TOKEN_NUMERIC, number, number, "")
+    return k, (TOKEN_NUMERIC, data[start:k].decode(), number,
+        data[j:k].decode())
+
+
+def _scan_string(data, i, n):
+    start = i
+    quote = data[i:i + 1]
+    i += 1
+    while True:
+        i = data.find(quote, i)
+        if i < 0:
+            raise _error(errors.ERR_INVALID_STRING_DATA, data, start)
+        i += 1
+        # A doubled quote is a quote inside the string.
+        if i < n and data[i] == quote[0]:
+            i += 1
+            continue
+        text = data[start:i].decode()
+        return i, (TOKEN_STRING, text, "", "")
+
+
+def _scan_expression(data, i, n):
+    start = i
+    depth = 0
+    while i < n:
+        cls = CLASSES[data[i]]
+        i += 1
+        if cls == C_OPEN:
+            depth += 1
+        elif cls == C_CLOSE:
+            depth -= 1
+            if depth == 0:
+                return i, (TOKEN_EXPRESSION, data[start:i].decode(), "", "")
+    raise _error(errors.ERR_SYNTAX, data, start)
+
+
+def _scan_block(data, i, n):
+    """Arbitrary block data, ``#<n><length><data>`` or ``#0<data>`` up to
+    the end of the message."""
+    start = i
+    if i + 1 >= n or CLASSES[data[i + 1]] != C_DIGIT:
+        raise _error(errors.ERR_INVALID_BLOCK_DATA, data, start)
+    digits = data[i + 1] - ord("0")
+    i += 2
+    if digits == 0:
+        return n, (TOKEN_BLOCK, bytes(data[i:n]), "", "")
+    try:
+        length = int(data[i:i + digits].decode())
+    except ValueError:
+        raise _error(errors.ERR_INVALID_BLOCK_DATA, data, start)
+    i += digits
+    if i + length > n:
+        raise _error(errors.ERR_INVALID_BLOCK_DATA, data, start)
+    return i + length, (TOKEN_BLOCK, bytes(data[i:i + length]), "", "")
+
+
+def _scan_character(data, i, n):
+    end = _scan_mnemonic(data, i, n)
+    return end, (TOKEN_CHARACTER, data[i:end].decode(), "", "")
+
+
+_SCANNERS = {
+    C_ALPHA: _scan_character,
+    C_DIGIT: _scan_numeric,
+    C_SIGN: _scan_numeric,
+    C_POINT: _scan_numeric,
+    C_QUOTE: _scan_string,
+    C_OPEN: _scan_expression,
+    C_HASH: _scan_block,
+}
+
+
+def _scan_parameter(data, i, n):
+    scanner = _SCANNERS.get(CLASSES[data[i]])
+    if scanner is None:
+        raise _error(errors.ERR_INVALID_CHARACTER, data, i)
+    return scanner(data, i, n)
+
+
+def _scan_parameters(data, i, n):
+    parameters = list()
+    i = _skip_space(data, i, n)
+    if i >= n:
+        return parameters
+    while True:
+        if CLASSES[data[i]] == C_COMMA:
+            parameters.append(EMPTY_TOKEN)
+        else:
+            i, token = _scan_parameter(data, i, n)
+            parameters.append(token)
+            i = _skip_space(data, i, n)
+            if i >= n:
+                return parameters
+            if CLASSES[data[i]] != C_COMMA:
+                raise _error(errors.ERR_SYNTAX, data, i)
+        i = _skip_space(data, i + 1, n)
+        if i >= n:
+            parameters.append(EMPTY_TOKEN)
+            return parameters
+
+
+def _to_bytes(message):
+    if isinstance(message, str):
+        return message.encode()
+    return message
+
+
+def tokenize(message):
+    """Return ``(mnemonics, is_query, parameters)`` of the program message
+    ``message``, which is a ``str`` or a ``bytes`` like object. An empty
+    message results in ``([], False, [])``. Raise a ``SCPIError`` if the
+    message is malformed."""
+    data = _to_bytes(message)
+    n = len(data)
+    i = _skip_space(data, 0, n)
+    if i >= n:
+        return ([], False, [])
+    i, mnemonics, is_query = _scan_header(data, i, n)
+    return (mnemonics, is_query, _scan_parameters(data, i, n))
+
+
+def tokenize_parameters(parameter_string):
+    """Return the parameter tokens of ``parameter_string``, e.g.
+    ``"10 mV, MAX"``. See ``tokenize()``."""
+    data = _to_bytes(parameter_string)
+    return _scan_parameters(data, 0, len(data))
+
+
+def create_token(text):
+    """Return the token of the single parameter ``text``. Surrounding
+    spaces are not allowed. A token of type ``TOKEN_INVALID`` is returned
+    if ``text`` is not exactly one parameter."""
+    if not text:
+        return EMPTY_TOKEN
+    data = _to_bytes(text)
+    n = len(data)
+    try:
+        end, token = _scan_parameter(data, 0, n)
+    except errors.SCPIError:
+        end = -1
+    if end != n:
+        return (TOKEN_INVALID, text, "", "")
+    return token
@@ -0,0 +1,116 @@
+"""
+Logging of the scpidev package. All messages go to the ``scpidev`` logger.
+
+The functions take a ``str.format()`` message and its arguments, e.g.
+``log.debug("TCP received data: {!r}", recv_data)``. The message is only
+formatted if the level is enabled. Therefore, debug messages in the data
+path cost a single level check when debug logging is disabled.
+
+Messages which might be repeated at a high rate, e.g. the alarm which is
+set for every unknown command, should be logged with ``limited()``.
+"""
+try:
+    import utime as time
+except ImportError:
+    import time
+try:
+    import logging
+except ImportError:
+    import scpidev.logging_mockup as logging
+
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+
+logger = logging.getLogger("scpidev")
+
+try:
+    _clock = time.monotonic
+except AttributeError:
+    _clock = time.time
+
+
+class RateLimiter(object):
+    """Let at most ``burst`` messages per key pass within ``interval``
+    seconds. The keys should be taken from a small set, e.g. the message
+    templates, because the state of every key is kept.
+
+    The limiter is not locked. Concurrent callers might let a message more
+    or less pass, which is acceptable for logging."""
+    def __init__(self, interval=1., burst=5):
+        self._interval = interval
+        self._burst = burst
+        # key => [start of the interval, messages passed, messages suppressed]
+        self._state = dict()
+
+    def check(self, key):
+        """Return ``None`` if a message with ``key`` must be suppressed.
+        Otherwise, return the number of messages which were suppressed since
+        the last message that passed."""
+        now = _clock()
+        state = self._state.get(key)
+        if state is None or now - state[0] >= self._interval:
+            suppressed = 0
+            if state is not None:
+                suppressed = state[2]
+            self._state[key] = [now, 1, 0]
+            return suppressed
+        if state[1] < self._burst:
+            state[1] += 1
+            return 0
+        state[2] += 1
+        return None
+
+
+_limiter = RateLimiter()
+
+
+def set_rate_limit(interval, burst):
+    """Configure the rate limit of ``limited()``."""
+    global _limiter
+    _limiter = RateLimiter(interval, burst)
+
+
+def is_enabled(level):
+    return logger.isEnabledFor(level)
+
+
+def _log(level, message, args):
+    if logger.isEnabledFor(level):
+        if args:
+            message = message.format(*args)
+        logger.log(level, message)
+
+
+def debug(message, *args):
+    _log(DEBUG, message, args)
+
+
+def info(message, *args):
+    _log(INFO, message, args)
+
+
+def warning(message, *args):
+    _log(WARNING, message, args)
+
+
+def error(message, *args):
+    _log(ERROR, message, args)
+
+
+def limited(level, key, message, *args):
+    """Log ``message`` unless messages with ``key`` exceeded the rate limit.
+    The number of suppressed messages is appended to the next message which
+    passes."""
+    if not logger.isEnabledFor(level):
+        return
+    suppressed = _limiter.check(key)
+    if suppressed is None:
+        return
+    if args:
+        message = message.format(*args)
+    if suppressed:
+        message = "{} ({} similar messages suppressed)".format(message,
+            suppressed)
+    logger.log(level, message)
@@ -1,11 +1,78 @@
-def debug(message):
-    print(message)
+"""
+A minimal replacement of the ``logging`` module for platforms which do not
+provide it, e.g. MicroPython. Messages are printed if their level is at
+least the configured level.
+"""
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
 
-def info(message):
-    print(message)
+_LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING",
+    ERROR: "ERROR"}
 
-def warning(message):
-    print(message)
 
-def error(message):
-    print(message)
\ No newline at end of file
+class Logger(object):
+    def __init__(self, name):
+        self.name = name
+        self.level = DEBUG
+
+    def setLevel(self, level):
+        self.level = level
+
+    def isEnabledFor(self, level):
+        return level >= self.level
+
+    def log(self, level, message, *args):
+        if level >= self.level:
+            if args:
+                message = message % args
+            print("{}:{}:{}".format(_LEVEL_NAMES.get(level, level), self.name,
+                message))
+
+    def debug(self, message, *args):
+        self.log(DEBUG, message, *args)
+
+    def info(self, message, *args):
+        self.log(INFO, message, *args)
+
+    def warning(self, message, *args):
+        self.log(WARNING, message, *args)
+
+    def error(self, message, *args):
+        self.log(ERROR, message, *args)
+
+
+_root = Logger("root")
+_loggers = dict()
+
+
+def getLogger(name=None):
+    if not name:
+        return _root
+    logger = _loggers.get(name)
+    if logger is None:
+        logger = Logger(name)
+        logger.level = _root.level
+        _loggers[name] = logger
+    return logger
+
+
+def basicConfig(level=None, **kwargs):
+    if level is not None:
+        _root.setLevel(level)
+        for logger in _loggers.values():
+            logger.setLevel(level)
+
+
+def debug(message, *args):
+    _root.debug(message, *args)
+
+def info(message, *args):
+    _root.info(message, *args)
+
+def warning(message, *args):
+    _root.warning(message, *args)
+
+def error(message, *args):
+    _root.error(message, *args)
@@ -0,0 +1,314 @@
+"""
+Optional runtime metrics of a ``SCPIDevice``. Metrics are only recorded if
+the device was created with ``SCPIDevice(metrics=True)``. Otherwise, the
+overhead in the dispatch path is a single attribute check per stage.
+
+All histograms have fixed buckets, so recording a sample does not allocate
+memory. Times are recorded in microseconds.
+"""
+from array import array
+from bisect import bisect_left
+
+# Upper bounds of the histogram buckets in microseconds. The last bucket
+# counts all samples above the last bound.
+BUCKET_BOUNDS = (
+    10, 20, 50, 100, 200, 500,
+    1000, 2000, 5000, 10000, 20000, 50000,
+    100000, 200000, 500000, 1000000, 2000000, 5000000,
+)
+
+STAGE_QUEUE = "queue"
+STAGE_MATCH = "match"
+STAGE_ACTION = "action"
+STAGE_WRITE = "write"
+STAGES = (STAGE_QUEUE, STAGE_MATCH, STAGE_ACTION, STAGE_WRITE)
+
+
+class SCPIHistogram(object):
+    """A histogram with the fixed buckets ``BUCKET_BOUNDS``."""
+    __slots__ = ("_counts", "count", "sum")
+
+    def __init__(self):
+        self._counts = array("L", [0] * (len(BUCKET_BOUNDS) + 1))
+        self.count = 0
+        self.sum = 0
+
+    def record(self, value):
+        """Record one sample. ``value`` is an integer in microseconds."""
+        self._counts[bisect_left(BUCKET_BOUNDS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def get_buckets(self):
+        """Return a list of ``(upper_bound, cumulative_count)`` tuples. The
+        upper bound of the last bucket is ``None`` (infinity)."""
+        buckets = list()
+        cumulative = 0
+        for i, count in enumerate(self._counts):
+            cumulative += count
+            if i < len(BUCKET_BOUNDS):
+                buckets.append((BUCKET_BOUNDS[i], cumulative))
+            else:
+                buckets.append((None, cumulative))
+        return buckets
+
+    def get_percentile(self, p):
+        """Return the upper bound of the bucket which contains the
+        ``p``-th percentile (0..100). ``None`` if no samples were recorded
+        or the percentile lies in the overflow bucket."""
+        if not self.count:
+            return None
+        rank = self.count * p / 100.
+        for upper_bound, cumulative in self.get_buckets():
+            if cumulative >= rank:
+                return upper_bound
+        return None
+
+    def get_summary(self):
+        mean = None
+        if self.count:
+            mean = self.sum / self.count
+        return {
+            "count": self.count,
+            "mean": mean,
+            "p50": self.get_percentile(50),
+            "p99": self.get_percentile(99),
+        }
+
+
+class SCPICommandStats(object):
+    """Counters and latency histograms of one command."""
+    __slots__ = ("executed", "failed", "cached", "match", "action")
+
+    def __init__(self):
+        self.executed = 0
+        self.failed = 0
+        self.cached = 0
+        self.match = SCPIHistogram()
+        self.action = SCPIHistogram()
+
+
+class SCPIInterfaceStats(object):
+    """Traffic counters of one interface."""
+    __slots__ = ("bytes_received", "messages_received", "bytes_sent",
+        "messages_sent")
+
+    def __init__(self):
+        self.bytes_received = 0
+        self.messages_received = 0
+        self.bytes_sent = 0
+        self.messages_sent = 0
+
+
+class SCPIMetrics(object):
+    """The metrics registry of a device. The stages of the dispatch path
+    are:
+
+    - ``queue``: Time from receiving a message in the data handler until the
+      dispatch thread takes it from the session's input queue.
+    - ``match``: Time to find the matching command.
+    - ``action``: Time spent in the command's action.
+    - ``write``: Time to put the response into the session's output queue
+      and send it.
+    """
+    def __init__(self):
+        self._stages = dict((stage, SCPIHistogram()) for stage in STAGES)
+        self._commands = dict()
+        self._interfaces = dict()
+        self.unmatched = 0
+
+    def record(self, stage, value):
+        self._stages[stage].record(value)
+
+    def get_command_stats(self, cmd):
+        stats = self._commands.get(cmd)
+        if stats is None:
+            stats = SCPICommandStats()
+            self._commands[cmd] = stats
+        return stats
+
+    def record_command(self, cmd, match_time, action_time, executed):
+        """Record the match and action time of one execution of ``cmd``.
+        ``cmd`` is ``None`` if no command matched."""
+        self._stages[STAGE_MATCH].record(match_time)
+        if cmd is None:
+            self.unmatched += 1
+            return
+        stats = self.get_command_stats(cmd)
+        stats.match.record(match_time)
+        if executed:
+            stats.executed += 1
+            stats.action.record(action_time)
+            self._stages[STAGE_ACTION].record(action_time)
+        else:
+            stats.failed += 1
+
+    def record_cache_hit(self, cmd):
+        """Count a response of ``cmd`` served from the response cache. It
+        is neither matched nor executed, so no latency is recorded."""
+        self.get_command_stats(cmd).cached += 1
+
+    def get_interface_stats(self, interface):
+        stats = self._interfaces.get(interface)
+        if stats is None:
+            stats = SCPIInterfaceStats()
+            self._interfaces[interface] = stats
+        return stats
+
+    def record_received(self, interface, n_bytes, n_messages):
+        stats = self.get_interface_stats(interface)
+        stats.bytes_received += n_bytes
+        stats.messages_received += n_messages
+
+    def record_sent(self, interface, n_bytes):
+        stats = self.get_interface_stats(interface)
+        stats.bytes_sent += n_bytes
+        stats.messages_sent += 1
+
+    def get_stage(self, stage):
+        return self._stages[stage]
+
+    def get_commands(self):
+        """Return a list of ``(command, SCPICommandStats)`` tuples."""
+        return list(self._commands.items())
+
+    def get_interfaces(self):
+        """Return a list of ``(interface, SCPIInterfaceStats)`` tuples."""
+        return list(self._interfaces.items())
+
+    def get_summary(self):
+        """Return all metrics as a dictionary of basic types."""
+        summary = {
+            "stages": dict((stage, hist.get_summary())
+                for stage, hist in self._stages.items()),
+            "commands": dict(),
+            "interfaces": dict(),
+            "unmatched": self.unmatched,
+        }
+        for cmd, stats in self.get_commands():
+            summary["commands"][cmd.get_name()] = {
+                "executed": stats.executed,
+                "failed": stats.failed,
+                "cached": stats.cached,
+                "match": stats.match.get_summary(),
+                "action": stats.action.get_summary(),
+            }
+        for interface, stats in self.get_interfaces():
+            summary["interfaces"][str(interface)] = {
+                "bytes_received": stats.bytes_received,
+                "messages_received": stats.messages_received,
+                "bytes_sent": stats.bytes_sent,
+                "messages_sent": stats.messages_sent,
+            }
+        return summary
+
+    def render_text(self):
+        """Return a compact text representation with one metric per line.
+        Used by the ``SYSTem:STATistics?`` query."""
+        lines = list()
+        for stage in STAGES:
+            hist = self._stages[stage]
+            lines.append("{},{},{},{}".format(stage, hist.count,
+                hist.get_percentile(50), hist.get_percentile(99)))
+        for cmd, stats in self.get_commands():
+            lines.append("{},{},{},{},{}".format(cmd.get_name(),
+                stats.executed, stats.failed,
+                stats.action.get_percentile(50),
+                stats.action.get_percentile(99)))
+        for interface, stats in self.get_interfaces():
+            lines.append("{},{},{},{},{}".format(interface,
+                stats.messages_received, stats.bytes_received,
+                stats.messages_sent, stats.bytes_sent))
+        return "\n".join(lines)
+
+
+OPENMETRICS_CONTENT_TYPE = ("application/openmetrics-text; version=1.0.0; "
+    "charset=utf-8")
+
+
+def _escape(value):
+    return (str(value).replace("\\", "\\\\").replace("\"", "\\\"")
+        .replace("\n", "\\n"))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join("{}=\"{}\"".format(key, _escape(value))
+        for key, value in labels) + "}"
+
+
+def _render_histogram(lines, name, hist, labels=()):
+    """Append the samples of a histogram. Microseconds are converted into
+    seconds."""
+    for upper_bound, cumulative in hist.get_buckets():
+        if upper_bound is None:
+            le = "+Inf"
+        else:
+            le = "{:g}".format(upper_bound / 1e6)
+        lines.append("{}_bucket{} {}".format(
+            name, _format_labels(tuple(labels) + (("le", le),)), cumulative))
+    lines.append("{}_count{} {}".format(name, _format_labels(labels),
+        hist.count))
+    lines.append("{}_sum{} {:g}".format(name, _format_labels(labels),
+        hist.sum / 1e6))
+
+
+def render_openmetrics(metrics, gauges=(), counters=()):
+    """Render the ``metrics`` (may be ``None``), the ``gauges`` and the
+    ``counters`` in the OpenMetrics text format. ``gauges`` and ``counters``
+    are lists of ``(name, help, samples)`` tuples where ``samples`` is a
+    list of ``(labels, value)`` tuples and ``labels`` a tuple of ``(key,
+    value)`` tuples. The samples of counters get the suffix ``_total``.
+
+    The counters are read without locking. Values of one scrape might be
+    slightly inconsistent, but the dispatch path is never blocked."""
+    lines = list()
+    for name, help, samples in gauges:
+        lines.append("# TYPE {} gauge".format(name))
+        lines.append("# HELP {} {}".format(name, help))
+        for labels, value in samples:
+            lines.append("{}{} {}".format(name, _format_labels(labels), value))
+    for name, help, samples in counters:
+        lines.append("# TYPE {} counter".format(name))
+        lines.append("# HELP {} {}".format(name, help))
+        for labels, value in samples:
+            lines.append("{}_total{} {}".format(name, _format_labels(labels),
+                value))
+    if metrics is not None:
+        lines.append("# TYPE scpidev_commands counter")
+        lines.append("# HELP scpidev_commands Number of commands by result.")
+        commands = metrics.get_commands()
+        for cmd, stats in commands:
+            for result, value in (("executed", stats.executed),
+                    ("failed", stats.failed), ("cached", stats.cached)):
+                labels = (("command", cmd.get_name()), ("result", result))
+                lines.append("scpidev_commands_total{} {}".format(
+                    _format_labels(labels), value))
+        lines.append("scpidev_commands_total{} {}".format(
+            _format_labels((("command", ""), ("result", "unmatched"))),
+            metrics.unmatched))
+        lines.append("# TYPE scpidev_action_latency_seconds histogram")
+        lines.append("# HELP scpidev_action_latency_seconds Time spent in "
+            "the actions.")
+        for cmd, stats in commands:
+            _render_histogram(lines, "scpidev_action_latency_seconds",
+                stats.action, (("command", cmd.get_name()),))
+        lines.append("# TYPE scpidev_stage_latency_seconds histogram")
+        lines.append("# HELP scpidev_stage_latency_seconds Latency of the "
+            "dispatch stages.")
+        for stage in STAGES:
+            _render_histogram(lines, "scpidev_stage_latency_seconds",
+                metrics.get_stage(stage), (("stage", stage),))
+        interfaces = metrics.get_interfaces()
+        for field in SCPIInterfaceStats.__slots__:
+            name = "scpidev_interface_" + field
+            lines.append("# TYPE {} counter".format(name))
+            lines.append("# HELP {} Number of {} by the interface.".format(
+                name, field.replace("_", " ")))
+            for interface, stats in interfaces:
+                lines.append("{}_total{} {}".format(name,
+                    _format_labels((("interface", interface),)),
+                    getattr(stats, field)))
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
@@ -3,18 +3,35 @@ try:
 except ImportError:
     import ure as re
 
+from . import errors
+from . import lexer
 from . import utils
-from .value import SCPIValue, SCPIValueList
+from .value import (SCPIValue, SCPIValueList, NO_MATCH, VALTYPE_DISCRETE,
+    VALTYPE_NUMERIC)
+
+# Unit declaration of a numeric value, e.g. ``<voltage>[V]``. It is
+# rewritten to ``<voltage/V>``, because square brackets denote optional
+# parameters.
+REGEXP_UNIT = re.compile(r">\[([A-Za-z]+)\]")
+
+# Index of the values of ``MINimum``, ``MAXimum`` and ``DEFault`` in the
+# spec of a numeric value, see ``SCPIValue.get_numeric_spec()``.
+_NUMERIC_SPEC_INDEX = {"MIN": 1, "MAX": 2, "DEF": 3}
 
 
 class SCPIParameter():
+    __slots__ = ("_name", "_is_optional", "_value_list", "_default",
+        "_parameter_string")
+
     def __init__(self,
             name="",
             optional="True",
             value_list=list(),
             default=None,
-            parameter_string=""):
-        """Todo"""
+            parameter_string="",
+            compiled=None):
+        """Create a parameter. If ``compiled`` is given, it must be a tuple
+        as returned by ``to_tuple()`` and no parsing is done."""
         # Initialize variables.
         self._name = name
         self._is_optional = optional
@@ -22,14 +39,19 @@ class SCPIParameter():
         self._default = default
         self._parameter_string = parameter_string
 
+        if compiled is not None:
+            (self._parameter_string, self._is_optional, self._name,
+                compiled_values) = compiled
+            self._value_list = SCPIValueList()
+            self._value_list.init_compiled(compiled_values)
         # If a parameter string is given, try to initialize from it.
-        if parameter_string:
+        elif parameter_string:
             self._init_from_parameter_string(parameter_string)
 
     def __repr__(self):
         ret = "\n"
-        for key, val in self.__dict__.items():
-            ret = ret + str(key) + ": " + str(val) + "\n"
+        for key in self.__slots__:
+            ret = ret + key + ": " + str(getattr(self, key)) + "\n"
         return ret
 
     def __str__(self):
@@ -66,6 +88,15 @@ class SCPIParameter():
         self._value_list.init(parameter_string)
         self._name = name
 
+    def to_tuple(self):
+        """Return the compiled representation ``(parameter_string,
+        is_optional, name, values)``."""
+        compiled_values = ()
+        if isinstance(self._value_list, SCPIValueList):
+            compiled_values = self._value_list.to_tuple()
+        return (self._parameter_string, self._is_optional, self._name or "",
+            compiled_values)
+
     def get_parameter_string(self):
         return self._parameter_string
 
@@ -80,14 +111,60 @@ class SCPIParameter():
         syntax. ``False`` otherwise."""
         return test_string in self.get_value_list()
 
+    def parse(self, token):
+        """Return the value of the parameter ``token`` as passed to the
+        action or ``NO_MATCH``, see ``SCPIValue.parse()``. ``MINimum``,
+        ``MAXimum`` and ``DEFault`` are replaced by the limits and the
+        default of the numeric value of the parameter, if declared."""
+        for value in self._value_list:
+            result = value.parse(token)
+            if result is NO_MATCH:
+                continue
+            if value.get_type() == VALTYPE_DISCRETE:
+                i = _NUMERIC_SPEC_INDEX.get(value.get_value()[0])
+                if i is not None:
+                    limit = self._get_numeric_spec()[i]
+                    if limit is not None:
+                        return limit
+            return result
+        return NO_MATCH
+
+    def _get_numeric_spec(self):
+        for value in self._value_list:
+            if value.get_type() == VALTYPE_NUMERIC:
+                return value.get_numeric_spec()
+        return (None, None, None, None)
+
+
+# Parameters are immutable after initialization. Equal parameters of
+# different commands share the same instance.
+_PARAMETER_CACHE = dict()
+
+def create_parameter(parameter_string="", compiled=None):
+    """Return a shared ``SCPIParameter`` instance for ``parameter_string`` or
+    the ``compiled`` parameter tuple."""
+    if compiled is not None:
+        key = compiled
+    else:
+        key = parameter_string
+    parameter = _PARAMETER_CACHE.get(key)
+    if parameter is None:
+        parameter = SCPIParameter(
+            parameter_string=parameter_string, compiled=compiled)
+        _PARAMETER_CACHE[key] = parameter
+    return parameter
+
 
 class SCPIParameterList(list):
+    __slots__ = ()
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
     def init(self, parameter_string):
         parameter_string = utils.sanitize(
             parameter_string, remove_all_spaces=True)
+        parameter_string = REGEXP_UNIT.sub(r"/\1>", parameter_string)
 
         # Get all optional commands.
         parameter_temp_string = ""
@@ -111,7 +188,16 @@ class SCPIParameterList(list):
 
         # Create the parameter objects and store them into the parameter list.
         for parameter in parameter_string_list:
-            self.append(SCPIParameter(parameter_string=parameter))
+            self.append(create_parameter(parameter))
+
+    def init_compiled(self, compiled_parameters):
+        """Initialize from a tuple of compiled parameters as returned by
+        ``to_tuple()``."""
+        for compiled in compiled_parameters:
+            self.append(create_parameter(compiled=compiled))
+
+    def to_tuple(self):
+        return tuple(parameter.to_tuple() for parameter in self)
 
     def __str__(self):
         ret = "["
@@ -134,19 +220,48 @@ class SCPIParameterList(list):
         case. But it would be nice, if a default parameter feature would be
         implemented in this package.
         """
-        test_para_list = test_parameter.split(",")
+        try:
+            tokens = lexer.tokenize_parameters(test_parameter)
+        except errors.SCPIError:
+            return False
+        return self.match_parameters(tokens)
+
+    def match_parameters(self, tokens):
+        """Return ``True`` if the parameter ``tokens`` as returned by
+        ``lexer.tokenize()`` match the list. An empty list means
+        that no parameter was given. Values out of their limits match, see
+        ``parse()``."""
+        try:
+            return self.parse(tokens) is not None
+        except errors.SCPIError:
+            return True
+
+    def parse(self, tokens):
+        """Return the arguments of the action for the parameter ``tokens``
+        or ``None`` if they do not match. See ``SCPIParameter.parse()``.
+        Raise a ``SCPIError`` if a numeric value is invalid or out of its
+        limits."""
+        test_para_list = tokens
+        if not tokens:
+            test_para_list = [lexer.EMPTY_TOKEN]
         if len(test_para_list) > len(self):
             # There were more parameters given than contained in this list.
-            return False
+            return None
 
         # To make this work, a new list must be created.
+        args = list()
         parameter_list_temp = self[:]
         for test in test_para_list:
             for parameter in parameter_list_temp:
-                if test == "" and parameter.is_optional():
+                if test[0] == lexer.TOKEN_EMPTY and parameter.is_optional():
+                    args.append("")
                     break
-                if parameter.match(test):
+                result = parameter.parse(test)
+                if result is not NO_MATCH:
                     parameter_list_temp.pop(0)
+                    args.append(result)
                     break
-                return False
-        return True
+                return None
+        if not tokens:
+            return []
+        return args
@@ -0,0 +1,322 @@
+"""
+Execution of CPU-bound actions in other processes, see
+``SCPIDevice.add_command(process=True)``.
+
+Under CPython, actions executed by the dispatch thread or by the workers of
+``scpidev.worker`` compete with the data handlers for the GIL. The actions
+of process commands are executed by the processes of a ``SCPIProcessPool``
+instead. Matching, dispatch and I/O stay in the device process, which only
+waits for the result. Each process executes one action at a time, so a
+pool shared by several devices scales with the number of cores.
+
+Buffer arguments, e.g. block data or the samples of an acquisition, are
+passed to the action as ``memoryview`` with the format of the original
+buffer, e.g. ``"d"`` for ``array("d")``. A tuple of buffers is joined into
+one ``memoryview``. Returned ``bytes``, ``bytearray`` and ``memoryview``
+objects are returned as ``bytes``, ``array`` objects as ``array``. Buffers
+of at least ``threshold`` bytes are copied into a
+``multiprocessing.shared_memory`` block instead of being pickled through
+the pipe of the process. All other values are pickled.
+
+Actions must be picklable, i.e. functions defined at module level. The
+processes are started with the ``forkserver`` method where available,
+because forking the threads of a running device is unsafe.
+"""
+import multiprocessing
+import threading
+from array import array
+from multiprocessing.shared_memory import SharedMemory
+
+from . import worker
+
+# Buffers of at least this number of bytes are passed through shared memory.
+SHARED_MEMORY_THRESHOLD = 64 * 1024
+
+_BUFFER_TYPES = (bytes, bytearray, memoryview, array)
+
+
+class _Buffer(object):
+    """A buffer in transit. ``data`` holds the bytes of small buffers,
+    ``name`` the shared memory block of large ones. ``typecode`` is set for
+    ``array`` results."""
+    __slots__ = ("name", "data", "size", "format", "typecode")
+
+    def __init__(self, name, data, size, format, typecode=None):
+        self.name = name
+        self.data = data
+        self.size = size
+        self.format = format
+        self.typecode = typecode
+
+    def __getstate__(self):
+        return (self.name, self.data, self.size, self.format, self.typecode)
+
+    def __setstate__(self, state):
+        (self.name, self.data, self.size, self.format,
+            self.typecode) = state
+
+
+def _share(buffers, threshold, shared, typecode=None):
+    """Return a ``_Buffer`` with the contents of ``buffers``. Created shared
+    memory blocks are appended to ``shared``."""
+    views = [memoryview(b).cast("B") for b in buffers]
+    size = sum(len(view) for view in views)
+    format = "B"
+    if buffers:
+        format = memoryview(buffers[0]).format
+    if size < threshold:
+        return _Buffer(None, b"".join(views), size, format, typecode)
+    shm = SharedMemory(create=True, size=max(size, 1))
+    shared.append(shm)
+    i = 0
+    for view in views:
+        shm.buf[i:i + len(view)] = view
+        i += len(view)
+    return _Buffer(shm.name, None, size, format, typecode)
+
+
+def _encode(value, threshold, shared):
+    if isinstance(value, tuple) and value and all(
+            isinstance(b, _BUFFER_TYPES) for b in value):
+        return _share(value, threshold, shared)
+    if isinstance(value, _BUFFER_TYPES):
+        return _share((value,), threshold, shared)
+    return value
+
+
+def _open_view(buffer, attached):
+    """Return a ``memoryview`` of ``buffer`` with its original format."""
+    if buffer.name is None:
+        view = memoryview(buffer.data)
+    else:
+        shm = SharedMemory(name=buffer.name)
+        attached.append(shm)
+        view = shm.buf[:buffer.size]
+    if buffer.format != "B":
+        try:
+            view = view.cast(buffer.format)
+        except (TypeError, ValueError):
+            pass
+    return view
+
+
+def _release(views, attached):
+    """Release ``views`` and close the shared memory blocks ``attached``.
+    Blocks whose buffers are still referenced by the action are unmapped
+    when the process exits."""
+    for view in views:
+        try:
+            view.release()
+        except BufferError:
+            pass
+    for shm in attached:
+        try:
+            shm.close()
+        except BufferError:
+            pass
+
+
+def _encode_result(result, threshold, shared):
+    if isinstance(result, array):
+        return _share((result,), threshold, shared, result.typecode)
+    if isinstance(result, (bytes, bytearray, memoryview)):
+        return _share((result,), threshold, shared)
+    return result
+
+
+def _decode_result(result):
+    if not isinstance(result, _Buffer):
+        return result
+    shm = None
+    if result.name is None:
+        data = result.data
+    else:
+        shm = SharedMemory(name=result.name)
+        data = shm.buf[:result.size]
+    try:
+        if result.typecode is None:
+            value = bytes(data)
+        else:
+            value = array(result.typecode)
+            value.frombytes(data)
+    finally:
+        if shm is not None:
+            data.release()
+            shm.close()
+            shm.unlink()
+    return value
+
+
+def _serve(conn, threshold):
+    """Main loop of a process: Execute the actions sent through ``conn``
+    until ``None`` is received."""
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+        if request is None:
+            break
+        action, args, command_string = request
+        views = list()
+        attached = list()
+        shared = list()
+        try:
+            for i, arg in enumerate(args):
+                if isinstance(arg, _Buffer):
+                    args[i] = _open_view(arg, attached)
+                    views.append(args[i])
+            result = action(*args, command_string=command_string)
+            response = (True, _encode_result(result, threshold, shared))
+        except Exception as e:
+            response = (False, e)
+        _release(views, attached)
+        # The result blocks are unlinked by the device process.
+        for shm in shared:
+            shm.close()
+        try:
+            conn.send(response)
+        except Exception as e:
+            # The result or the exception cannot be pickled.
+            conn.send((False, RuntimeError(
+                "Could not return the result of the action: {}".format(e))))
+
+
+def _get_context():
+    try:
+        return multiprocessing.get_context("forkserver")
+    except ValueError:
+        return multiprocessing.get_context("spawn")
+
+
+class _Process(object):
+    __slots__ = ("process", "conn", "generation")
+
+    def __init__(self, context, threshold, generation):
+        self.generation = generation
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_serve,
+            args=(child_conn, threshold), name="SCPIProcess")
+        self.process.daemon = True
+        self.process.start()
+        child_conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except Exception:
+            pass
+        self.conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class SCPIProcessPool(object):
+    """Execute actions in at most ``max_processes`` processes (default: the
+    number of cores). The processes are started on demand and kept for the
+    next actions. ``call()`` can be used by several threads at once."""
+    def __init__(self, max_processes=None, threshold=SHARED_MEMORY_THRESHOLD):
+        if max_processes is None:
+            max_processes = multiprocessing.cpu_count()
+        self._max_processes = max_processes
+        self._threshold = threshold
+        self._context = None
+        self._idle = list()
+        # Number of processes including the busy ones. Processes of an
+        # older generation, i.e. before ``shutdown()``, are not counted.
+        self._count = 0
+        self._generation = 0
+        self._condition = threading.Condition()
+
+    def get_processes(self):
+        """Return the number of running processes."""
+        return self._count
+
+    def _acquire(self):
+        with self._condition:
+            while not self._idle and self._count >= self._max_processes:
+                self._condition.wait()
+            if self._idle:
+                return self._idle.pop()
+            if self._context is None:
+                self._context = _get_context()
+            self._count += 1
+            generation = self._generation
+        try:
+            return _Process(self._context, self._threshold, generation)
+        except Exception:
+            self._discard(generation)
+            raise
+
+    def _release(self, process):
+        with self._condition:
+            if process.generation == self._generation:
+                self._idle.append(process)
+                self._condition.notify()
+                return
+        process.stop()
+
+    def _discard(self, generation):
+        with self._condition:
+            if generation == self._generation:
+                self._count -= 1
+                self._condition.notify()
+
+    def call(self, action, args, command_string, timeout=None):
+        """Return ``action(*args, command_string=command_string)`` executed
+        by one of the processes. Exceptions of the action are raised. If the
+        action does not return within ``timeout`` seconds, its process is
+        killed and ``worker.ActionTimeout`` is raised."""
+        shared = list()
+        try:
+            args = [_encode(arg, self._threshold, shared) for arg in args]
+            process = self._acquire()
+            try:
+                process.conn.send((action, args, command_string))
+                if not process.conn.poll(timeout):
+                    process.kill()
+                    self._discard(process.generation)
+                    raise worker.ActionTimeout()
+                success, result = process.conn.recv()
+            except (EOFError, OSError):
+                process.process.join(1.)
+                exitcode = process.process.exitcode
+                process.kill()
+                self._discard(process.generation)
+                raise RuntimeError("Process of the action exited with code "
+                    "{}.".format(exitcode))
+            except worker.ActionTimeout:
+                raise
+            except Exception:
+                # E.g. the action cannot be pickled. The process is fine.
+                self._release(process)
+                raise
+            self._release(process)
+        finally:
+            for shm in shared:
+                shm.close()
+                shm.unlink()
+        if not success:
+            raise result
+        return _decode_result(result)
+
+    def shutdown(self, timeout=1.):
+        """Let the idle processes exit. Processes which do not exit within
+        ``timeout`` seconds are killed. Processes which execute an action
+        exit when they are released. The pool can be used again
+        afterwards."""
+        with self._condition:
+            processes = self._idle
+            self._idle = list()
+            self._count = 0
+            self._generation += 1
+            self._condition.notify_all()
+        for process in processes:
+            process.stop()
+        for process in processes:
+            process.process.join(timeout)
+            if process.process.is_alive():
+                process.kill()
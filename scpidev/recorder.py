@@ -0,0 +1,174 @@
+"""
+Binary recording of the traffic of a ``SCPIDevice``. Every executed program
+message is appended to a ring buffer in a memory-mapped file as
+
+    (timestamp, session, request, response, latency)
+
+When the file is full, the oldest records are overwritten. Recording a
+message costs a few ``struct.pack_into()`` calls and slice assignments into
+the mapped file. No formatting is done. Recordings are read with
+``read_recording()`` and can be replayed with ``scpidev.replay``.
+
+File layout (little endian):
+
+- Header: magic ``b"SCPIREC1"``, data size, head, tail and record count
+  (``HEADER``).
+- Data area of ``data size`` bytes. Each record is a ``RECORD`` struct
+  (timestamp, session id, latency in microseconds, request length, response
+  length) followed by the request and response bytes. A record with a
+  request length of ``WRAP`` marks the end of the data at the end of the
+  area. Reading continues at offset 0.
+"""
+import mmap
+import os
+import struct
+import threading
+
+MAGIC = b"SCPIREC1"
+HEADER = struct.Struct("<8sIIII")
+RECORD = struct.Struct("<dIIII")
+WRAP = 0xFFFFFFFF
+DEFAULT_SIZE = 16 * 1024 * 1024
+
+
+class SCPIRecorder(object):
+    """Records into the file ``path`` with a data area of ``size`` bytes.
+    An existing recording is continued if it has the same size. Otherwise,
+    the file is overwritten."""
+    def __init__(self, path, size=DEFAULT_SIZE):
+        self._path = path
+        self._size = size
+        self._lock = threading.Lock()
+        self._head = 0
+        self._tail = 0
+        self._count = 0
+        total = HEADER.size + size
+        mode = "r+b"
+        if not os.path.exists(path) or os.path.getsize(path) != total:
+            mode = "w+b"
+        self._file = open(path, mode)
+        if mode == "w+b":
+            self._file.truncate(total)
+        self._mm = mmap.mmap(self._file.fileno(), total)
+        magic, data_size, head, tail, count = HEADER.unpack_from(self._mm, 0)
+        if magic == MAGIC and data_size == size:
+            self._head, self._tail, self._count = head, tail, count
+        else:
+            self._write_header()
+
+    def __str__(self):
+        return "Recorder {}".format(self._path)
+
+    def _write_header(self):
+        HEADER.pack_into(self._mm, 0, MAGIC, self._size, self._head,
+            self._tail, self._count)
+
+    def _next(self, offset):
+        """Return the offset of the record which follows the record at
+        ``offset``."""
+        _, _, _, request_len, response_len = RECORD.unpack_from(
+            self._mm, HEADER.size + offset)
+        offset += RECORD.size + request_len + response_len
+        if offset + RECORD.size > self._size:
+            return 0
+        if RECORD.unpack_from(self._mm, HEADER.size + offset)[3] == WRAP:
+            return 0
+        return offset
+
+    def _evict(self, start, end):
+        """Drop the oldest records as long as they start in the area from
+        ``start`` to ``end``."""
+        while self._count and start <= self._tail < end:
+            self._tail = self._next(self._tail)
+            self._count -= 1
+        if not self._count:
+            self._tail = self._head
+
+    def get_count(self):
+        return self._count
+
+    def record(self, timestamp, session_id, request, response, latency):
+        """Append one record. ``request`` and ``response`` are ``bytes`` or
+        ``str``, ``latency`` is in microseconds. Records which are larger
+        than the data area are dropped. Return ``False`` in that case or if
+        the recorder is closed."""
+        if isinstance(request, str):
+            request = request.encode("utf8")
+        if isinstance(response, str):
+            response = response.encode("utf8")
+        latency = min(latency, 0xFFFFFFFF)
+        size = RECORD.size + len(request) + len(response)
+        if size > self._size:
+            return False
+        with self._lock:
+            mm = self._mm
+            if mm.closed:
+                return False
+            head = self._head
+            if head + size > self._size:
+                self._evict(head, self._size)
+                if head + RECORD.size <= self._size:
+                    RECORD.pack_into(mm, HEADER.size + head, 0., 0, 0, WRAP, 0)
+                head = 0
+                if not self._count:
+                    self._tail = 0
+            self._head = head
+            self._evict(head, head + size)
+            offset = HEADER.size + head
+            RECORD.pack_into(mm, offset, timestamp, session_id, latency,
+                len(request), len(response))
+            offset += RECORD.size
+            mm[offset:offset + len(request)] = request
+            offset += len(request)
+            mm[offset:offset + len(response)] = response
+            self._head = head + size
+            self._count += 1
+            self._write_header()
+        return True
+
+    def records(self):
+        """Return the list of records from the oldest to the newest. Each
+        record is a tuple ``(timestamp, session_id, request, response,
+        latency)``."""
+        with self._lock:
+            return list(_iter_records(self._mm, self._size, self._tail,
+                self._count))
+
+    def flush(self):
+        self._mm.flush()
+
+    def close(self):
+        with self._lock:
+            self._mm.flush()
+            self._mm.close()
+            self._file.close()
+
+
+def _iter_records(buffer, size, tail, count):
+    offset = tail
+    for _ in range(count):
+        timestamp, session_id, latency, request_len, response_len = \
+            RECORD.unpack_from(buffer, HEADER.size + offset)
+        if request_len == WRAP:
+            offset = 0
+            timestamp, session_id, latency, request_len, response_len = \
+                RECORD.unpack_from(buffer, HEADER.size)
+        start = HEADER.size + offset + RECORD.size
+        request = bytes(buffer[start:start + request_len])
+        start += request_len
+        response = bytes(buffer[start:start + response_len])
+        yield (timestamp, session_id, request, response, latency)
+        offset += RECORD.size + request_len + response_len
+        if offset + RECORD.size > size:
+            offset = 0
+
+
+def read_recording(path):
+    """Return the list of records of the recording file ``path``. See
+    ``SCPIRecorder.records()``."""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, size, head, tail, count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("{} is not a recording.".format(path))
+    return list(_iter_records(data, size, tail, count))
@@ -0,0 +1,193 @@
+"""
+Replay of recordings made by ``scpidev.recorder``, e.g. to reproduce the
+traffic of a production system in performance regression tests.
+
+The records are replayed in their original order. With ``speed=1`` the
+original time between records is kept, with ``speed=10`` it is divided by
+10 and with ``speed=0`` the records are replayed as fast as possible.
+
+The target is either a ``SCPIDevice`` (``replay_device()``), whose
+``execute()`` is called directly, or a running device which is reached by
+TCP (``replay_socket()``). In the latter case, every recorded session gets
+its own connection. From the command line:
+
+    python -m scpidev.replay RECORDING --port 5025 --speed 10
+"""
+import argparse
+import json
+import socket
+import sys
+import time
+
+from .recorder import read_recording
+from .utils import join_response
+
+
+def _wait(t_replay_start, t_record_start, timestamp, speed):
+    if speed <= 0:
+        return
+    delay = (timestamp - t_record_start) / speed - (
+        time.perf_counter() - t_replay_start)
+    if delay > 0:
+        time.sleep(delay)
+
+
+def replay_device(records, device, speed=0.):
+    """Execute the requests of ``records`` with ``device.execute()``. Return
+    a list of ``(record, response, latency)`` tuples. ``latency`` is in
+    microseconds."""
+    results = list()
+    if not records:
+        return results
+    t_record_start = records[0][0]
+    t_replay_start = time.perf_counter()
+    for record in records:
+        _wait(t_replay_start, t_record_start, record[0], speed)
+        t_request = time.perf_counter()
+        response = device.execute(record[2].decode("utf8"))
+        latency = (time.perf_counter() - t_request) * 1e6
+        if response is None:
+            response = b""
+        else:
+            response = join_response(response)
+        results.append((record, response, latency))
+    return results
+
+
+def _read_response(sock, buffer, expected):
+    """Read from ``sock`` until as many lines as in the ``expected``
+    response were received. Data which was received beyond the response
+    stays in ``buffer``."""
+    n_lines = max(expected.count(b"\n"), 1)
+    end = 0
+    for _ in range(n_lines):
+        while True:
+            i = buffer.find(b"\n", end)
+            if i >= 0:
+                end = i + 1
+                break
+            data = sock.recv(4096)
+            if not data:
+                raise EOFError("Connection closed by the device.")
+            buffer.extend(data)
+    response = bytes(buffer[:end])
+    del buffer[:end]
+    return response
+
+
+def replay_socket(records, addr, speed=0., timeout=5.):
+    """Send the requests of ``records`` to the TCP address ``addr``. A
+    response is only awaited if a response was recorded. Return a list of
+    ``(record, response, latency)`` tuples."""
+    results = list()
+    if not records:
+        return results
+    connections = dict()
+    t_record_start = records[0][0]
+    t_replay_start = time.perf_counter()
+    try:
+        for record in records:
+            session_id = record[1]
+            if session_id not in connections:
+                connections[session_id] = (
+                    socket.create_connection(addr, timeout=timeout),
+                    bytearray())
+            sock, buffer = connections[session_id]
+            _wait(t_replay_start, t_record_start, record[0], speed)
+            t_request = time.perf_counter()
+            sock.sendall(record[2])
+            response = b""
+            if record[3]:
+                response = _read_response(sock, buffer, record[3])
+            latency = (time.perf_counter() - t_request) * 1e6
+            results.append((record, response, latency))
+    finally:
+        for sock, _ in connections.values():
+            sock.close()
+    return results
+
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    i = int(round(p / 100. * (len(sorted_values) - 1)))
+    return sorted_values[i]
+
+
+def summarize(results, duration=None):
+    """Return a dictionary with the number of replayed records, the number
+    of responses which differ from the recorded ones and the recorded and
+    replayed latency percentiles in microseconds."""
+    recorded = sorted(record[4] for record, _, _ in results)
+    replayed = sorted(latency for _, _, latency in results)
+    summary = {
+        "count": len(results),
+        "mismatches": sum(1 for record, response, _ in results
+            if response != record[3]),
+        "duration": duration,
+    }
+    for name, values in (("recorded", recorded), ("replayed", replayed)):
+        for p in (50, 99, 99.9):
+            summary["{}_p{}".format(name, str(p).replace(".", ""))] = \
+                _percentile(values, p)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Replay a recording of SCPI traffic against a device.")
+    parser.add_argument(
+        "recording",
+        metavar="RECORDING",
+        type=str,
+        help="The recording file, see SCPIDevice.start_recording()."
+    )
+    parser.add_argument(
+        "--host",
+        type=str,
+        help="The address of the device. Default: 127.0.0.1",
+        default="127.0.0.1"
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        help="The TCP port of the device. Default: 5025", default=5025
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        help="Replay speed relative to the recording. 0 replays as fast as "
+        "possible. Default: 1", default=1.
+    )
+    parser.add_argument(
+        "--dump",
+        help="Print the records instead of replaying them.",
+        action="store_true"
+    )
+    parser.add_argument(
+        "-o",
+        metavar="OUTPUT",
+        type=str,
+        help="Write the summary as JSON to OUTPUT.", default=None
+    )
+    args = parser.parse_args(argv)
+
+    records = read_recording(args.recording)
+    if args.dump:
+        for timestamp, session_id, request, response, latency in records:
+            print("{:.6f} {} {!r} {!r} {}us".format(timestamp, session_id,
+                request, response, latency))
+        return
+    t_start = time.perf_counter()
+    results = replay_socket(records, (args.host, args.port), args.speed)
+    summary = summarize(results, time.perf_counter() - t_start)
+    text = json.dumps(summary, indent=2, sort_keys=True)
+    if args.o is None:
+        sys.stdout.write(text + "\n")
+    else:
+        with open(args.o, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
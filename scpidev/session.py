@@ -0,0 +1,195 @@
+"""
+A session represents the message exchange with one client on one
+interface, e.g. one TCP connection. Each session owns its own input and
+output queue, so that pending work of one client can be discarded without
+affecting other clients. See IEEE 488.2, chapter 6 (Message Exchange
+Control Protocol).
+"""
+import threading
+import time
+import itertools
+from collections import deque
+
+# Unique ids of sessions, e.g. to identify them in recordings.
+_session_ids = itertools.count(1)
+
+
+class SCPISession(object):
+    """The ``SCPISession`` holds the received but not yet executed program
+    messages (input queue), the partially received message (input buffer)
+    and the not yet sent response messages (output queue) of one client.
+
+    ``send`` is a callable which will be called with ``bytes`` and must
+    return the number of bytes which were actually sent. It is set by the
+    interface which created the session.
+
+    If ``timed`` is ``True``, the time when a message was put into the input
+    queue is recorded. After ``get_input()``, it is available as
+    ``input_time`` (``time.perf_counter()``).
+    """
+    def __init__(self, interface, send=None, name="", timed=False):
+        self.interface = interface
+        self.name = name
+        self.id = next(_session_ids)
+        self.input_time = None
+        self._send = send
+        self._input_queue = deque()
+        self._input_times = None
+        if timed:
+            self._input_times = deque()
+        self._input_rest = ""
+        self._output_queue = deque()
+        self._lock = threading.Lock()
+        self._is_open = True
+        # The generation is incremented on every device clear. Responses
+        # of commands which were started before a clear will be discarded.
+        self._generation = 0
+        # ``True`` while a query is executed and has not responded yet.
+        self._executing = False
+        # Responses written and responses requested by the client since
+        # the last clear, see ``request_response()``.
+        self._responses = 0
+        self._requests = 0
+
+    def __str__(self):
+        return "{} {}".format(self.interface, self.name)
+
+    def is_open(self):
+        return self._is_open
+
+    def get_generation(self):
+        return self._generation
+
+    def feed(self, recv_data):
+        """Feed received raw data into the input buffer. Complete program
+        messages, i.e. terminated by a newline character, are moved to the
+        input queue. Return the number of new program messages."""
+        recv_string = self._input_rest + recv_data.decode("utf8")
+        if "\n" not in recv_string:
+            self._input_rest = recv_string
+            return 0
+        message_list = recv_string.split("\n")
+        self._input_rest = message_list.pop()
+        n = 0
+        for message in message_list:
+            if message.strip():
+                self.put_input(message + "\n")
+                n += 1
+        return n
+
+    def put_input(self, message):
+        """Put a complete program message into the input queue."""
+        if self._input_times is not None:
+            self._input_times.append(time.perf_counter())
+        self._input_queue.append(message)
+
+    def get_input(self):
+        """Return the next program message of the input queue. ``None`` if
+        the session was cleared or closed in the meantime."""
+        if not self._is_open:
+            return None
+        try:
+            message = self._input_queue.popleft()
+        except IndexError:
+            return None
+        if self._input_times:
+            self.input_time = self._input_times.popleft()
+        self._executing = "?" in message
+        return message
+
+    def end_input(self):
+        """Called when the message of ``get_input()`` was executed."""
+        self._executing = False
+
+    def request_response(self):
+        """The client requests the next response, e.g. a GPIB device is
+        addressed to talk. Return ``False`` if there is no response for the
+        request, i.e. all responses were requested already and no query is
+        queued or executed (IEEE 488.2 Query UNTERMINATED)."""
+        with self._lock:
+            expected = self._responses + int(self._executing) + sum(
+                1 for message in self._input_queue if "?" in message)
+            if expected <= self._requests:
+                return False
+            self._requests += 1
+            return True
+
+    def has_pending_input(self):
+        return bool(self._input_queue)
+
+    def has_pending_output(self):
+        return bool(self._output_queue)
+
+    def write(self, data, generation=None):
+        """Put the response ``data`` into the output queue and try to send
+        it. ``data`` is a ``str``, a buffer or a tuple of buffers, which are
+        sent without copying. If ``generation`` is given and the session was
+        cleared in the meantime, the response is discarded. Return ``False``
+        if the data was discarded."""
+        if isinstance(data, str):
+            data = data.encode("utf8")
+        with self._lock:
+            if not self._is_open:
+                return False
+            if generation is not None and generation != self._generation:
+                return False
+            if not isinstance(data, tuple):
+                data = (data,)
+            for buffer in data:
+                if not isinstance(buffer, bytes):
+                    # Byte-wise view, e.g. of an ``array``.
+                    buffer = memoryview(buffer).cast("B")
+                self._output_queue.append(buffer)
+            self._responses += 1
+            self._executing = False
+        self.flush()
+        return True
+
+    def flush(self):
+        """Send as much data of the output queue as possible. Data which
+        could not be sent, e.g. because the client does not read, stays in
+        the output queue. Return the number of bytes sent."""
+        bytes_sent = 0
+        with self._lock:
+            while self._output_queue and self._send is not None:
+                data = self._output_queue[0]
+                try:
+                    n = self._send(data)
+                except (BlockingIOError, InterruptedError):
+                    break
+                if n is None:
+                    n = len(data)
+                bytes_sent += n
+                if n < len(data):
+                    self._output_queue[0] = memoryview(data)[n:]
+                    break
+                self._output_queue.popleft()
+        return bytes_sent
+
+    def clear(self):
+        """Device clear: Discard the input buffer, input queue and output
+        queue."""
+        with self._lock:
+            self._generation += 1
+            # The response of an executed query will be discarded.
+            self._executing = False
+            self._responses = 0
+            self._requests = 0
+            self._input_queue.clear()
+            if self._input_times is not None:
+                self._input_times.clear()
+            self._input_rest = ""
+            self._output_queue.clear()
+
+    def clear_output(self):
+        """Discard the output queue. Return ``True`` if there was data in the
+        output queue."""
+        with self._lock:
+            had_output = bool(self._output_queue)
+            self._output_queue.clear()
+        return had_output
+
+    def close(self):
+        """Close the session. All pending work is discarded."""
+        self.clear()
+        self._is_open = False
@@ -0,0 +1,238 @@
+"""
+Declarative settings of a device, see ``SCPIDevice.add_setting()``.
+
+A setting is a typed value with an optional range and a default. Its set
+command and query are generated, e.g. for ``"SOURce:VOLTage"``::
+
+    SOURce:VOLTage {<value>|MINimum|MAXimum|DEFault}
+    SOURce:VOLTage? [{MINimum|MAXimum|DEFault}]
+
+The values are not stored in Python objects per setting but in one
+``array`` per type, i.e. 8 bytes per ``float`` setting. Once a header was
+matched, ``SCPIDevice.execute()`` remembers it and serves further accesses
+with the same header from the store without matching and without calling
+an action.
+"""
+import struct
+from array import array
+
+from . import errors
+
+TYPECODES = (
+    (float, "d"),
+    (int, "l"),
+    (bool, "b"),
+)
+
+# Number of settings per type at the start of a snapshot. MicroPython has
+# no ``struct.Struct``.
+LAYOUT = "<" + "I" * len(TYPECODES)
+LAYOUT_SIZE = struct.calcsize(LAYOUT)
+
+# Number of remembered headers.
+MAX_HEADERS = 1024
+
+
+def _match_keyword(test_string, short, long):
+    return test_string == short or test_string == long
+
+
+class SCPISetting(object):
+    """One setting. The value is stored in the array ``values`` of the
+    store."""
+    __slots__ = ("name", "type", "minimum", "maximum", "default", "_values",
+        "_index")
+
+    def __init__(self, name, type, minimum, maximum, default, values):
+        self.name = name
+        self.type = type
+        self.minimum = minimum
+        self.maximum = maximum
+        self.default = default
+        self._values = values
+        self._index = len(values)
+        values.append(default)
+
+    def __str__(self):
+        return self.name
+
+    def get(self):
+        return self.type(self._values[self._index])
+
+    def set(self, value):
+        """Set ``value`` after converting it to the setting's type. Raise a
+        ``SCPIError`` if it is out of range."""
+        value = self.type(value)
+        if self.minimum is not None and not (
+                self.minimum <= value <= self.maximum):
+            raise errors.SCPIError(errors.ERR_DATA_OUT_OF_RANGE,
+                "{} not in [{}, {}]".format(value, self.minimum,
+                self.maximum))
+        self._values[self._index] = value
+
+    def reset(self):
+        self._values[self._index] = self.default
+
+    def _parse_keyword(self, test_string):
+        """Return the value of ``MINimum``, ``MAXimum`` or ``DEFault``.
+        ``None`` for other strings."""
+        if _match_keyword(test_string, "DEF", "DEFAULT"):
+            return self.default
+        if self.minimum is not None:
+            if _match_keyword(test_string, "MIN", "MINIMUM"):
+                return self.minimum
+            if _match_keyword(test_string, "MAX", "MAXIMUM"):
+                return self.maximum
+        return None
+
+    def _illegal(self, parameter_string):
+        return errors.SCPIError(errors.ERR_ILLEGAL_PARAMETER_VALUE,
+            "{!r} for {}".format(parameter_string, self.name))
+
+    def parse(self, parameter_string):
+        """Return the value of ``parameter_string``, which is a number,
+        ``MINimum``, ``MAXimum``, ``DEFault`` or for booleans ``ON`` and
+        ``OFF``."""
+        test_string = parameter_string.strip().upper()
+        value = self._parse_keyword(test_string)
+        if value is not None:
+            return value
+        try:
+            if self.type is float:
+                return float(test_string)
+            if self.type is bool:
+                if test_string == "ON":
+                    return True
+                if test_string == "OFF":
+                    return False
+                return float(test_string) != 0
+            try:
+                return int(test_string)
+            except ValueError:
+                return int(round(float(test_string)))
+        except ValueError:
+            raise self._illegal(parameter_string)
+
+    def format(self, value):
+        if self.type is bool:
+            return "1\n" if value else "0\n"
+        return "{}\n".format(value)
+
+    def get_command_strings(self):
+        """Return the command strings of the set command and the query."""
+        values = ["<value>"]
+        if self.type is bool:
+            values = ["ON", "OFF", "<value>"]
+        keywords = ["DEFault"]
+        if self.minimum is not None:
+            keywords = ["MINimum", "MAXimum", "DEFault"]
+        return (
+            "{} {{{}}}".format(self.name, "|".join(values + keywords)),
+            "{}? [{{{}}}]".format(self.name, "|".join(keywords)))
+
+    def get_action(self, is_query):
+        """Return an action for the generated set command or query."""
+        def action(*args, **kwargs):
+            return self.execute(is_query, ",".join(map(str, args)))
+        return action
+
+    def execute(self, is_query, parameter_string):
+        """Set the value or return the formatted value of a query."""
+        if is_query:
+            if parameter_string:
+                value = self._parse_keyword(parameter_string.strip().upper())
+                if value is None:
+                    raise self._illegal(parameter_string)
+                return self.format(value)
+            return self.format(self.type(self._values[self._index]))
+        self.set(self.parse(parameter_string))
+        return None
+
+
+class SCPISettings(object):
+    """The store of all settings of a device."""
+    def __init__(self):
+        self._arrays = dict((type, array(typecode))
+            for type, typecode in TYPECODES)
+        self._settings = dict()
+        self._headers = dict()
+
+    def __len__(self):
+        return len(self._settings)
+
+    def __iter__(self):
+        return iter(self._settings.values())
+
+    def add(self, name, type=float, range=None, default=None):
+        """Add the setting ``name`` and return the ``SCPISetting``.
+        ``range`` is a ``(minimum, maximum)`` tuple or ``None``. ``default``
+        defaults to the minimum or zero."""
+        if type not in self._arrays:
+            raise ValueError("Unsupported setting type {!r}.".format(type))
+        if name in self._settings:
+            raise ValueError("Setting {!r} already exists.".format(name))
+        minimum = maximum = None
+        if range is not None:
+            minimum, maximum = type(range[0]), type(range[1])
+        if default is None:
+            default = type() if minimum is None else minimum
+        default = type(default)
+        if minimum is not None and not minimum <= default <= maximum:
+            raise ValueError("Default of {!r} is out of range.".format(name))
+        setting = SCPISetting(name, type, minimum, maximum, default,
+            self._arrays[type])
+        self._settings[name] = setting
+        return setting
+
+    def get_setting(self, name):
+        return self._settings[name]
+
+    def get(self, name):
+        return self._settings[name].get()
+
+    def set(self, name, value):
+        self._settings[name].set(value)
+
+    def reset(self):
+        """Set all settings to their defaults."""
+        for setting in self._settings.values():
+            setting.reset()
+
+    def get_arrays(self):
+        """Return a list of ``(type, array)`` tuples of the store."""
+        return [(type, self._arrays[type]) for type, _ in TYPECODES]
+
+    def dump(self):
+        """Return a snapshot of all values as ``bytes``. The snapshot starts
+        with the number of settings per type (``LAYOUT``) followed by the
+        content of the arrays."""
+        arrays = [self._arrays[type] for type, _ in TYPECODES]
+        header = struct.pack(LAYOUT, *[len(values) for values in arrays])
+        return header + b"".join(bytes(values) for values in arrays)
+
+    def restore(self, data):
+        """Restore all values from a snapshot as returned by ``dump()``.
+        Raise a ``ValueError`` if the snapshot does not fit the settings."""
+        counts = struct.unpack_from(LAYOUT, data, 0)
+        size = LAYOUT_SIZE
+        for count, (type, typecode) in zip(counts, TYPECODES):
+            if count != len(self._arrays[type]):
+                raise ValueError("The snapshot does not fit the settings.")
+            size += count * struct.calcsize(typecode)
+        if size != len(data):
+            raise ValueError("The snapshot does not fit the settings.")
+        offset = LAYOUT_SIZE
+        for count, (type, typecode) in zip(counts, TYPECODES):
+            end = offset + count * struct.calcsize(typecode)
+            self._arrays[type][:] = array(typecode, data[offset:end])
+            offset = end
+
+    def remember(self, keyword_string, entry):
+        """Remember ``entry`` for the received ``keyword_string``. See
+        ``lookup()``."""
+        if len(self._headers) < MAX_HEADERS:
+            self._headers[keyword_string] = entry
+
+    def lookup(self, keyword_string):
+        """Return the entry which was remembered for ``keyword_string``."""
+        return self._headers.get(keyword_string)
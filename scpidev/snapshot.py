@@ -0,0 +1,307 @@
+"""
+Persistent snapshots of the settings store for ``*SAV <n>`` and
+``*RCL <n>``, see ``SCPIDevice.set_snapshot_file()``.
+
+A snapshot is the content of the store's arrays (``SCPISettings.dump()``).
+It is restored in one bulk copy per array, no set commands are executed.
+
+Two storage backends with the same interface (``save()``, ``load()``,
+``close()``) are available:
+
+- ``SCPISnapshotFile``: One fixed slot per snapshot in a memory-mapped
+  file. Used where ``mmap`` is available.
+- ``SCPISnapshotLog``: An append-only log, which only ever appends to the
+  file. This is friendly to the flash file systems of MicroPython boards.
+  The newest record of a slot is valid. The log is compacted when it grows
+  beyond ``max_size``.
+
+Every snapshot is stored with its CRC-32, so a torn write is detected and
+the slot is treated as empty.
+"""
+import os
+import struct
+try:
+    import mmap
+except ImportError:
+    mmap = None
+try:
+    from binascii import crc32
+except ImportError:
+    from ubinascii import crc32
+
+from . import errors
+
+MAGIC = b"SCPISAV1"
+# The formats are plain strings, MicroPython has no ``struct.Struct``.
+# Magic, number of slots, slot size
+FILE_HEADER = "<8sII"
+FILE_HEADER_SIZE = struct.calcsize(FILE_HEADER)
+# Snapshot length (0 for an empty slot), CRC-32
+SLOT_HEADER = "<II"
+SLOT_HEADER_SIZE = struct.calcsize(SLOT_HEADER)
+# Slot, snapshot length, CRC-32
+LOG_RECORD = "<III"
+LOG_RECORD_SIZE = struct.calcsize(LOG_RECORD)
+
+
+def _replace(tmp_path, path):
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # Some file systems do not replace an existing file.
+        os.remove(path)
+        os.rename(tmp_path, path)
+
+
+class SCPISnapshotFile(object):
+    """``slots`` snapshots of at most ``slot_size`` bytes in the file
+    ``path``. An existing file with ``slots`` slots is reused, smaller slots
+    are enlarged. Otherwise, it is overwritten. A snapshot which is larger
+    than a slot re-lays out the file with larger slots. The snapshots are
+    kept in both cases."""
+    def __init__(self, path, slots, slot_size):
+        self._path = path
+        self._slots = slots
+        self._slot_size = slot_size
+        self._file = None
+        self._mm = None
+        snapshots = self._read()
+        if snapshots is None:
+            self._write([None] * slots)
+        elif self._slot_size < slot_size:
+            self._slot_size = slot_size
+            self._write(snapshots)
+        self._open()
+
+    def _get_file_size(self):
+        return FILE_HEADER_SIZE + self._slots * (
+            SLOT_HEADER_SIZE + self._slot_size)
+
+    def _read(self):
+        """Return the snapshots of an existing file with ``slots`` slots
+        and take over its slot size. ``None`` if there is no such file."""
+        try:
+            with open(self._path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < FILE_HEADER_SIZE:
+            return None
+        magic, slots, slot_size = struct.unpack_from(FILE_HEADER, data, 0)
+        if magic != MAGIC or slots != self._slots or len(data) != (
+                FILE_HEADER_SIZE + slots * (SLOT_HEADER_SIZE + slot_size)):
+            return None
+        self._slot_size = slot_size
+        return [self._load(data, n) for n in range(slots)]
+
+    def _write(self, snapshots):
+        """Replace the file by a file with the current layout and
+        ``snapshots``. The file is written to a temporary file first, so a
+        torn write does not lose the old snapshots."""
+        tmp_path = self._path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(struct.pack(FILE_HEADER, MAGIC, self._slots,
+                self._slot_size))
+            for data in snapshots:
+                if data is None:
+                    data = b""
+                f.write(struct.pack(SLOT_HEADER, len(data), crc32(data)))
+                f.write(data)
+                f.write(bytes(self._slot_size - len(data)))
+        _replace(tmp_path, self._path)
+
+    def _open(self):
+        self._file = open(self._path, "r+b")
+        self._mm = mmap.mmap(self._file.fileno(), self._get_file_size())
+
+    def _get_offset(self, n):
+        if not 0 <= n < self._slots:
+            raise IndexError("Snapshot slot {} does not exist.".format(n))
+        return FILE_HEADER_SIZE + n * (SLOT_HEADER_SIZE + self._slot_size)
+
+    def save(self, n, data):
+        offset = self._get_offset(n)
+        if len(data) > self._slot_size:
+            snapshots = [self.load(i) for i in range(self._slots)]
+            snapshots[n] = data
+            self.close()
+            self._slot_size = len(data)
+            self._write(snapshots)
+            self._open()
+            return
+        start = offset + SLOT_HEADER_SIZE
+        self._mm[start:start + len(data)] = data
+        struct.pack_into(SLOT_HEADER, self._mm, offset, len(data),
+            crc32(data))
+        self._mm.flush()
+
+    def _load(self, buffer, n):
+        offset = self._get_offset(n)
+        length, crc = struct.unpack_from(SLOT_HEADER, buffer, offset)
+        if not length or length > self._slot_size:
+            return None
+        start = offset + SLOT_HEADER_SIZE
+        data = bytes(buffer[start:start + length])
+        if crc32(data) != crc:
+            return None
+        return data
+
+    def load(self, n):
+        """Return the snapshot of slot ``n``. ``None`` if it is empty or
+        corrupted."""
+        return self._load(self._mm, n)
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+class SCPISnapshotLog(object):
+    """``slots`` snapshots appended to the file ``path``."""
+    def __init__(self, path, slots, max_size=64 * 1024):
+        self._path = path
+        self._slots = slots
+        self._max_size = max_size
+        # Offset of the newest record of each slot.
+        self._index = dict()
+        self._size = 0
+        try:
+            torn = self._scan()
+        except OSError:
+            open(path, "wb").close()
+            torn = False
+        self._file = open(path, "ab")
+        if torn:
+            self._compact()
+
+    def _scan(self):
+        """Build the index. Return ``True`` if the log ends with a torn
+        record."""
+        with open(self._path, "rb") as f:
+            data = f.read()
+        offset = 0
+        while offset + LOG_RECORD_SIZE <= len(data):
+            n, length, crc = struct.unpack_from(LOG_RECORD, data, offset)
+            start = offset + LOG_RECORD_SIZE
+            if start + length > len(data) \
+                    or crc32(data[start:start + length]) != crc:
+                break
+            self._index[n] = offset
+            offset = start + length
+        self._size = offset
+        return offset < len(data)
+
+    def _read(self, offset):
+        with open(self._path, "rb") as f:
+            f.seek(offset)
+            _, length, _ = struct.unpack(LOG_RECORD,
+                f.read(LOG_RECORD_SIZE))
+            return f.read(length)
+
+    def _check_slot(self, n):
+        if not 0 <= n < self._slots:
+            raise IndexError("Snapshot slot {} does not exist.".format(n))
+
+    def save(self, n, data):
+        self._check_slot(n)
+        if self._size + LOG_RECORD_SIZE + len(data) > self._max_size:
+            self._compact()
+        self._file.write(struct.pack(LOG_RECORD, n, len(data), crc32(data)))
+        self._file.write(data)
+        self._file.flush()
+        self._index[n] = self._size
+        self._size += LOG_RECORD_SIZE + len(data)
+
+    def load(self, n):
+        """Return the snapshot of slot ``n``. ``None`` if it is empty."""
+        self._check_slot(n)
+        offset = self._index.get(n)
+        if offset is None:
+            return None
+        return self._read(offset)
+
+    def _compact(self):
+        """Rewrite the log with the newest record of each slot only."""
+        snapshots = [(n, self._read(offset))
+            for n, offset in sorted(self._index.items())]
+        self._file.close()
+        tmp_path = self._path + ".tmp"
+        self._index = dict()
+        self._size = 0
+        with open(tmp_path, "wb") as f:
+            for n, data in snapshots:
+                f.write(struct.pack(LOG_RECORD, n, len(data), crc32(data)))
+                f.write(data)
+                self._index[n] = self._size
+                self._size += LOG_RECORD_SIZE + len(data)
+        _replace(tmp_path, self._path)
+        self._file = open(self._path, "ab")
+
+    def close(self):
+        self._file.close()
+
+
+def open_snapshots(path, slots, slot_size, log=None):
+    """Return a ``SCPISnapshotFile`` or, if ``mmap`` is not available or
+    ``log`` is ``True``, a ``SCPISnapshotLog``."""
+    if log is None:
+        log = mmap is None
+    if log:
+        return SCPISnapshotLog(path, slots)
+    return SCPISnapshotFile(path, slots, slot_size)
+
+
+def parse_slot(args):
+    """Return the slot number of the parameters of ``*SAV`` or ``*RCL``."""
+    try:
+        n = int(args[0])
+        if n == args[0]:
+            return n
+    except ValueError:
+        pass
+    raise errors.SCPIError(errors.ERR_ILLEGAL_PARAMETER_VALUE,
+        "Slot {!r}".format(args[0]))
+
+
+class SCPISnapshots(object):
+    """The snapshots of the settings store ``settings`` in ``slots`` slots
+    of the file ``path``. The file is opened by ``open_snapshots()`` on
+    first use. Errors are raised as ``SCPIError``."""
+    def __init__(self, settings, path, slots=10, log=None):
+        self._settings = settings
+        self._path = path
+        self._slots = slots
+        self._log = log
+        self._store = None
+
+    def _get_store(self):
+        if self._store is None:
+            self._store = open_snapshots(self._path, self._slots,
+                len(self._settings.dump()), self._log)
+        return self._store
+
+    def save(self, n):
+        """Save a snapshot of all settings into slot ``n``."""
+        try:
+            self._get_store().save(n, self._settings.dump())
+        except IndexError as e:
+            raise errors.SCPIError(errors.ERR_DATA_OUT_OF_RANGE, str(e))
+
+    def recall(self, n):
+        """Restore all settings from the snapshot in slot ``n``."""
+        try:
+            data = self._get_store().load(n)
+        except IndexError as e:
+            raise errors.SCPIError(errors.ERR_DATA_OUT_OF_RANGE, str(e))
+        if data is None:
+            raise errors.SCPIError(errors.ERR_SETTINGS_CONFLICT,
+                "Slot {} is empty".format(n))
+        try:
+            self._settings.restore(data)
+        except ValueError as e:
+            raise errors.SCPIError(errors.ERR_SETTINGS_CONFLICT, str(e))
+
+    def close(self):
+        if self._store is not None:
+            self._store.close()
+            self._store = None
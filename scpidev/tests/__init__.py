@@ -0,0 +1,11 @@
+import socket
+
+
+def find_free_port(type=socket.SOCK_STREAM):
+    """Return a port on the loopback interface which is free for sockets of
+    ``type``."""
+    sock = socket.socket(socket.AF_INET, type)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
@@ -0,0 +1,117 @@
+import unittest
+import itertools
+import socket
+from array import array
+from scpidev.device import SCPIDevice
+from scpidev.acquisition import SCPIAcquisition, SOURCE_BUS, STATE_IDLE
+from scpidev import errors
+from scpidev import utils
+from scpidev.tests import find_free_port
+
+
+def parse_block(data):
+    """Return the samples of a binary block response."""
+    n = int(data[1:2])
+    length = int(data[2:2 + n])
+    samples = array("d")
+    samples.frombytes(data[2 + n:2 + n + length])
+    return samples
+
+
+class TestSCPIAcquisition(unittest.TestCase):
+    def setUp(self):
+        self.counter = itertools.count()
+
+    def sample(self):
+        return next(self.counter)
+
+    def test_single(self):
+        acquisition = SCPIAcquisition(self.sample, size=8)
+        acquisition.count = 5
+        acquisition.initiate()
+        self.assertTrue(acquisition.wait(5))
+        self.assertEqual(acquisition.get_points(), 5)
+        self.assertEqual([list(view) for view in acquisition.fetch()],
+            [[0, 1, 2, 3, 4]])
+        self.assertEqual(acquisition.get_state(), STATE_IDLE)
+
+    def test_continuous(self):
+        acquisition = SCPIAcquisition(self.sample, size=8)
+        acquisition.count = 3
+        acquisition.continuous = True
+        acquisition.initiate()
+        with self.assertRaises(errors.SCPIError):
+            acquisition.initiate()
+        while acquisition.get_points() < 8:
+            pass
+        self.assertTrue(acquisition.abort())
+        samples = [x for view in acquisition.fetch() for x in view]
+        print(samples)
+        self.assertEqual(len(samples), 8)
+        # The newest samples from the oldest to the newest.
+        self.assertEqual(samples, list(range(int(samples[0]),
+            int(samples[0]) + 8)))
+
+    def test_bus_trigger(self):
+        acquisition = SCPIAcquisition(self.sample, size=8)
+        acquisition.count = 2
+        acquisition.trigger_source = SOURCE_BUS
+        with self.assertRaises(errors.SCPIError):
+            acquisition.trigger()
+        acquisition.initiate()
+        self.assertFalse(acquisition.wait(0.05))
+        self.assertEqual(acquisition.get_points(), 0)
+        acquisition.trigger()
+        self.assertTrue(acquisition.wait(5))
+        self.assertEqual(acquisition.get_points(), 2)
+
+
+class TestSCPIDeviceAcquisition(unittest.TestCase):
+    def setUp(self):
+        self.counter = itertools.count()
+        self.port = find_free_port()
+        self.dev = SCPIDevice()
+        self.dev.add_acquisition(lambda: next(self.counter), size=100)
+        self.dev.create_interface("tcp", ip="127.0.0.1", port=self.port)
+
+    def tearDown(self):
+        self.dev.stop()
+
+    def test_execute(self):
+        dev = self.dev
+        dev.execute("SAMP:COUN 10")
+        dev.execute("TRIG:SOUR BUS")
+        self.assertEqual(dev.execute("TRIG:SOUR?"), "BUS\n")
+        dev.execute("INIT")
+        self.assertEqual(dev.execute("DATA:POIN?"), "0\n")
+        dev.execute("*TRG")
+        self.assertTrue(dev.get_acquisition().wait(5))
+        self.assertEqual(dev.execute("DATA:POIN?"), "10\n")
+        response = dev.execute("FETC?")
+        self.assertIsInstance(response, tuple)
+        self.assertEqual(list(parse_block(utils.join_response(response))),
+            list(range(10)))
+        dev.execute("*TRG")
+        self.assertTrue(dev.get_alarm().startswith("-211,"))
+        dev.execute("ABOR")
+        self.assertIsNone(dev.get_alarm())
+
+    def test_fetch_tcp(self):
+        self.dev.execute("SAMP:COUN MAX")
+        self.dev.start()
+        client = socket.create_connection(("127.0.0.1", self.port), timeout=5)
+        client.sendall(b"INIT\n")
+        self.assertTrue(self.dev.get_acquisition().wait(5))
+        client.sendall(b"FETCh?\n")
+        expected_length = 2 + 3 + 100 * 8 + 1
+        data = b""
+        while len(data) < expected_length:
+            data += client.recv(4096)
+        client.close()
+        self.assertEqual(data[:5], b"#3800")
+        self.assertTrue(data.endswith(b"\n"))
+        self.assertEqual(list(parse_block(data)), list(range(100)))
+
+
+if __name__ == "__main__":
+    unittest.main()
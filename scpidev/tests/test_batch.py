@@ -0,0 +1,75 @@
+import unittest
+from array import array
+from scpidev.device import SCPIDevice
+
+
+class TestSCPIDeviceBatch(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+
+        def meas_volt(channels, **kwargs):
+            self.calls += 1
+            return array("d", [ch * 0.5 for ch in channels])
+
+        def meas_curr(channel, **kwargs):
+            self.calls += 1
+            return float(channel) * 0.5
+
+        self.dev = SCPIDevice()
+        self.dev.add_command("MEASure:VOLTage? <channel_list>", meas_volt,
+            batch=True)
+        self.dev.add_command("MEASure:CURRent? <channel>", meas_curr)
+
+    def test_batch(self):
+        dev = self.dev
+        self.assertEqual(dev.execute("MEAS:VOLT? (@1,3,5:7)"),
+            "0.5,1.5,2.5,3.0,3.5\n")
+        self.assertEqual(dev.execute("MEAS:VOLT? (@2)"), "1.0\n")
+        self.assertEqual(self.calls, 2)
+        dev.execute("MEAS:VOLT? 5")
+        self.assertIsNotNone(dev.get_alarm())
+        dev.execute("MEAS:VOLT? (@1!1:2)")
+        self.assertIsNotNone(dev.get_alarm())
+        self.assertEqual(self.calls, 2)
+
+    def test_multi_dimension(self):
+        self.dev.add_command("ROUTe:CLOSe <channel_list>",
+            lambda channels, **kwargs: self.closed.extend(channels),
+            batch=True)
+        self.closed = list()
+        self.dev.execute("ROUT:CLOS (@1!1:1!2,2!5)")
+        self.assertEqual(self.closed, [(1, 1), (1, 2), (2, 5)])
+
+    def test_string_parameter(self):
+        # Only arguments of channel list parameters are converted.
+        self.dev.add_command("DISPlay:TEXT <channel_list>,<string>",
+            lambda channels, text, **kwargs: self.texts.append(
+                (list(channels), text)), batch=True)
+        self.texts = list()
+        self.dev.execute("DISP:TEXT (@1:2),\"(@3)\"")
+        print(self.texts)
+        self.assertIsNone(self.dev.get_alarm())
+        self.assertEqual(self.texts, [([1, 2], "(@3)")])
+
+    def test_channel_is_numeric(self):
+        # Only <channel_list> and <ch_list> are channel lists.
+        self.assertEqual(self.dev.execute("MEAS:CURR? 3"), "1.5\n")
+        self.dev.add_command("OUTPut <channel>,<state>",
+            lambda channel, state, **kwargs: None)
+        self.dev.execute("OUTP 2,1")
+        self.assertIsNone(self.dev.get_alarm())
+
+    def test_calls(self):
+        # One call of the batch action for 16 channels instead of 16 calls.
+        dev = self.dev
+        for ch in range(1, 17):
+            dev.execute("MEAS:CURR? {}".format(ch))
+        self.assertIsNone(dev.get_alarm())
+        self.assertEqual(self.calls, 16)
+        self.calls = 0
+        self.assertEqual(dev.execute("MEAS:VOLT? (@1:16)").count(","), 15)
+        self.assertEqual(self.calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
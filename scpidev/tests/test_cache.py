@@ -0,0 +1,92 @@
+import unittest
+import time
+from scpidev.device import SCPIDevice
+from scpidev.cache import SCPIResponseCache
+
+
+class TestSCPIResponseCache(unittest.TestCase):
+    def test_max_entries(self):
+        cache = SCPIResponseCache(max_entries=2)
+        cache.set_policy("cmd", tags=("a",))
+        for i in range(3):
+            cache.put("cmd", "MEAS? {}".format(i), "{}\n".format(i))
+        self.assertIsNone(cache.get("MEAS? 0"))
+        self.assertEqual(cache.get("MEAS? 2"), "2\n")
+        cache.invalidate("a")
+        self.assertIsNone(cache.get("MEAS? 1"))
+        self.assertEqual(cache.get_summary()["entries"], 0)
+
+
+class TestSCPIDeviceCache(unittest.TestCase):
+    def setUp(self):
+        self.calls = list()
+        self.voltage = 1.
+
+        def get_voltage(*args, **kwargs):
+            self.calls.append("get")
+            return self.voltage
+
+        def set_voltage(*args, **kwargs):
+            self.voltage = float(args[0])
+
+        self.dev = SCPIDevice(metrics=True)
+        self.dev.add_command("*IDN?", lambda *args, **kwargs:
+            self.calls.append("idn") or "TEST", cache=True)
+        self.dev.add_command("VOLTage?", get_voltage, cache=True,
+            tags=("voltage",))
+        self.dev.add_command("VOLTage <value>", set_voltage,
+            tags=("voltage",))
+        self.dev.add_command("MEASure?", lambda *args, **kwargs:
+            self.calls.append("meas") or 0.5, cache=0.05)
+
+    def test_cache(self):
+        for _ in range(10):
+            self.assertEqual(self.dev.execute("*IDN?"), "TEST\n")
+        self.assertEqual(self.calls.count("idn"), 1)
+        cache = self.dev.get_cache()
+        print(cache.get_summary())
+        self.assertEqual(cache.get_hit_rate(), 0.9)
+
+    def test_invalidation(self):
+        self.assertEqual(self.dev.execute("VOLT?"), "1.0\n")
+        self.assertEqual(self.dev.execute("VOLT?"), "1.0\n")
+        self.dev.execute("VOLT 2.5")
+        self.assertEqual(self.dev.execute("VOLT?"), "2.5\n")
+        self.assertEqual(self.calls.count("get"), 2)
+        # The application changed the voltage.
+        self.voltage = 3.
+        self.dev.invalidate_cache(("voltage",))
+        self.assertEqual(self.dev.execute("VOLT?"), "3.0\n")
+        self.dev.execute("*IDN?")
+        self.dev.invalidate_cache()
+        self.dev.execute("*IDN?")
+        self.assertEqual(self.calls.count("idn"), 2)
+
+    def test_ttl(self):
+        self.dev.execute("MEAS?")
+        self.dev.execute("MEAS?")
+        self.assertEqual(self.calls.count("meas"), 1)
+        time.sleep(0.06)
+        self.dev.execute("MEAS?")
+        self.assertEqual(self.calls.count("meas"), 2)
+
+    def test_metrics(self):
+        self.dev.execute("*IDN?")
+        self.dev.execute("*IDN?")
+        text = self.dev.render_metrics()
+        print(text)
+        self.assertIn("# TYPE scpidev_cache_hits counter", text)
+        self.assertIn("scpidev_cache_hits_total 1", text)
+        self.assertIn("scpidev_cache_misses_total 1", text)
+        self.assertIn("scpidev_cache_entries 1", text)
+        # The hit is counted apart from the executions.
+        self.assertIn("scpidev_commands_total{command=\"*IDN?\","
+            "result=\"executed\"} 1", text)
+        self.assertIn("scpidev_commands_total{command=\"*IDN?\","
+            "result=\"cached\"} 1", text)
+        self.assertIn("scpidev_action_latency_seconds_count{command="
+            "\"*IDN?\"} 1", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+from scpidev.channel import SCPIChannelList, create_channel_list
+
+
+class TestSCPIChannelList(unittest.TestCase):
+    def test_one_dimension(self):
+        channels = SCPIChannelList("(@1,3,5:8)")
+        self.assertEqual(list(channels), [1, 3, 5, 6, 7, 8])
+        self.assertEqual(len(channels), 6)
+        self.assertEqual(channels.get_dimensions(), 1)
+        self.assertEqual(list(SCPIChannelList("(@4:2)")), [4, 3, 2])
+        self.assertEqual(list(channels.to_array()), [1, 3, 5, 6, 7, 8])
+        self.assertEqual(str(channels), "(@1,3,5:8)")
+
+    def test_multi_dimension(self):
+        channels = SCPIChannelList("(@1!1:1!3,2!1:3!2)")
+        self.assertEqual(list(channels), [(1, 1), (1, 2), (1, 3),
+            (2, 1), (2, 2), (3, 1), (3, 2)])
+        self.assertEqual(len(channels), 7)
+        self.assertEqual(list(channels.to_array()[:4]), [1, 1, 1, 2])
+
+    def test_invalid(self):
+        for string in ("(@1!1:2)", "(@1:)", "(@)", "1:2", "(@70000)"):
+            with self.assertRaises(ValueError):
+                SCPIChannelList(string)
+
+    def test_compact(self):
+        channels = create_channel_list("(@1:60000)")
+        self.assertIs(channels, create_channel_list("(@1:60000)"))
+        self.assertEqual(len(channels), 60000)
+        # The list is not expanded: One range per entry.
+        ranges = channels.get_ranges()
+        print("(@1:60000): {!r}".format(ranges))
+        self.assertEqual(len(ranges), 1)
+        self.assertIsInstance(ranges[0][0], range)
+        self.assertEqual(ranges[0][0], range(1, 60001))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from scpidev import codegen
+from scpidev.command import SCPICommand, SCPICommandList
+
+table_lines = [
+    "# Test command table",
+    "",
+    "meas    MEASure[:VOLTage][:DC]? [{<range>|AUTOmatic|MIN|MAX|DEF}"
+        "[,{<resolution>|MIN|MAX|DEF}]]",
+    "null    [SENSe:]VOLTage[:DC]:NULL[:STATe] {ON|OFF}",
+    "idn     *IDN?",
+]
+
+test_commands = [
+    "MEAS?", "meas:volt:dc? 10, MAX", "VOLT:NULL ON", "sens:volt:null:stat OFF",
+    "*IDN?", "*IDN", "VOLT:NULL MAX", "MEAS? AUTOm",
+]
+
+def meas(*args, **kwargs):
+    return "meas"
+
+def null(*args, **kwargs):
+    return "null"
+
+def idn(*args, **kwargs):
+    return "idn"
+
+
+class TestCodegen(unittest.TestCase):
+    def setUp(self):
+        self.command_table = codegen.read_command_table(table_lines)
+        namespace = dict()
+        exec(codegen.generate(self.command_table), namespace)
+        self.compiled_list = SCPICommandList()
+        self.compiled_list.init_compiled(
+            namespace[codegen.TABLE_NAME_DEFAULT], globals())
+        self.parsed_list = SCPICommandList()
+        for action_name, scpi_string in self.command_table:
+            self.parsed_list.append(
+                SCPICommand(scpi_string, globals()[action_name]))
+
+    def test_read_command_table(self):
+        self.assertEqual(len(self.command_table), 3)
+        self.assertEqual(self.command_table[2], ("idn", "*IDN?"))
+
+    def test_compiled_equals_parsed(self):
+        for compiled, parsed in zip(self.compiled_list, self.parsed_list):
+            self.assertEqual(str(compiled), str(parsed))
+            self.assertEqual(compiled.to_tuple(), parsed.to_tuple())
+
+    def test_match(self):
+        for cmd_string in test_commands:
+            compiled = self.compiled_list.get_command(cmd_string)
+            parsed = self.parsed_list.get_command(cmd_string)
+            print("Testing: {!r} => {}".format(cmd_string, compiled))
+            if parsed is None:
+                self.assertIsNone(compiled)
+            else:
+                self.assertEqual(compiled.execute(cmd_string),
+                    parsed.execute(cmd_string))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -70,6 +70,139 @@ class TestSCPICommand(unittest.TestCase):
             print("Testing: {} in command list == {}? ({})".format(
                 repr(cmd_string), repr(expected_result), repr(result)))
             self.assertEqual(result, expected_result)
+    def test_index_update(self):
+        command_list = self.command_list
+        self.assertIsNotNone(command_list.get_command("MEAS:VOLT?"))
+        # Replacing a command keeps the length of the list.
+        command_list[0] = SCPICommand("OUTPut?", test_function)
+        self.assertIsNotNone(command_list.get_command("OUTP?"))
+        self.assertIsNone(command_list.get_command("MEAS:VOLT?"))
+        command_list.remove(command_list[0])
+        command_list.append(SCPICommand("SYSTem:ERRor?", test_function))
+        self.assertIsNone(command_list.get_command("OUTP?"))
+        self.assertIsNotNone(command_list.get_command("SYST:ERR?"))
+        del command_list[-1]
+        self.assertIsNone(command_list.get_command("SYST:ERR?"))
+        command_list.insert(0, SCPICommand("OUTPut?", test_function))
+        self.assertIsNotNone(command_list.get_command("OUTP?"))
+        command_list.pop(0)
+        self.assertIsNone(command_list.get_command("OUTP?"))
+        command_list.clear()
+        self.assertIsNone(command_list.get_command("*IDN?"))
+        command_list += [SCPICommand("*IDN?", test_function)]
+        self.assertIsNotNone(command_list.get_command("*IDN?"))
+
+
+class TestSCPICommandLazy(unittest.TestCase):
+    def setUp(self):
+        self.command_list = SCPICommandList()
+        self.lazy_command_list = SCPICommandList()
+        for cmd_string in cmd_strings:
+            self.command_list.append(SCPICommand(cmd_string, test_function))
+            self.lazy_command_list.append(
+                SCPICommand(cmd_string, test_function, lazy=True))
+
+    def test_not_compiled(self):
+        for cmd in self.lazy_command_list:
+            self.assertFalse(cmd.is_compiled())
+        self.lazy_command_list.get_command("*IDN?")
+        compiled = [cmd.is_compiled() for cmd in self.lazy_command_list]
+        self.assertEqual(compiled, [False, False, False, True, False])
+
+    def test_get_command(self):
+        for cmd_string in test_commands_dict:
+            expected = self.command_list.get_command(cmd_string)
+            result = self.lazy_command_list.get_command(cmd_string)
+            print("Testing: {!r} => {}".format(cmd_string, result))
+            self.assertEqual(str(result), str(expected))
+        for cmd, lazy_cmd in zip(self.command_list, self.lazy_command_list):
+            self.assertEqual(cmd.to_tuple(), lazy_cmd.to_tuple())
+
+
+class TestSCPICommandStrings(unittest.TestCase):
+    def setUp(self):
+        self.args = None
+        self.command_list = SCPICommandList([
+            SCPICommand("DISPlay:TEXT <text_string>[,<row>]", self.action),
+            SCPICommand("CALCulate:EXPRession <expression>", self.action),
+        ])
+
+    def action(self, *args, **kwargs):
+        self.args = args
+        return len(args)
+
+    def test_execute(self):
+        test_commands = [
+            ("DISP:TEXT 'Hello,  world'", ("Hello,  world",)),
+            ('DISP:TEXT "Say ""Hi""", 2', ('Say "Hi"', 2.)),
+            ("DISP:TEXT 'It''s', 10 mV", ("It's", 0.01)),
+            ("CALC:EXPR (1+(2,3))", ("(1+(2,3))",)),
+            ("DISP:TEXT Hello", None),
+            ("DISP:TEXT 'open", None),
+            ("CALC:EXPR (1+2", None),
+        ]
+        for command_string, expected in test_commands:
+            self.args = None
+            cmd = self.command_list.get_command(command_string)
+            if cmd is not None:
+                cmd.execute(command_string)
+            print("Testing: {!r} => {!r}".format(command_string, self.args))
+            self.assertEqual(self.args, expected)
+
+
+class TestSCPICommandSuffix(unittest.TestCase):
+    def setUp(self):
+        self.calls = list()
+        self.command_list = SCPICommandList([
+            SCPICommand("SOURce#:VOLTage <value>", self.action),
+            SCPICommand("[SOURce#:]CURRent?", self.action),
+            SCPICommand("CALCulate<n>:DATA?", self.action),
+            SCPICommand("OUTPut#[:STATe] {ON|OFF}", self.action),
+            SCPICommand("INPut2:STATe <value>", self.action),
+            SCPICommand("[SENSe:]CH12:VOLTage?", self.action),
+        ])
+
+    def action(self, *args, **kwargs):
+        self.calls.append(args)
+
+    def test_suffix(self):
+        test_commands = [
+            ("SOUR2:VOLT 5", (2, 5.)),
+            ("SOUR:VOLT 5", (1, 5.)),
+            ("source12:volt 1", (12, 1.)),
+            ("CURR?", (1,)),
+            ("SOUR3:CURR?", (3,)),
+            ("CALC4:DATA?", (4,)),
+            ("OUTP2:STAT OFF", (2, "OFF")),
+            ("SOUR2X:VOLT 1", None),
+            ("VOLT2:SOUR 1", None),
+            # Literal digits of the mnemonics.
+            ("INP2:STAT 1", (1.,)),
+            ("INPUT2:STATE 0", (0.,)),
+            ("INP:STAT 1", None),
+            ("INP12:STAT 1", None),
+            ("SENS:CH12:VOLT?", ()),
+            ("CH12:VOLT?", ()),
+            ("CH1:VOLT?", None),
+        ]
+        for command_string, expected in test_commands:
+            self.calls = list()
+            cmd = self.command_list.get_command(command_string)
+            if cmd is not None:
+                cmd.execute(command_string)
+            result = self.calls[0] if self.calls else None
+            print("Testing: {!r} => {!r}".format(command_string, result))
+            self.assertEqual(result, expected)
+
+    def test_to_tuple(self):
+        for cmd in self.command_list:
+            compiled = SCPICommand("", self.action, compiled=cmd.to_tuple())
+            self.assertEqual(compiled.to_tuple(), cmd.to_tuple())
+        self.assertEqual(self.command_list[0].to_tuple()[2],
+            (("SOUR", "ce", False, True), ("VOLT", "age", False)))
+        self.assertEqual(self.command_list[4].to_tuple()[2],
+            (("INP", "ut2", False), ("STAT", "e", False)))
+
 
 if __name__ == "__main__":
     unittest.main()
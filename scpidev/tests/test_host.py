@@ -0,0 +1,136 @@
+import unittest
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import scpidev
+from scpidev.device import SCPIDevice
+from scpidev.host import SCPIDeviceHost
+from scpidev.watchdog import STATUS_ACTION_OVERDUE
+from scpidev.tests import find_free_port
+
+
+def recv_line(client):
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = client.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+class TestSCPIDeviceHost(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.host = SCPIDeviceHost(dispatchers=2)
+        self.ports = list()
+        for i in range(20):
+            dev = SCPIDevice(deadline=0.1)
+            dev.add_command("*IDN?", lambda *args, i=i, **kwargs:
+                "DEVICE{}".format(i))
+            dev.add_command("HANG", lambda *args, **kwargs:
+                self.release.wait() and None)
+            dev.add_command("DATA?", lambda *args, **kwargs: b"x" * 1000000)
+            port = find_free_port()
+            dev.create_interface("tcp", ip="127.0.0.1", port=port)
+            self.ports.append(port)
+            self.host.add_device(dev)
+        self.udp_port = find_free_port(socket.SOCK_DGRAM)
+        self.host.get_devices()[0].create_interface("udp", ip="127.0.0.1",
+            port=self.udp_port)
+
+    def tearDown(self):
+        self.release.set()
+        self.host.stop()
+
+    def connect(self, i):
+        return socket.create_connection(("127.0.0.1", self.ports[i]),
+            timeout=5)
+
+    def test_devices(self):
+        self.assertTrue(self.host.start())
+        # 1 I/O, 2 dispatcher and 1 watchdog thread for all devices.
+        self.assertEqual(len(self.host.get_threads()), 4)
+        # No device has process commands.
+        self.assertIsNone(self.host._process_pool)
+        clients = [self.connect(i) for i in range(len(self.ports))]
+        for client in clients:
+            client.sendall(b"*IDN?\n*IDN?\n")
+        for i, client in enumerate(clients):
+            expected = "DEVICE{0}\nDEVICE{0}\n".format(i).encode()
+            data = b""
+            while len(data) < len(expected):
+                data += client.recv(1024)
+            self.assertEqual(data, expected)
+            client.close()
+        udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        udp.settimeout(5)
+        udp.sendto(b"*IDN?\n", ("127.0.0.1", self.udp_port))
+        self.assertEqual(udp.recv(1024), b"DEVICE0\n")
+        udp.close()
+
+    def test_blocked_device(self):
+        self.host.start()
+        blocked = self.connect(0)
+        blocked.sendall(b"HANG\n*IDN?\n")
+        # The other devices are served by the second dispatcher.
+        client = self.connect(1)
+        client.sendall(b"*IDN?\n")
+        self.assertEqual(recv_line(client), b"DEVICE1\n")
+        client.close()
+        # The watchdog flags the overdue action.
+        device = self.host.get_devices()[0]
+        t_end = time.monotonic() + 5
+        while not device.get_status() & STATUS_ACTION_OVERDUE:
+            self.assertLess(time.monotonic(), t_end)
+            time.sleep(0.01)
+        self.release.set()
+        self.assertEqual(recv_line(blocked), b"DEVICE0\n")
+        blocked.close()
+
+    def test_slow_client(self):
+        self.host.start()
+        client = self.connect(2)
+        client.sendall(b"DATA?\n")
+        # The response does not fit into the socket buffers. The rest is
+        # sent by the I/O thread while the client reads.
+        time.sleep(0.1)
+        data = b""
+        while len(data) < 1000000:
+            data += client.recv(65536)
+        self.assertEqual(data, b"x" * 1000000)
+        client.close()
+
+    def test_stop(self):
+        self.host.start()
+        client = self.connect(3)
+        client.sendall(b"*IDN?\n")
+        self.assertEqual(recv_line(client), b"DEVICE3\n")
+        self.assertTrue(self.host.stop(timeout=5))
+        self.assertEqual(client.recv(1024), b"")
+        client.close()
+        # The host can be started again.
+        self.assertTrue(self.host.start())
+        client = self.connect(3)
+        client.sendall(b"*IDN?\n")
+        self.assertEqual(recv_line(client), b"DEVICE3\n")
+        client.close()
+
+
+class TestImport(unittest.TestCase):
+    def test_no_shared_memory(self):
+        # E.g. Python 3.4: Only process commands are not available.
+        code = ("import sys; sys.modules['multiprocessing.shared_memory'] = "
+            "None; import scpidev.host; "
+            "print('scpidev.process' in sys.modules)")
+        output = subprocess.check_output([sys.executable, "-c", code],
+            cwd=os.path.dirname(os.path.dirname(scpidev.__file__)))
+        print(output)
+        self.assertEqual(output.strip(), b"False")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+from scpidev import errors
+from scpidev import lexer
+from scpidev.lexer import (TOKEN_EMPTY, TOKEN_CHARACTER, TOKEN_NUMERIC,
+    TOKEN_STRING, TOKEN_EXPRESSION, TOKEN_BLOCK, TOKEN_INVALID)
+
+# {Message: (mnemonics, is_query, [(token type, text)])}
+test_messages = {
+    "*IDN?": (["*idn"], True, []),
+    " :MEAS:VOLT:DC? 10 mV, MAX ": (["meas", "volt", "dc"], True,
+        [(TOKEN_NUMERIC, "10 mV"), (TOKEN_CHARACTER, "MAX")]),
+    "MEAS? ,-1e-37 A": (["meas"], True,
+        [(TOKEN_EMPTY, ""), (TOKEN_NUMERIC, "-1e-37 A")]),
+    "MEAS? 10,": (["meas"], True,
+        [(TOKEN_NUMERIC, "10"), (TOKEN_EMPTY, "")]),
+    "DISP:TEXT 'It''s, ok',\"a\"": (["disp", "text"], False,
+        [(TOKEN_STRING, "'It''s, ok'"), (TOKEN_STRING, '"a"')]),
+    "ROUT:CLOS (@1,3:5),(1+(2,3))": (["rout", "clos"], False,
+        [(TOKEN_EXPRESSION, "(@1,3:5)"), (TOKEN_EXPRESSION, "(1+(2,3))")]),
+    "DATA #15a,b\nc, 1": (["data"], False,
+        [(TOKEN_BLOCK, b"a,b\nc"), (TOKEN_NUMERIC, "1")]),
+    "SOUR2:VOLT 1.5EXV": (["sour2", "volt"], False,
+        [(TOKEN_NUMERIC, "1.5EXV")]),
+    "": ([], False, []),
+}
+
+malformed_messages = [
+    ("MEAS?;*IDN?", errors.ERR_INVALID_CHARACTER),
+    ("MEAS? 10 20", errors.ERR_SYNTAX),
+    ("MEAS::VOLT?", errors.ERR_SYNTAX),
+    ("DISP:TEXT 'open", errors.ERR_INVALID_STRING_DATA),
+    ("CALC (1+2", errors.ERR_SYNTAX),
+    ("DATA #15abc", errors.ERR_INVALID_BLOCK_DATA),
+    ("MEAS? @", errors.ERR_INVALID_CHARACTER),
+]
+
+
+class TestLexer(unittest.TestCase):
+    def test_tokenize(self):
+        for message, expected in test_messages.items():
+            mnemonics, is_query, parameters = lexer.tokenize(message)
+            result = (mnemonics, is_query,
+                [(token[0], token[1]) for token in parameters])
+            print("Testing: {!r} => {!r}".format(message, result))
+            self.assertEqual(result, expected)
+        # bytes are tokenized without decoding the whole message.
+        self.assertEqual(lexer.tokenize(b"*RST"), (["*rst"], False, []))
+
+    def test_numeric(self):
+        for text, number, suffix in [("10", "10", ""), ("-.5e3", "-.5e3", ""),
+                ("1.5 MHZ", "1.5", "MHZ"), ("2E", "2", "E")]:
+            token = lexer.create_token(text)
+            self.assertEqual(token, (TOKEN_NUMERIC, text, number, suffix))
+
+    def test_malformed(self):
+        for message, code in malformed_messages:
+            with self.assertRaises(errors.SCPIError) as cm:
+                lexer.tokenize(message)
+            print("Testing: {!r} => {}".format(message, cm.exception))
+            self.assertEqual(cm.exception.code, code)
+
+    def test_create_token(self):
+        for text in (" MIN", "10 m V", "'a'b'", "(1)+(2)", "10,5"):
+            self.assertEqual(lexer.create_token(text)[0], TOKEN_INVALID)
+        self.assertEqual(lexer.create_token(""), lexer.EMPTY_TOKEN)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import logging
+from scpidev import log
+
+
+class RecordHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = list()
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class Unprintable(object):
+    def __repr__(self):
+        raise AssertionError("Formatted although the level is disabled.")
+
+
+class TestLog(unittest.TestCase):
+    def setUp(self):
+        self.handler = RecordHandler()
+        log.logger.addHandler(self.handler)
+        self.level = log.logger.level
+        log.logger.setLevel(logging.INFO)
+
+    def tearDown(self):
+        log.logger.removeHandler(self.handler)
+        log.logger.setLevel(self.level)
+        log.set_rate_limit(1., 5)
+
+    def test_lazy(self):
+        log.debug("Data: {!r}", Unprintable())
+        log.info("Data: {!r} {}", b"abc", 1)
+        log.info("No arguments: {}")
+        self.assertEqual(self.handler.messages,
+            ["Data: b'abc' 1", "No arguments: {}"])
+
+    def test_limited(self):
+        log.set_rate_limit(60., 2)
+        for i in range(5):
+            log.limited(log.INFO, "key", "Message {}", i)
+        log.limited(log.INFO, "other", "Other")
+        log.limited(log.DEBUG, "key", "{!r}", Unprintable())
+        print(self.handler.messages)
+        self.assertEqual(self.handler.messages,
+            ["Message 0", "Message 1", "Other"])
+
+    def test_rate_limiter(self):
+        limiter = log.RateLimiter(interval=0., burst=1)
+        self.assertEqual(limiter.check("key"), 0)
+        self.assertEqual(limiter.check("key"), 0)
+        limiter = log.RateLimiter(interval=60., burst=1)
+        self.assertEqual(limiter.check("key"), 0)
+        self.assertEqual(limiter.check("key"), None)
+        self.assertEqual(limiter.check("key"), None)
+        # Start a new interval.
+        limiter._state["key"][0] -= 60.
+        self.assertEqual(limiter.check("key"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import unittest
+import threading
+import socket
+import time
+try:
+    from urllib.request import urlopen
+except ImportError:
+    from urllib2 import urlopen
+from scpidev.metrics import SCPIHistogram, BUCKET_BOUNDS
+from scpidev.metrics import render_openmetrics
+from scpidev.interface import SCPIInterfaceMetrics
+from scpidev.session import SCPISession
+from scpidev.device import SCPIDevice
+
+
+class TestSCPIHistogram(unittest.TestCase):
+    def test_record(self):
+        hist = SCPIHistogram()
+        self.assertEqual(hist.get_percentile(50), None)
+        for value in [5, 15, 15, 150, 10 ** 9]:
+            hist.record(value)
+        self.assertEqual(hist.count, 5)
+        self.assertEqual(hist.get_percentile(20), 10)
+        self.assertEqual(hist.get_percentile(50), 20)
+        self.assertEqual(hist.get_percentile(80), 200)
+        self.assertEqual(hist.get_percentile(100), None)
+        buckets = hist.get_buckets()
+        self.assertEqual(len(buckets), len(BUCKET_BOUNDS) + 1)
+        self.assertEqual(buckets[-1], (None, 5))
+
+
+class TestSCPIDeviceMetrics(unittest.TestCase):
+    def setUp(self):
+        self.dev = SCPIDevice(metrics=True)
+        self.dev.add_command("*IDN?", lambda *args, **kwargs: "TEST")
+
+    def test_disabled(self):
+        self.assertIsNone(SCPIDevice().get_metrics())
+
+    def test_execute(self):
+        self.dev.execute("*IDN?")
+        self.dev.execute("*IDN?")
+        self.dev.execute("XYZ")
+        summary = self.dev.get_metrics().get_summary()
+        self.assertEqual(summary["commands"]["*IDN?"]["executed"], 2)
+        self.assertEqual(summary["unmatched"], 1)
+        self.assertEqual(summary["stages"]["match"]["count"], 3)
+        self.assertEqual(summary["stages"]["action"]["count"], 2)
+
+    def test_session(self):
+        session = SCPISession("interface", send=len, timed=True)
+        session.feed(b"*IDN?\n")
+        self.dev._process_session(session)
+        metrics = self.dev.get_metrics()
+        self.assertEqual(metrics.get_stage("queue").count, 1)
+        self.assertEqual(metrics.get_stage("write").count, 1)
+        stats = metrics.get_interface_stats("interface")
+        self.assertEqual(stats.messages_sent, 1)
+        self.assertEqual(stats.bytes_sent, len("TEST\n"))
+
+    def test_syst_statistics(self):
+        self.dev.execute("*IDN?")
+        result = self.dev.execute("SYST:STAT?")
+        print(result)
+        self.assertTrue(result.startswith("#"))
+        self.assertTrue("*IDN?,1,0," in result)
+
+
+class TestOpenMetrics(unittest.TestCase):
+    def setUp(self):
+        self.dev = SCPIDevice(metrics=True)
+        self.dev.add_command("*IDN?", lambda *args, **kwargs: "TEST")
+        self.dev.execute("*IDN?")
+
+    def test_render(self):
+        text = render_openmetrics(self.dev.get_metrics(),
+            [("test_gauge", "Help", [((("label", "a\"b"),), 3)])])
+        print(text)
+        self.assertTrue("test_gauge{label=\"a\\\"b\"} 3\n" in text)
+        self.assertTrue("scpidev_commands_total{command=\"*IDN?\","
+            "result=\"executed\"} 1\n" in text)
+        self.assertTrue("scpidev_action_latency_seconds_bucket{command="
+            "\"*IDN?\",le=\"+Inf\"} 1\n" in text)
+        self.assertTrue(text.endswith("# EOF\n"))
+
+    def test_http(self):
+        interface = SCPIInterfaceMetrics(self.dev.render_metrics,
+            ip="127.0.0.1", port=0)
+        interface.SELECT_TIMEOUT = 0.05
+        t = threading.Thread(target=interface.data_handler, args=(None,))
+        t.start()
+        try:
+            url = "http://{}:{}/metrics".format(*interface.get_address())
+            body = urlopen(url, timeout=5).read().decode("utf8")
+        finally:
+            interface.stop()
+            t.join()
+        self.assertTrue("scpidev_error_queue_length 0\n" in body)
+
+    def test_slow_scraper(self):
+        # The response is larger than the socket buffers. A scraper which
+        # does not read must not block the responses to other scrapers.
+        text = "x" * (8 * 1024 * 1024)
+        interface = SCPIInterfaceMetrics(lambda: text, ip="127.0.0.1",
+            port=0)
+        interface.SELECT_TIMEOUT = 0.05
+        t = threading.Thread(target=interface.data_handler, args=(None,))
+        t.start()
+        slow = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        slow.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        try:
+            slow.connect(interface.get_address())
+            slow.sendall(b"GET /metrics HTTP/1.1\r\n\r\n")
+            time.sleep(0.2)
+            url = "http://{}:{}/metrics".format(*interface.get_address())
+            t_start = time.monotonic()
+            body = urlopen(url, timeout=5).read().decode("utf8")
+            print("Fast scraper: {:.3f} s".format(time.monotonic() - t_start))
+            self.assertEqual(body, text)
+            # The slow scraper gets the complete response later.
+            time.sleep(interface.SELECT_TIMEOUT + 1)
+            slow.settimeout(5)
+            response = b""
+            while True:
+                data = slow.recv(65536)
+                if not data:
+                    break
+                response += data
+            print("Slow scraper: {} bytes".format(len(response)))
+            self.assertTrue(response.endswith(b"\r\n\r\n" + text.encode()))
+        finally:
+            slow.close()
+            interface.stop()
+            t.join()
+
+
+if __name__ == "__main__":
+    unittest.main()
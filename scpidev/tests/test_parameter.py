@@ -1,5 +1,8 @@
 import unittest
 from scpidev.parameter import SCPIParameterList, SCPIParameter
+from scpidev.device import SCPIDevice
+from scpidev import errors
+from scpidev import lexer
 
 # Define test strings.
 ps = [
@@ -34,5 +37,53 @@ class TestSCPIParameter(unittest.TestCase):
         #     print(p.match("AUTO"))
 
 
+
+class TestSCPIParameterNumeric(unittest.TestCase):
+    def setUp(self):
+        self.parameter_list = SCPIParameterList()
+        self.parameter_list.init(
+            "{<voltage:0:10:1>[V]|MINimum|MAXimum|DEFault}[,<frequency>[HZ]]")
+
+    def test_parse(self):
+        test_vectors = [
+            (["5"], [5.]),
+            (["10mV"], [0.01]),
+            (["250 MV"], [0.25]),
+            (["1", "1.5 MHZ"], [1., 1.5e6]),
+            (["1", "2 kHz"], [1., 2e3]),
+            (["MIN"], [0.]),
+            (["max"], [10.]),
+            (["DEF", ""], [1., ""]),
+            (["5", "10 V"], "error"),
+            (["11"], "error"),
+            (["INF"], "error"),
+            (["5 A"], "error"),
+            (["five"], None),
+        ]
+        for test, expected in test_vectors:
+            try:
+                result = self.parameter_list.parse(
+                    [lexer.create_token(text) for text in test])
+            except errors.SCPIError as e:
+                result = "error"
+                print("{!r} => {}".format(test, e))
+            print("Testing: {!r} => {!r}".format(test, result))
+            self.assertEqual(result, expected)
+
+    def test_device(self):
+        values = list()
+        dev = SCPIDevice()
+        dev.add_command("SOURce:VOLTage {<voltage:0:10>[V]|MINimum|MAXimum}",
+            lambda value, **kwargs: values.append(value))
+        dev.execute("SOUR:VOLT 500 mV")
+        dev.execute("SOUR:VOLT MAX")
+        self.assertEqual(values, [0.5, 10.])
+        dev.execute("SOUR:VOLT 12")
+        self.assertTrue(dev.get_alarm().startswith("-222,"))
+        dev.execute("SOUR:VOLT 1 HZ")
+        self.assertTrue(dev.get_alarm().startswith("-131,"))
+        self.assertEqual(values, [0.5, 10.])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import itertools
+import time
+from array import array
+from scpidev.device import SCPIDevice
+from scpidev.process import SCPIProcessPool
+from scpidev.worker import ActionTimeout
+from scpidev import errors
+
+
+# Actions of process commands must be defined at module level.
+def describe(*args, **kwargs):
+    return [(type(arg).__name__, getattr(arg, "format", None), len(arg))
+        for arg in args]
+
+
+def total(samples, *args, **kwargs):
+    return sum(samples)
+
+
+def scale(samples, factor, **kwargs):
+    return array("d", [x * factor for x in samples])
+
+
+def scale_bytes(samples, factor, **kwargs):
+    return scale(samples, factor).tobytes()
+
+
+def echo(data, **kwargs):
+    return data
+
+
+def fail(*args, **kwargs):
+    raise errors.SCPIError(errors.ERR_DATA_OUT_OF_RANGE, "Too large")
+
+
+def hang(*args, **kwargs):
+    time.sleep(10)
+
+
+class TestSCPIProcessPool(unittest.TestCase):
+    def setUp(self):
+        # Every buffer is passed through shared memory.
+        self.pool = SCPIProcessPool(2, threshold=0)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_buffers(self):
+        samples = array("d", range(10))
+        result = self.pool.call(describe,
+            [samples, b"abc", (memoryview(samples)[:2], samples[5:])], "")
+        print(result)
+        self.assertEqual(result,
+            [("memoryview", "d", 10), ("memoryview", "B", 3),
+            ("memoryview", "d", 7)])
+        self.assertEqual(self.pool.call(total, [samples], ""), 45)
+        result = self.pool.call(scale, [samples, 2.], "")
+        self.assertEqual(result, array("d", range(0, 20, 2)))
+        self.assertEqual(self.pool.call(echo, [b"\0" * 100000], ""),
+            b"\0" * 100000)
+
+    def test_small_buffers(self):
+        pool = SCPIProcessPool(1)
+        try:
+            self.assertEqual(pool.call(total, [array("i", [1, 2])], ""), 3)
+            self.assertEqual(pool.call(echo, [bytearray(b"ab")], ""), b"ab")
+        finally:
+            pool.shutdown()
+
+    def test_errors(self):
+        with self.assertRaises(errors.SCPIError) as cm:
+            self.pool.call(fail, [], "")
+        self.assertEqual(cm.exception.code, errors.ERR_DATA_OUT_OF_RANGE)
+        t_start = time.monotonic()
+        self.assertRaises(ActionTimeout, self.pool.call, hang, [], "", 0.2)
+        self.assertLess(time.monotonic() - t_start, 5)
+        # The hanging process was killed and is replaced.
+        self.assertEqual(self.pool.call(total, [[1, 2]], ""), 3)
+        self.assertEqual(self.pool.get_processes(), 1)
+
+
+class TestSCPIDeviceProcess(unittest.TestCase):
+    def setUp(self):
+        self.counter = itertools.count()
+        self.dev = SCPIDevice(processes=2)
+        self.dev.add_acquisition(lambda: next(self.counter), size=100000)
+        self.dev.add_command("CALCulate:SUM?", total, process=True,
+            data=self.dev.get_acquisition().fetch)
+        self.dev.add_command("CALCulate:SCALe? <factor>", scale_bytes,
+            process=True, data=self.dev.get_acquisition().fetch)
+        self.dev.add_command("CALCulate:LIMit?", fail, process=True)
+        self.dev.add_command("CALCulate:HANG?", hang, process=True,
+            timeout=0.2)
+
+    def tearDown(self):
+        self.dev.stop()
+
+    def test_execute(self):
+        dev = self.dev
+        dev.execute("INIT")
+        self.assertTrue(dev.get_acquisition().wait(5))
+        self.assertEqual(dev.execute("CALC:SUM?"),
+            "{}\n".format(float(sum(range(100000)))))
+        result = dev.execute("CALC:SCAL? 2")
+        self.assertEqual(len(result), 8 * 100000)
+        self.assertEqual(result[-8:], array("d", [2 * 99999]).tobytes())
+        dev.execute("CALC:LIM?")
+        self.assertTrue(dev.get_alarm().startswith("-222,"))
+        dev.execute("CALC:HANG?")
+        self.assertTrue(dev.get_alarm().startswith("-240,"))
+
+    def test_batch(self):
+        with self.assertRaises(ValueError):
+            self.dev.add_command("CALC:BATCh?", total, process=True,
+                batch=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import os
+import shutil
+import socket
+import tempfile
+from scpidev.device import SCPIDevice
+from scpidev.recorder import SCPIRecorder, RECORD, read_recording
+from scpidev.replay import replay_device, replay_socket, summarize
+from scpidev.tests import find_free_port
+
+
+class TestSCPIRecorder(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "recording.bin")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_record(self):
+        recorder = SCPIRecorder(self.path, 1024)
+        recorder.record(1.5, 1, "MEAS?\n", "1.0\n", 20)
+        recorder.record(2.5, 2, b"*RST\n", b"", 10)
+        recorder.close()
+        self.assertEqual(read_recording(self.path), [
+            (1.5, 1, b"MEAS?\n", b"1.0\n", 20),
+            (2.5, 2, b"*RST\n", b"", 10),
+        ])
+
+    def test_ring(self):
+        # Space for a few records only.
+        size = 5 * (RECORD.size + 10)
+        recorder = SCPIRecorder(self.path, size)
+        for i in range(100):
+            request = "MEAS{}?\n".format(i).encode("utf8")
+            recorder.record(float(i), 1, request, b"1\n", i)
+            records = recorder.records()
+            self.assertEqual(len(records), recorder.get_count())
+            # The records are the newest ones in consecutive order.
+            self.assertEqual([r[4] for r in records],
+                list(range(i - len(records) + 1, i + 1)))
+        print(recorder.records())
+        self.assertTrue(recorder.get_count() >= 3)
+        self.assertFalse(recorder.record(0., 1, b"x" * size, b"", 0))
+        recorder.close()
+        # An existing recording is continued.
+        recorder = SCPIRecorder(self.path, size)
+        n = recorder.get_count()
+        recorder.record(100., 1, b"MEAS100?\n", b"1\n", 100)
+        self.assertEqual(recorder.records()[-1][4], 100)
+        self.assertTrue(recorder.get_count() <= n + 1)
+        recorder.close()
+
+
+class TestSCPIDeviceRecording(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "recording.bin")
+        self.port = find_free_port()
+        self.dev = SCPIDevice()
+        self.dev.add_command("*IDN?", lambda *args, **kwargs: "TEST")
+        self.dev.add_command("*RST", lambda *args, **kwargs: None)
+        self.dev.create_interface("tcp", ip="127.0.0.1", port=self.port)
+
+    def tearDown(self):
+        self.dev.stop()
+        self.dev.stop_recording()
+        shutil.rmtree(self.dir)
+
+    def test_record_and_replay(self):
+        self.dev.start_recording(self.path, 4096)
+        self.dev.start()
+        client = socket.create_connection(("127.0.0.1", self.port), timeout=5)
+        client.sendall(b"*RST\n*IDN?\n")
+        self.assertEqual(client.recv(1024), b"TEST\n")
+        client.close()
+        self.dev.stop()
+        self.dev.stop_recording()
+        records = read_recording(self.path)
+        self.assertEqual([(r[2], r[3]) for r in records],
+            [(b"*RST\n", b""), (b"*IDN?\n", b"TEST\n")])
+
+        summary = summarize(replay_device(records, self.dev, speed=0))
+        print(summary)
+        self.assertEqual(summary["count"], 2)
+        self.assertEqual(summary["mismatches"], 0)
+
+        self.dev.start()
+        results = replay_socket(records, ("127.0.0.1", self.port), speed=100)
+        self.assertEqual(summarize(results)["mismatches"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
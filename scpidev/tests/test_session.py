@@ -0,0 +1,167 @@
+import unittest
+import socket
+import threading
+from scpidev.session import SCPISession
+from scpidev.device import SCPIDevice
+from scpidev import errors
+from scpidev.tests import find_free_port
+
+
+class SendMockup(object):
+    """Collects sent data. Only ``limit`` bytes are accepted per call."""
+    def __init__(self, limit=None):
+        self.data = b""
+        self.limit = limit
+
+    def __call__(self, data):
+        if self.limit is not None:
+            data = data[:self.limit]
+        self.data = self.data + data
+        return len(data)
+
+
+class TestSCPISession(unittest.TestCase):
+    def setUp(self):
+        self.send = SendMockup()
+        self.session = SCPISession(None, send=self.send)
+
+    def test_feed(self):
+        self.assertEqual(self.session.feed(b"*IDN?\nMEAS"), 1)
+        self.assertEqual(self.session.get_input(), "*IDN?\n")
+        self.assertEqual(self.session.get_input(), None)
+        self.assertEqual(self.session.feed(b"?\n\n"), 1)
+        self.assertEqual(self.session.get_input(), "MEAS?\n")
+
+    def test_clear(self):
+        self.session.feed(b"A\nB\nMEAS?")
+        self.session.clear()
+        self.assertEqual(self.session.get_input(), None)
+        self.session.feed(b"\n")
+        self.assertEqual(self.session.get_input(), None)
+
+    def test_request_response(self):
+        self.assertFalse(self.session.request_response())
+        self.session.feed(b"VOLT 1\nMEAS?\n")
+        # Only the query will respond.
+        self.assertTrue(self.session.request_response())
+        self.assertFalse(self.session.request_response())
+        self.session.get_input()
+        self.session.end_input()
+        self.assertEqual(self.session.get_input(), "MEAS?\n")
+        self.session.write("1\n")
+        self.session.end_input()
+        self.assertFalse(self.session.request_response())
+        # The response was sent before it was requested.
+        self.session.feed(b"MEAS?\n")
+        self.session.get_input()
+        self.session.write("2\n")
+        self.session.end_input()
+        self.assertTrue(self.session.request_response())
+        self.assertFalse(self.session.request_response())
+
+    def test_write_after_clear(self):
+        generation = self.session.get_generation()
+        self.session.clear()
+        self.assertFalse(self.session.write("stale\n", generation))
+        self.assertTrue(self.session.write("fresh\n"))
+        self.assertEqual(self.send.data, b"fresh\n")
+
+    def test_partial_send(self):
+        self.send.limit = 2
+        self.session.write("abcde")
+        self.assertTrue(self.session.has_pending_output())
+        self.send.limit = None
+        self.session.flush()
+        self.assertFalse(self.session.has_pending_output())
+        self.assertEqual(self.send.data, b"abcde")
+
+    def test_closed(self):
+        self.session.feed(b"A\n")
+        self.session.close()
+        self.assertEqual(self.session.get_input(), None)
+        self.assertFalse(self.session.write("x"))
+
+
+class TestSCPIDeviceSession(unittest.TestCase):
+    def setUp(self):
+        self.dev = SCPIDevice()
+        self.dev.add_command("*IDN?", lambda *args, **kwargs: "TEST")
+        self.send = SendMockup()
+        self.session = SCPISession(None, send=self.send)
+
+    def test_process_session(self):
+        self.session.feed(b"*IDN?\n")
+        self.dev._process_session(self.session)
+        self.assertEqual(self.send.data, b"TEST\n")
+
+    def test_query_interrupted(self):
+        self.send.limit = 0
+        self.session.feed(b"*IDN?\n*IDN?\n")
+        self.dev._process_session(self.session)
+        self.dev._process_session(self.session)
+        self.assertEqual(self.dev.get_alarm(),
+            errors.format_error(errors.ERR_QUERY_INTERRUPTED))
+
+    def test_device_clear(self):
+        self.session.feed(b"*IDN?\n*IDN?")
+        self.dev.device_clear(self.session)
+        self.dev._process_session(self.session)
+        self.assertEqual(self.send.data, b"")
+        # IEEE 488.2: A device clear does not report an error.
+        self.assertIsNone(self.dev.get_alarm())
+
+
+class TestSCPIDeviceClearTCP(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.port = find_free_port()
+        self.control_port = find_free_port()
+        self.dev = SCPIDevice()
+        self.dev.add_command("*IDN?", lambda *args, **kwargs: "TEST")
+        self.dev.add_command("WAIT?", lambda *args, **kwargs:
+            self.release.wait(5) and "DONE")
+        self.dev.create_interface("tcp", ip="127.0.0.1", port=self.port,
+            control_port=self.control_port)
+        self.dev.start()
+
+    def tearDown(self):
+        self.release.set()
+        self.dev.stop()
+
+    def connect(self, port):
+        return socket.create_connection(("127.0.0.1", port), timeout=5)
+
+    def test_clear_one_session(self):
+        client_a = self.connect(self.port)
+        client_b = self.connect(self.port)
+        control = self.connect(self.control_port)
+        client_a.sendall(b"WAIT?\n")
+        # Queued behind the query of client A.
+        client_b.sendall(b"*IDN?\n")
+        control.sendall("DCL {}\n".format(
+            client_a.getsockname()[1]).encode())
+        self.assertEqual(control.recv(1024), b"DCL\n")
+        control.sendall(b"DCL 1\n")
+        self.assertEqual(control.recv(1024), b"ERR\n")
+        # Client B requests its response, client A has none after the
+        # clear.
+        control.sendall("MTA {}\n".format(
+            client_b.getsockname()[1]).encode())
+        self.assertEqual(control.recv(1024), b"MTA\n")
+        control.sendall("MTA {}\n".format(
+            client_a.getsockname()[1]).encode())
+        self.assertEqual(control.recv(1024), b"-420\n")
+        self.release.set()
+        # The pending work of client B survives the clear of client A.
+        self.assertEqual(client_b.recv(1024), b"TEST\n")
+        # The response of client A was discarded.
+        client_a.settimeout(0.2)
+        self.assertRaises(socket.timeout, client_a.recv, 1024)
+        self.assertEqual(self.dev.get_alarm(),
+            errors.format_error(errors.ERR_QUERY_UNTERMINATED))
+        for sock in (client_a, client_b, control):
+            sock.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import timeit
+from scpidev.device import SCPIDevice
+from scpidev.settings import SCPISettings
+from scpidev import errors
+
+
+class TestSCPISettings(unittest.TestCase):
+    def test_store(self):
+        settings = SCPISettings()
+        volt = settings.add("VOLTage", float, (0, 10), 1.5)
+        settings.add("COUNt", int, (1, 100))
+        settings.add("OUTPut", bool)
+        self.assertEqual(settings.get("VOLTage"), 1.5)
+        self.assertEqual(settings.get("COUNt"), 1)
+        self.assertIs(settings.get("OUTPut"), False)
+        settings.set("COUNt", 42)
+        settings.reset()
+        self.assertEqual(settings.get("COUNt"), 1)
+        with self.assertRaises(errors.SCPIError):
+            volt.set(11)
+        with self.assertRaises(ValueError):
+            settings.add("CURRent", float, (0, 1), 2)
+        for type, values in settings.get_arrays():
+            print(type, values)
+            self.assertEqual(len(values), 1)
+
+
+class TestSCPIDeviceSettings(unittest.TestCase):
+    def setUp(self):
+        self.dev = SCPIDevice()
+        self.volt = self.dev.add_setting("SOURce:VOLTage", type=float,
+            range=(-10, 10), default=1)
+        self.dev.add_setting("SWEep:POINts", type=int, range=(2, 1000))
+        self.dev.add_setting("OUTPut[:STATe]", type=bool)
+
+    def test_set_query(self):
+        dev = self.dev
+        # Each command twice: matched the first time, served from the
+        # store the second time.
+        for _ in range(2):
+            self.assertEqual(dev.execute("SOUR:VOLT?"), "1.0\n")
+            dev.execute("SOURce:VOLTage 2.5")
+            self.assertEqual(dev.execute("SOUR:VOLT?"), "2.5\n")
+            dev.execute("SOUR:VOLT MAX")
+            self.assertEqual(self.volt.get(), 10.)
+            dev.execute("sour:volt def")
+            self.assertEqual(dev.execute("SOUR:VOLT? MIN"), "-10.0\n")
+            dev.execute("SWE:POIN 10.4")
+            self.assertEqual(dev.execute("SWE:POIN?"), "10\n")
+            dev.execute("OUTP ON")
+            self.assertEqual(dev.execute("OUTP?"), "1\n")
+            dev.execute("OUTP:STAT OFF")
+            self.assertEqual(dev.execute("OUTP?"), "0\n")
+            self.assertIsNone(dev.get_alarm())
+
+    def test_errors(self):
+        dev = self.dev
+        for _ in range(2):
+            dev.execute("SOUR:VOLT 1")
+            dev.execute("SOUR:VOLT 11")
+            self.assertEqual(dev.get_alarm(),
+                '-222,"Data out of range;11.0 not in [-10.0, 10.0]"')
+            dev.execute("SOUR:VOLT? 5")
+            self.assertIsNotNone(dev.get_alarm())
+            self.assertEqual(self.volt.get(), 1.)
+        # Rejected by the matched path like before the header was
+        # remembered.
+        dev.execute("SOUR:VOLT abc")
+        self.assertIn("Parameter mismatch", dev.get_alarm())
+        self.assertEqual(self.volt.get(), 1.)
+
+    def test_suffix(self):
+        dev = self.dev
+        # Matched the first time, served from the store afterwards.
+        for command_string, expected in (("SOUR:VOLT 2500 mV", 2.5),
+                ("SOUR:VOLT 2500 mV", 2.5), ("SOUR:VOLT 3 V", 3.),
+                ("SOUR:VOLT 1.5e3mV", 1.5), ("SOUR:VOLT MAX", 10.)):
+            dev.execute(command_string)
+            self.assertIsNone(dev.get_alarm())
+            self.assertEqual(self.volt.get(), expected)
+        self.assertEqual(dev.execute("SOUR:VOLT?"), "10.0\n")
+
+    def test_performance(self):
+        dev = SCPIDevice()
+        dev.add_command("SOURce:CURRent?", lambda *args, **kwargs: 1.0)
+        dev.add_setting("SOURce:VOLTage", float, (0, 10))
+        n = 10000
+        t_command = timeit.timeit(lambda: dev.execute("SOUR:CURR?"), number=n)
+        t_setting = timeit.timeit(lambda: dev.execute("SOUR:VOLT?"), number=n)
+        print("Query: command {:.2f} us, setting {:.2f} us".format(
+            t_command / n * 1e6, t_setting / n * 1e6))
+        self.assertTrue(t_setting < t_command)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import socket
+import threading
+import time
+from scpidev.device import SCPIDevice
+from scpidev.tests import find_free_port
+
+
+class TestSCPIDeviceStop(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.port = find_free_port()
+        self.dev = SCPIDevice()
+        self.dev.add_command("*IDN?", lambda *args, **kwargs: "TEST")
+        self.dev.add_command("HANG", lambda *args, **kwargs:
+            self.release.wait())
+        self.dev.create_interface("tcp", ip="127.0.0.1", port=self.port)
+        self.dev.create_interface("udp", ip="127.0.0.1",
+            port=find_free_port(socket.SOCK_DGRAM))
+        self.dev.create_interface("metrics", ip="127.0.0.1", port=0)
+
+    def tearDown(self):
+        self.release.set()
+
+    def test_restart(self):
+        t_start = time.monotonic()
+        for _ in range(10):
+            self.dev.start()
+            client = socket.create_connection(("127.0.0.1", self.port),
+                timeout=5)
+            client.sendall(b"*IDN?\n")
+            self.assertEqual(client.recv(1024), b"TEST\n")
+            self.assertTrue(self.dev.stop(timeout=5))
+            # The connection was closed by the device.
+            self.assertEqual(client.recv(1024), b"")
+            client.close()
+        duration = time.monotonic() - t_start
+        print("10 start/stop cycles: {:.3f} s".format(duration))
+        self.assertTrue(duration < 5)
+
+    def test_stop_stuck_action(self):
+        self.dev.start()
+        client = socket.create_connection(("127.0.0.1", self.port), timeout=5)
+        client.sendall(b"HANG\n*IDN?\n")
+        time.sleep(0.1)
+        t_start = time.monotonic()
+        self.assertFalse(self.dev.stop(timeout=0.2))
+        self.assertTrue(time.monotonic() - t_start < 1)
+        # The sockets are closed although the action did not finish.
+        self.assertEqual(client.recv(1024), b"")
+        client.close()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("127.0.0.1", self.port))
+        sock.close()
+
+    def test_stop_not_started(self):
+        self.assertTrue(self.dev.stop())
+
+
+if __name__ == "__main__":
+    unittest.main()
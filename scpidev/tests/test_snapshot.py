@@ -0,0 +1,166 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+from scpidev.device import SCPIDevice
+from scpidev import udevice
+from scpidev import errors
+from scpidev.snapshot import SCPISnapshotFile, SCPISnapshotLog
+
+
+class TestSCPISnapshotStores(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "state.bin")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_file(self):
+        store = SCPISnapshotFile(self.path, 3, 16)
+        store.save(1, b"abc")
+        self.assertIsNone(store.load(0))
+        self.assertEqual(store.load(1), b"abc")
+        with self.assertRaises(IndexError):
+            store.save(3, b"abc")
+        # A larger snapshot enlarges the slots.
+        store.save(0, b"x" * 17)
+        self.assertEqual(store.load(0), b"x" * 17)
+        self.assertEqual(store.load(1), b"abc")
+        store.close()
+        store = SCPISnapshotFile(self.path, 3, 16)
+        self.assertEqual(store.load(0), b"x" * 17)
+        store.close()
+        store = SCPISnapshotFile(self.path, 3, 32)
+        self.assertEqual(store.load(1), b"abc")
+        store.close()
+        # A different number of slots starts from scratch.
+        store = SCPISnapshotFile(self.path, 4, 32)
+        self.assertIsNone(store.load(1))
+        store.close()
+
+    def test_log(self):
+        store = SCPISnapshotLog(self.path, 3, max_size=100)
+        for i in range(20):
+            store.save(i % 2, "snapshot {}".format(i).encode("utf8"))
+        self.assertEqual(store.load(0), b"snapshot 18")
+        self.assertEqual(store.load(1), b"snapshot 19")
+        self.assertIsNone(store.load(2))
+        store.close()
+        print("Log size: {} B".format(os.path.getsize(self.path)))
+        self.assertTrue(os.path.getsize(self.path) <= 100)
+        # Torn write at the end of the log.
+        with open(self.path, "ab") as f:
+            f.write(b"\x00\x00\x00\x00\x10\x00\x00\x00ab")
+        store = SCPISnapshotLog(self.path, 3, max_size=100)
+        self.assertEqual(store.load(1), b"snapshot 19")
+        store.save(2, b"new")
+        store.close()
+        store = SCPISnapshotLog(self.path, 3, max_size=100)
+        self.assertEqual(store.load(2), b"new")
+        store.close()
+
+
+def create_name(i):
+    """Return a unique mnemonic without digits, e.g. ``"CHAABD"`` for 13.
+    No mnemonic is a prefix of another one."""
+    return "CH" + "".join(chr(ord("A") + int(c)) for c in "{:04d}".format(i))
+
+
+class TestSCPIDeviceSnapshots(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "state.bin")
+        self.devices = list()
+
+    def tearDown(self):
+        for dev in self.devices:
+            dev.close()
+        shutil.rmtree(self.dir)
+
+    def create_device(self, n_settings, log=None):
+        dev = SCPIDevice()
+        self.devices.append(dev)
+        for i in range(n_settings):
+            dev.add_setting(create_name(i) + ":VOLTage", float, (0, 100))
+        dev.add_setting("OUTPut", bool)
+        dev.set_snapshot_file(self.path, slots=5, log=log)
+        return dev
+
+    def test_sav_rcl(self):
+        for log in (False, True):
+            dev = self.create_device(10, log)
+            dev.execute("CHAAAD:VOLT 5")
+            dev.execute("OUTP ON")
+            dev.execute("*SAV 1")
+            dev.execute("CHAAAD:VOLT 7")
+            dev.execute("OUTP OFF")
+            self.assertIsNone(dev.get_alarm())
+            dev.execute("*RCL 1")
+            self.assertEqual(dev.execute("CHAAAD:VOLT?"), "5.0\n")
+            self.assertEqual(dev.execute("OUTP?"), "1\n")
+            dev.execute("*RCL 2")
+            self.assertTrue(dev.get_alarm().startswith("-221,"))
+            dev.execute("*SAV 5")
+            self.assertTrue(dev.get_alarm().startswith("-222,"))
+            # The snapshots persist.
+            dev = self.create_device(10, log)
+            dev.execute("*RCL 1")
+            self.assertEqual(dev.execute("CHAAAD:VOLT?"), "5.0\n")
+            # A snapshot of other settings is rejected.
+            dev = self.create_device(11, log)
+            dev.execute("*RCL 1")
+            self.assertTrue(dev.get_alarm().startswith("-221,"))
+            os.remove(self.path)
+
+    def test_add_setting(self):
+        for log in (False, True):
+            dev = self.create_device(2, log)
+            dev.execute("*SAV 0")
+            # A setting added after the file was opened.
+            dev.add_setting("CURRent", float, (0, 1), 0.5)
+            dev.execute("*SAV 1")
+            self.assertIsNone(dev.get_alarm())
+            dev.execute("CURR 0.1")
+            dev.execute("*RCL 1")
+            self.assertEqual(dev.execute("CURR?"), "0.5\n")
+            dev.execute("*RCL 0")
+            self.assertTrue(dev.get_alarm().startswith("-221,"))
+            os.remove(self.path)
+
+    def test_udevice(self):
+        dev = udevice.SCPIDevice()
+        self.devices.append(dev)
+        dev.add_setting("SOURce:VOLTage", float, (0, 10))
+        dev.set_snapshot_file(self.path, slots=2)
+        dev.execute("SOUR:VOLT 5")
+        dev.execute("*SAV 1")
+        dev.execute("SOUR:VOLT 2")
+        dev.execute("*RCL 1")
+        self.assertEqual(dev.execute("SOUR:VOLT?"), "5.0\n")
+        with self.assertRaises(errors.SCPIError):
+            dev.execute("*RCL 0")
+
+    def test_performance(self):
+        n = 2000
+        dev = self.create_device(n)
+        commands = ["{}:VOLT {}".format(create_name(i), i % 100)
+            for i in range(n)]
+        t_start = time.perf_counter()
+        for command in commands:
+            dev.execute(command)
+        t_replay = time.perf_counter() - t_start
+        dev.execute("*SAV 0")
+        dev.get_settings().reset()
+        t_start = time.perf_counter()
+        dev.execute("*RCL 0")
+        t_recall = time.perf_counter() - t_start
+        print("{} settings: replay {:.1f} ms, *RCL {:.3f} ms".format(
+            n, t_replay * 1e3, t_recall * 1e3))
+        self.assertEqual(dev.execute(create_name(n - 1) + ":VOLT?"), "99.0\n")
+        self.assertTrue(t_recall < t_replay)
+
+
+if __name__ == "__main__":
+    unittest.main()
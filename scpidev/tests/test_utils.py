@@ -20,5 +20,36 @@ class TestUtils(unittest.TestCase):
     def test_create_parameter_string(self):
         pass
 
+    def test_create_index_keys(self):
+        self.assertEqual(utils.create_index_keys("*IDN?"), ["*idn"])
+        self.assertEqual(utils.create_index_keys("MEASure[:VOLTage]?"),
+            ["meas"])
+        self.assertEqual(utils.create_index_keys("[SENSe:]VOLTage[:DC]"),
+            ["sens", "volt"])
+        self.assertEqual(utils.create_index_keys(":VOLTage:NULL {ON|OFF}"),
+            ["volt"])
+
+    def test_get_first_mnemonic(self):
+        self.assertEqual(utils.get_first_mnemonic(":VOLT:DC?"), "volt")
+        self.assertEqual(utils.get_first_mnemonic("*IDN?"), "*idn")
+        self.assertEqual(utils.get_first_mnemonic("Meas"), "meas")
+
+    def test_quoted_strings(self):
+        self.assertTrue(utils.is_quoted_string("'It''s'"))
+        self.assertTrue(utils.is_quoted_string('""'))
+        self.assertFalse(utils.is_quoted_string("'a'b'"))
+        self.assertFalse(utils.is_quoted_string("'a\""))
+        self.assertEqual(utils.unquote("'It''s'"), "It's")
+        self.assertEqual(utils.unquote('"Say ""Hi"""'), 'Say "Hi"')
+        self.assertEqual(utils.unquote("MAX"), "MAX")
+
+    def test_get_multiplier(self):
+        self.assertEqual(utils.get_multiplier("mV"), 1e-3)
+        self.assertEqual(utils.get_multiplier("MHZ", "HZ"), 1e6)
+        self.assertEqual(utils.get_multiplier("MA", "A"), 1e-3)
+        self.assertEqual(utils.get_multiplier("A"), 1.)
+        with self.assertRaises(ValueError):
+            utils.get_multiplier("mA", "V")
+
 if __name__ == "__main__":
     unittest.main()
@@ -22,7 +22,30 @@ test_vectors = [
         "match_test": [
             ("mIn", False),
         ],
-    }
+    },
+    {
+        "value_string": "{<label_string>|DEF}",
+        "expected_values_list": ["<label_string>", ("DEF", "", "")],
+        "match_test": [
+            ("'Hello, world'", True), ('"Say ""Hi"""', True), ("def", True),
+            ("Hello", False), ("'It's'", False),
+        ],
+    },
+    {
+        "value_string": "<expression>",
+        "expected_values_list": ["<expression>"],
+        "match_test": [
+            ("(1+(2*3))", True), ("(1)+(2)", False), ("1+2", False),
+        ],
+    },
+    {
+        "value_string": "<voltage>",
+        "expected_values_list": ["<voltage>"],
+        "match_test": [
+            ("10 mV", True), ("-1e-3V", True), (".5", True), ("10 m V", False),
+            ("10,5", False),
+        ],
+    },
 ]
 
 # # Define test strings.
@@ -0,0 +1,134 @@
+import unittest
+import socket
+import threading
+import time
+from scpidev.device import SCPIDevice
+from scpidev.watchdog import SCPIWatchdog
+from scpidev.watchdog import STATUS_ACTION_OVERDUE, STATUS_HANDLER_STALLED
+from scpidev.watchdog import STATUS_HANDLER_RESTARTED
+from scpidev import errors
+
+
+class InterfaceMockup(object):
+    def __init__(self, heartbeat=None, running=True):
+        self.heartbeat = heartbeat
+        self.running = running
+
+    def get_heartbeat(self):
+        return self.heartbeat
+
+    def is_running(self):
+        return self.running
+
+
+def create_dead_thread():
+    t = threading.Thread(target=lambda: None)
+    t.start()
+    t.join()
+    return t
+
+
+class DeviceMockup(SCPIDevice):
+    """A device whose handlers are set by the test."""
+    def __init__(self, *args, **kwargs):
+        SCPIDevice.__init__(self, *args, **kwargs)
+        self.handlers = list()
+        self.restarted = list()
+
+    def get_handlers(self):
+        return list(self.handlers)
+
+    def restart_interface(self, interface):
+        self.restarted.append(interface)
+        i = [h[0] for h in self.handlers].index(interface)
+        self.handlers[i] = (InterfaceMockup(time.monotonic()),
+            threading.current_thread())
+
+
+class TestSCPIWatchdog(unittest.TestCase):
+    def setUp(self):
+        self.dev = DeviceMockup(deadline=5.)
+        self.dev.add_command("MEASure?", lambda *args, **kwargs: 1)
+        self.dev.add_command("CALibrate", lambda *args, **kwargs: 1,
+            deadline=60.)
+        self.watchdog = SCPIWatchdog(self.dev, interval=1.)
+
+    def test_action_overdue(self):
+        cmd = self.dev.get_command_list().get_command("MEAS?")
+        self.dev._running_action = (cmd, time.monotonic() - 2.)
+        wait = self.watchdog.check()
+        self.assertTrue(wait <= 1.)
+        self.assertEqual(self.dev.get_status(), 0)
+        self.dev._running_action = (cmd, time.monotonic() - 10.)
+        self.watchdog.check()
+        self.watchdog.check()
+        self.assertEqual(self.dev.get_status(), STATUS_ACTION_OVERDUE)
+        alarm = self.dev.get_alarm()
+        print(alarm)
+        self.assertTrue(alarm.startswith(str(errors.ERR_HARDWARE)))
+        # Reported only once per action.
+        self.assertEqual(self.dev.get_alarm(), None)
+        self.dev._running_action = None
+        self.watchdog.check()
+        self.assertEqual(self.dev.get_status(), 0)
+
+    def test_command_deadline(self):
+        cmd = self.dev.get_command_list().get_command("CAL")
+        self.dev._running_action = (cmd, time.monotonic() - 10.)
+        self.assertEqual(self.watchdog.check(), 1.)
+        self.assertEqual(self.dev.get_status(), 0)
+
+    def test_next_check_at_deadline(self):
+        cmd = self.dev.get_command_list().get_command("MEAS?")
+        self.dev._running_action = (cmd, time.monotonic() - 4.8)
+        self.assertTrue(self.watchdog.check() < 0.3)
+
+    def test_handler_stalled(self):
+        interface = InterfaceMockup(time.monotonic() - 10.)
+        self.dev.handlers.append((interface, threading.current_thread()))
+        self.watchdog.check()
+        self.assertEqual(self.dev.get_status(), STATUS_HANDLER_STALLED)
+        self.assertTrue(self.dev.get_alarm().startswith(
+            str(errors.ERR_SYSTEM)))
+        interface.heartbeat = time.monotonic()
+        self.watchdog.check()
+        self.assertEqual(self.dev.get_status(), 0)
+
+    def test_handler_restart(self):
+        interface = InterfaceMockup(time.monotonic())
+        stopped = InterfaceMockup(time.monotonic(), running=False)
+        self.dev.handlers.append((interface, create_dead_thread()))
+        self.dev.handlers.append((stopped, create_dead_thread()))
+        self.watchdog.check()
+        self.assertEqual(self.dev.restarted, [interface])
+        self.assertEqual(self.dev.get_status(), STATUS_HANDLER_RESTARTED)
+        self.dev.clear_status(STATUS_HANDLER_RESTARTED)
+        self.watchdog.check()
+        self.assertEqual(self.dev.restarted, [interface])
+
+
+class TestSCPIDeviceRestart(unittest.TestCase):
+    def test_restart_interface(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        dev = SCPIDevice()
+        dev.add_command("*IDN?", lambda *args, **kwargs: "TEST")
+        dev.create_interface("tcp", ip="127.0.0.1", port=port)
+        dev.start()
+        try:
+            interface = dev.get_handlers()[0][0]
+            new_interface = dev.restart_interface(interface)
+            self.assertIsNot(new_interface, interface)
+            self.assertIs(dev.get_handlers()[0][0], new_interface)
+            client = socket.create_connection(("127.0.0.1", port), timeout=5)
+            client.sendall(b"*IDN?\n")
+            self.assertEqual(client.recv(1024), b"TEST\n")
+            client.close()
+        finally:
+            self.assertTrue(dev.stop(timeout=5))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+import asyncio
+import threading
+import time
+from scpidev.device import SCPIDevice
+from scpidev.worker import SCPIWorkerPool
+from scpidev import errors
+
+
+class TestSCPIWorkerPool(unittest.TestCase):
+    def test_submit(self):
+        pool = SCPIWorkerPool(max_workers=2)
+        job = pool.submit(lambda a, b=0: a + b, 1, b=2)
+        self.assertTrue(job.wait(5))
+        self.assertEqual(job.get_result(), 3)
+        job = pool.submit(lambda: 1 / 0)
+        self.assertTrue(job.wait(5))
+        self.assertRaises(ZeroDivisionError, job.get_result)
+
+    def test_abandoned_worker(self):
+        pool = SCPIWorkerPool(max_workers=2)
+        release = threading.Event()
+        stuck = pool.submit(release.wait)
+        self.assertFalse(stuck.wait(0.05))
+        # A new worker is started, because the first one is busy.
+        job = pool.submit(lambda: "OK")
+        self.assertTrue(job.wait(5))
+        self.assertEqual(job.get_result(), "OK")
+        self.assertEqual(len(pool.get_workers()), 2)
+        release.set()
+        self.assertTrue(stuck.wait(5))
+
+    def test_replace_abandoned_worker(self):
+        pool = SCPIWorkerPool(max_workers=1)
+        release = threading.Event()
+        stuck = pool.submit(release.wait)
+        self.assertFalse(stuck.wait(0.05))
+        # Queued behind the stuck job and abandoned: Never executed.
+        skipped = pool.submit(lambda: 1 / 0)
+        self.assertFalse(skipped.wait(0.05))
+        pool.abandon(skipped)
+        pool.abandon(stuck)
+        # A new worker replaces the abandoned one.
+        job = pool.submit(lambda: "OK")
+        self.assertTrue(job.wait(5))
+        self.assertEqual(job.get_result(), "OK")
+        self.assertEqual(len(pool.get_workers()), 2)
+        release.set()
+        self.assertTrue(stuck.wait(5))
+        # The abandoned worker exits.
+        time.sleep(0.1)
+        self.assertEqual(len(pool.get_workers()), 1)
+        self.assertFalse(skipped.wait(0))
+
+
+class TestSCPIDeviceTimeout(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.cancelled = threading.Event()
+        self.dev = SCPIDevice()
+        self.dev.add_command("HANG?", lambda *args, **kwargs:
+            self.release.wait(), timeout=0.05)
+        self.dev.add_command("FAST?", lambda *args, **kwargs: "FAST",
+            timeout=5)
+        self.dev.add_command("FAIL", lambda *args, **kwargs: 1 / 0,
+            timeout=5)
+        self.dev.add_command("ASYNc?", self.async_action, timeout=0.05)
+        self.dev.add_command("ASYNc:FAST?", self.async_fast)
+
+    def tearDown(self):
+        self.release.set()
+
+    async def async_action(self, *args, **kwargs):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            self.cancelled.set()
+            raise
+        return "LATE"
+
+    async def async_fast(self, *args, **kwargs):
+        await asyncio.sleep(0)
+        return "ASYNC"
+
+    def test_blocking_timeout(self):
+        t_start = time.monotonic()
+        self.assertEqual(self.dev.execute("HANG?"), None)
+        self.assertTrue(time.monotonic() - t_start < 1)
+        alarm = self.dev.get_alarm()
+        print(alarm)
+        self.assertTrue(alarm.startswith(str(errors.ERR_HARDWARE)))
+        self.assertEqual(self.dev.execute("FAST?"), "FAST\n")
+
+    def test_hanging_workers(self):
+        # More hanging actions than workers do not block the pool.
+        for _ in range(6):
+            self.dev.execute("HANG?")
+        self.assertEqual(self.dev.execute("FAST?"), "FAST\n")
+
+    def test_exception(self):
+        self.dev.execute("FAIL")
+        self.assertFalse(self.dev.get_alarm().startswith(
+            str(errors.ERR_HARDWARE)))
+
+    def test_async_cancel(self):
+        self.assertEqual(self.dev.execute("ASYN?"), None)
+        self.assertTrue(self.cancelled.is_set())
+        self.assertTrue(self.dev.get_alarm().startswith(
+            str(errors.ERR_HARDWARE)))
+
+    def test_async(self):
+        self.assertEqual(self.dev.execute("ASYN:FAST?"), "ASYNC\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
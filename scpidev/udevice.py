@@ -11,17 +11,32 @@ try:
     import utime as time
 except ImportError:
     import time
+try:
+    from micropython import const
+except ImportError:
+    def const(value):
+        return value
+
 from .command import SCPICommand, SCPICommandList
+from .settings import SCPISettings
+from .snapshot import SCPISnapshots, parse_slot
 from .uinterface import SCPIInterfaceTCP
 
 
 BUFFER_SIZE = 128
 
+# Debug output. MicroPython removes the ``if _DEBUG:`` blocks at compile time
+# if ``_DEBUG`` is ``const(0)``. Set it to ``const(1)`` for debugging.
+_DEBUG = const(0)
+
 
 class SCPIDevice():
     def __init__(self, *args, **kwargs):
         self._command_list = SCPICommandList()
         self._interface = None
+        self._settings = None
+        self._snapshots = None
+        self._lazy = kwargs.get("lazy", False)
         if "interface" in kwargs:
             self.create_interface(kwargs["interface"], *args, **kwargs)
         if "cmd_dict" in kwargs:
@@ -31,15 +46,64 @@ class SCPIDevice():
                     kwargs["cmd_dict"][cmd_string],
                 )
 
-    def add_command(self, scpi_string, action, name="", description=""):
+    def add_command(self, scpi_string, action, name="", description="",
+            lazy=None):
+        if lazy is None:
+            lazy = self._lazy
         new_cmd = SCPICommand(
             scpi_string=scpi_string,
             action=action,
             name=name,
             description=description,
+            lazy=lazy,
         )
         self._command_list.append(new_cmd)
 
+    def add_command_table(self, command_table, actions):
+        """Add the commands of a precompiled command table, which was
+        generated by ``scpidev.codegen``. The actions are looked up by name
+        in ``actions``, which is a dictionary or an object like a module.
+        No parsing of command strings is done."""
+        self._command_list.init_compiled(command_table, actions)
+
+    def add_setting(self, scpi_string, type=float, range=None, default=None,
+            description=""):
+        """Add a setting with a generated set command and query. See
+        ``scpidev.device.SCPIDevice.add_setting()``. Return the
+        ``SCPISetting``."""
+        if self._settings is None:
+            self._settings = SCPISettings()
+        setting = self._settings.add(scpi_string, type, range, default)
+        set_string, query_string = setting.get_command_strings()
+        self.add_command(set_string, setting.get_action(False),
+            description=description)
+        self.add_command(query_string, setting.get_action(True),
+            description=description)
+        return setting
+
+    def get_settings(self):
+        return self._settings
+
+    def set_snapshot_file(self, path, slots=10, log=None):
+        """Add the commands ``*SAV <n>`` and ``*RCL <n>``, which store
+        snapshots of the settings in the file ``path``. Without ``mmap``,
+        e.g. on MicroPython, the file is an append-only log. See
+        ``scpidev.snapshot``."""
+        if self._snapshots is not None:
+            self._snapshots.close()
+        else:
+            self.add_command("*SAV <value>", self._sav)
+            self.add_command("*RCL <value>", self._rcl)
+        if self._settings is None:
+            self._settings = SCPISettings()
+        self._snapshots = SCPISnapshots(self._settings, path, slots, log)
+
+    def _sav(self, *args, **kwargs):
+        self._snapshots.save(parse_slot(args))
+
+    def _rcl(self, *args, **kwargs):
+        self._snapshots.recall(parse_slot(args))
+
     def create_interface(self, type, *args, **kwargs):
         if "tcp" in type.lower():
             self._interface = SCPIInterfaceTCP(*args, **kwargs)
@@ -63,14 +127,16 @@ class SCPIDevice():
                         if not result_string.endswith("\n"):
                             result_string = result_string + "\n"
                 except Exception as exc:
-                    print(
-                        "Exception during execution of function {!r}: {}."
-                        .format(command_string, exc))
+                    if _DEBUG:
+                        print("Exception during execution of function {!r}: "
+                            "{}.".format(command_string, exc))
                     raise exc
             else:
-                print("Parameter mismatch.")
+                if _DEBUG:
+                    print("Parameter mismatch.")
         else:
-            print("No match found.")
+            if _DEBUG:
+                print("No match found.")
         return result_string
 
     def poll(self, *args, **kwargs):
@@ -88,10 +154,15 @@ class SCPIDevice():
                         try:
                             self._interface.write(str(result))
                         except Exception as exc:
-                            print("Could not send data. {}.".format(exc))
+                            if _DEBUG:
+                                print("Could not send data. {}.".format(exc))
         self._interface.close_remote()
         return (data_str_recv, result_list)
 
     def close(self):
-        print("Closing device...")
-        self._interface.close()
+        if _DEBUG:
+            print("Closing device...")
+        if self._snapshots is not None:
+            self._snapshots.close()
+        if self._interface is not None:
+            self._interface.close()
@@ -2,8 +2,8 @@
 A simple single-threaded implementation of interfaces to be used on
 MicroPython devices.
 
-TODO:
-- Measure and optimize memory footprint
+The memory footprint of commands can be measured with
+``bin/measure_memory.py``.
 """
 import gc
 try:
@@ -12,6 +12,15 @@ try:
 except ImportError:
     import usocket as socket
     import uselect as select
+try:
+    from micropython import const
+except ImportError:
+    def const(value):
+        return value
+
+# Debug output. MicroPython removes the ``if _DEBUG:`` blocks at compile time
+# if ``_DEBUG`` is ``const(0)``. Set it to ``const(1)`` for debugging.
+_DEBUG = const(0)
 
 
 BUFFER_SIZE_DEFAULT = 128
@@ -43,10 +52,12 @@ class SCPIInterfaceTCP(object):
             self.port = kwargs["port"]
         if "buffer_size" in kwargs:
             self._buffer_size = kwargs["buffer_size"]
-            print("Buffer size set to: {}".format(self._buffer_size))
+            if _DEBUG:
+                print("Buffer size set to: {}".format(self._buffer_size))
         if "timeout" in kwargs:
             self._timeout = kwargs["timeout"]
-            print("Default timeout set to: {}".format(self._timeout))
+            if _DEBUG:
+                print("Default timeout set to: {}".format(self._timeout))
         # Create the socket object
         addr_local = socket.getaddrinfo(self.host, self.port)[0][-1]
         self._sock_local = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -63,7 +74,8 @@ class SCPIInterfaceTCP(object):
         bytes_written = None
         if self._sock_remote:
             bytes_written = self._sock_remote.send(data.encode("utf8"))
-        print("Bytes written: {}".format(bytes_written))
+        if _DEBUG:
+            print("Bytes written: {}".format(bytes_written))
         return bytes_written
 
     def recv(self, buffer_size=None, timeout=-1):
@@ -75,17 +87,21 @@ class SCPIInterfaceTCP(object):
         if timeout < 0:
             timeout = self._timeout
         data_raw = None
-        print("Waiting for new connection...")
+        if _DEBUG:
+            print("Waiting for new connection...")
         self._sock_remote, addr = self._sock_local.accept()
         self._sock_remote.settimeout(timeout)
-        print("New connection: {}".format(addr))
+        if _DEBUG:
+            print("New connection: {}".format(addr))
         try:
             data_raw = self._sock_remote.recv(buffer_size)
         except OSError:
-            print("recv timeout after {} seconds.".format(timeout))
+            if _DEBUG:
+                print("recv timeout after {} seconds.".format(timeout))
             return None
         if data_raw:
-            print("New data: {!r}".format(data_raw))
+            if _DEBUG:
+                print("New data: {!r}".format(data_raw))
             return data_raw.decode("utf-8")
         return None
 
@@ -98,9 +114,11 @@ class SCPIInterfaceTCP(object):
         """
         data_raw = None
         # poller = select.poll()
-        print("Waiting for new connection (Poll)...")
+        if _DEBUG:
+            print("Waiting for new connection (Poll)...")
         self._sock_remote, addr = self._sock_local.accept()
-        print("New connection: {}".format(addr))
+        if _DEBUG:
+            print("New connection: {}".format(addr))
         data_raw = self._sock_remote.recv(buffer_size)
         # while not data_raw:
         # poller.register(self._sock_remote, select.POLLIN)
@@ -125,13 +143,15 @@ class SCPIInterfaceTCP(object):
             [], [], timeout)
         for readable in readables:
             if readable is self._sock_local:
-                print("Waiting for new connection...")
+                if _DEBUG:
+                    print("Waiting for new connection...")
                 self._sock_remote, self._remote_addr = \
                     readable.accept()
                 self._sock_remote.setblocking(0)
                 inputs.append(self._sock_remote)
-                print("TCP client connection established: {}"
-                    .format(self._remote_addr))
+                if _DEBUG:
+                    print("TCP client connection established: {}"
+                        .format(self._remote_addr))
             else:
                 data_raw = self._sock_remote.recv(buffer_size)
         return data_raw
@@ -139,7 +159,8 @@ class SCPIInterfaceTCP(object):
     def close_remote(self):
         """Close the remote connection."""
         if self._sock_remote:
-            print("Closing remote...")
+            if _DEBUG:
+                print("Closing remote...")
             self._sock_remote.close()
             self._sock_remote = None
             gc.collect()
@@ -147,7 +168,8 @@ class SCPIInterfaceTCP(object):
     def close_local(self):
         """Close the local connection."""
         if self._sock_local:
-            print("Closing local socket...")
+            if _DEBUG:
+                print("Closing local socket...")
             self._sock_local.close()
             self._sock_local = None
             gc.collect()
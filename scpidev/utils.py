@@ -11,6 +11,11 @@ try:
     import logging
 except ImportError:
     import scpidev.logging_mockup as logging
+try:
+    from sys import intern as _intern
+except ImportError:
+    # MicroPython has no ``sys.intern()``.
+    _intern = None
 
 # NR1: Integer numbers, e.g. 42
 REGEXP_STRING_NR1 = r"[\+-]?[0-9]+"
@@ -22,6 +27,9 @@ REGEXP_STRING_NR3 = REGEXP_STRING_NR2 + r"[eE][\+-]?[0-9]+"
 REGEXP_STRING_NRF = "|".join(
     [REGEXP_STRING_NR3, REGEXP_STRING_NR2, REGEXP_STRING_NR1])
 
+# Channel list, e.g. (@1,3,5:8) or (@1!1:1!8)
+REGEXP_STRING_CHANNEL_LIST = r"\(@[0-9:,!]+\)"
+
 # All non-ASCII characters
 REGEXP_NON_ASCII_STRING = r"[^\x00-\x7f]"
 # All non-ASCII printable characters (includes \n)
@@ -32,9 +40,33 @@ REGEXP_NR1 = re.compile(REGEXP_STRING_NR1)
 REGEXP_NR2 = re.compile(REGEXP_STRING_NR2)
 REGEXP_NR3 = re.compile(REGEXP_STRING_NR3)
 REGEXP_NRF = re.compile(REGEXP_STRING_NRF)
+REGEXP_CHANNEL_LIST = re.compile("^" + REGEXP_STRING_CHANNEL_LIST + "$")
 REGEXP_SANATIZE_BLACKLIST = re.compile(REGEXP_SANATIZE_BLACKLIST_STRING)
 REGEXP_NON_ASCII = re.compile(REGEXP_NON_ASCII_STRING)
 
+# SCPI-99, chapter 7.7.3. ``M`` is milli, except for ``MHZ`` and ``MOHM``.
+MULTIPLIERS = {
+    "EX": 1e18, "PE": 1e15, "T": 1e12, "G": 1e9, "MA": 1e6, "K": 1e3,
+    "M": 1e-3, "U": 1e-6, "N": 1e-9, "P": 1e-12, "F": 1e-15, "A": 1e-18,
+}
+# Units recognized in suffixes of parameters without declared unit.
+UNITS = ("V", "A", "W", "OHM", "HZ", "S", "DB", "DBM", "PCT", "DEG", "RAD",
+    "CEL", "K", "J", "FAR")
+# SCPI-99, chapter 7.2.1.5
+NUMERIC_CONSTANTS = {
+    "INF": 9.9e37, "INFINITY": 9.9e37, "NINF": -9.9e37, "NINFINITY": -9.9e37,
+    "NAN": 9.91e37,
+}
+
+_INTERNED = dict()
+
+def intern(string):
+    """Return a shared instance of ``string``. Equal mnemonics of different
+    commands will be stored only once."""
+    if _intern is not None:
+        return _intern(string)
+    return _INTERNED.setdefault(string, string)
+
 def findfirst(pattern, string, flags=0):
     """Return the first string of a regular expression match or an empty
     string if no result was found."""
@@ -49,12 +81,16 @@ def remove_non_ascii(string):
     return REGEXP_NON_ASCII.sub(r"", string)
 
 def sanitize(input, remove_all_spaces=False):
-    """Remove excessive and wrong characters as much as possible."""
+    """Remove excessive and wrong characters as much as possible. Strings
+    containing quoted parameters are only stripped, because the spaces
+    inside the quotes are part of the parameter."""
     sanitized = str(input).strip()
     # All non-printable ASCII characters are removed
     # sanitized = REGEXP_SANATIZE_BLACKLIST.sub(r"", input)
     # Spaces at the beginning of the string.
     # sanitized = re.sub(r"(^ +)", r"", sanitized)
+    if "'" in sanitized or '"' in sanitized:
+        return sanitized
     if remove_all_spaces:
         sanitized = sanitized.replace(" ", "")
     else:
@@ -64,6 +100,38 @@ def sanitize(input, remove_all_spaces=False):
         pass
     return sanitized
 
+def get_multiplier(suffix, unit=""):
+    """Return the multiplier of the ``suffix`` of a numeric parameter, e.g.
+    ``0.001`` for ``"mV"``. If ``unit`` is given, the suffix must be the
+    unit with an optional multiplier. Otherwise, it must be one of
+    ``UNITS`` with an optional multiplier. Raise a ``ValueError`` for an
+    invalid suffix."""
+    suffix = suffix.upper()
+    if unit:
+        unit = unit.upper()
+        if not suffix.endswith(unit):
+            raise ValueError("Invalid suffix {!r}".format(suffix))
+        prefix = suffix[:-len(unit)]
+        if not prefix:
+            return 1.
+        if prefix == "M" and (unit == "HZ" or unit == "OHM"):
+            return 1e6
+        multiplier = MULTIPLIERS.get(prefix)
+        if multiplier is None:
+            raise ValueError("Invalid suffix {!r}".format(suffix))
+        return multiplier
+    if suffix in UNITS:
+        return 1.
+    if suffix == "MHZ" or suffix == "MOHM":
+        return 1e6
+    for prefix in ("EX", "PE", "MA"):
+        if suffix.startswith(prefix) and suffix[2:] in UNITS:
+            return MULTIPLIERS[prefix]
+    multiplier = MULTIPLIERS.get(suffix[:1])
+    if multiplier is None or suffix[1:] not in UNITS:
+        raise ValueError("Invalid suffix {!r}".format(suffix))
+    return multiplier
+
 def create_keyword_string(command_string):
     """Creates the keyword string. The keyword string is everything before
     the first space character."""
@@ -72,11 +140,35 @@ def create_keyword_string(command_string):
 
 def create_parameter_string(command_string):
     """Create the parameter string. The parameter string is everything
-    after the first space character. All other space characters are
-    removed."""
-    parameter_string = "".join(command_string.split(" ")[1:])
+    after the first space character."""
+    parameter_string = command_string.partition(" ")[2].strip()
     return parameter_string
 
+def is_quoted_string(parameter):
+    """Return ``True`` if ``parameter`` is a complete quoted string, e.g.
+    ``'It''s'``."""
+    if len(parameter) < 2:
+        return False
+    quote = parameter[0]
+    if (quote != "'" and quote != '"') or parameter[-1] != quote:
+        return False
+    return quote not in parameter[1:-1].replace(quote + quote, "")
+
+def unquote(parameter):
+    """Return the content of the quoted string ``parameter``. Other
+    parameters are returned unchanged."""
+    if is_quoted_string(parameter):
+        quote = parameter[0]
+        return parameter[1:-1].replace(quote + quote, quote)
+    return parameter
+
+def format_array(values):
+    """Return the response of a sequence of numbers, e.g. an ``array`` or a
+    NumPy array, as comma separated values in one step."""
+    if hasattr(values, "tolist"):
+        values = values.tolist()
+    return ",".join(map(str, values)) + "\n"
+
 def create_command_tuple(command_string):
     """Create a tuple which contains the keyword and parameter strings. The
     input is sanatized first."""
@@ -85,6 +177,46 @@ def create_command_tuple(command_string):
     p = create_parameter_string(command_string)
     return (c,p)
 
+def create_index_keys(keyword_string):
+    """Return a list of index keys for the keyword string of a command
+    definition. The keys are the lower case short forms of the leading
+    keywords up to and including the first required keyword, e.g.
+    ``"[SENSe:]VOLTage[:DC]"`` results in ``["sens", "volt"]``."""
+    keys = list()
+    key = ""
+    is_optional = False
+    for c in keyword_string:
+        if c.isupper() or c == "*":
+            key = key + c
+            continue
+        if c.islower():
+            continue
+        if key:
+            keys.append(key.lower())
+            if not is_optional:
+                return keys
+            key = ""
+        if c == "[":
+            is_optional = True
+        elif c == "]":
+            is_optional = False
+        elif c == "?" or c == " ":
+            break
+    if key:
+        keys.append(key.lower())
+    return keys
+
+def get_first_mnemonic(keyword_string):
+    """Return the first mnemonic of the keyword string of a received
+    command in lower case, e.g. ``"volt"`` for ``":VOLT:DC?"``."""
+    keyword_string = keyword_string.lstrip(":")
+    end = len(keyword_string)
+    for c in ":? ":
+        i = keyword_string.find(c)
+        if 0 <= i < end:
+            end = i
+    return keyword_string[:end].lower()
+
 def create_block_data_string(string):
     """Create the required format for block data. The result is in the format:
     ``#<n><XX><string>`` where ``<XX>`` is the number of bytes following and
@@ -94,6 +226,35 @@ def create_block_data_string(string):
     """
     return "#{}{}{}".format(len(str(len(string))), len(string), string)
 
+def create_block_data(*buffers):
+    """Return the definite length block of the concatenated ``buffers``,
+    e.g. ``bytes`` or ``memoryview`` objects, followed by a newline. The
+    result is a tuple of buffers, so that the data is not copied. See
+    ``create_block_data_string()``."""
+    length = 0
+    for buffer in buffers:
+        length += memoryview(buffer).nbytes
+    header = "#{}{}".format(len(str(length)), length).encode("utf8")
+    return (header,) + buffers + (b"\n",)
+
+def join_response(response):
+    """Return a response of ``SCPIDevice.execute()``, which is a ``str``, a
+    buffer or a tuple of buffers, as ``bytes``."""
+    if isinstance(response, str):
+        return response.encode("utf8")
+    if isinstance(response, tuple):
+        return b"".join(bytes(buffer) for buffer in response)
+    return bytes(response)
+
+def get_response_length(response):
+    """Return the length of a response of ``SCPIDevice.execute()``. See
+    ``join_response()``."""
+    if isinstance(response, str):
+        return len(response)
+    if isinstance(response, tuple):
+        return sum(memoryview(buffer).nbytes for buffer in response)
+    return memoryview(response).nbytes
+
 def main_test():
     print(repr(findfirst(r"asd", "aaasasd as asd")))
     print(repr(remove_non_ascii("auo")))
@@ -3,7 +3,10 @@ try:
 except ImportError:
     import ure as re
 
+from . import errors
+from . import lexer
 from . import utils
+from .channel import create_channel_list
 
 VALTYPE_NONE = 0
 VALTYPE_NUMERIC = 1
@@ -11,6 +14,34 @@ VALTYPE_BOOLEAN = 2
 VALTYPE_DISCRETE = 3
 VALTYPE_DISCRETE_N = 4
 VALTYPE_ASCII_STRING = 5
+VALTYPE_CHANNEL_LIST = 6
+VALTYPE_EXPRESSION = 7
+VALTYPE_BLOCK = 8
+
+# Parameter names of channel lists. Other names like ``<channel>`` are
+# numeric.
+CHANNEL_LIST_NAMES = ("<channel_list>", "<ch_list>")
+
+# Returned by ``SCPIValue.parse()`` if the test string does not match.
+NO_MATCH = object()
+
+
+def _parse_limit(limit_string):
+    if limit_string:
+        return float(limit_string)
+    return None
+
+
+def _create_numeric_spec(value):
+    """Return ``(unit, minimum, maximum, default)`` of a numeric value like
+    ``<voltage:0:10:1/V>``, which is the parsed form of
+    ``<voltage:0:10:1>[V]``. Missing parts are ``None``, the unit is
+    ``""``."""
+    name, _, unit = value[1:-1].partition("/")
+    limits = name.split(":")[1:] + ["", "", ""]
+    return (unit, _parse_limit(limits[0]), _parse_limit(limits[1]),
+        _parse_limit(limits[2]))
+
 
 class SCPIValue():
     """This class represents an SCPI value.
@@ -19,20 +50,47 @@ class SCPIValue():
     ``(required_string, optional_string, numerical_string)``, e.g.
     ``"MAXimum"`` will be parsed into ``("MAX", "imum", "")``.
     Further, the type of the value is stored.
+
+    If ``compiled`` is given, it must be a tuple as returned by
+    ``to_tuple()``. The value string will not be parsed in that case.
+
+    Numeric values may declare limits, a default and a unit, e.g.
+    ``<voltage:0:10:1>[V]``. Any part may be left out, e.g.
+    ``<frequency>[HZ]`` or ``<voltage::10>``.
+
+    Values are immutable. Use ``create_value()`` to get shared instances.
     """
-    def __init__(self, value_string):
-        self._value_string = value_string
+    __slots__ = ("_type", "_value_tuple", "_numeric")
+
+    def __init__(self, value_string, compiled=None):
         self._type = VALTYPE_NONE
         self._value_tuple = None
+        self._numeric = None
+        if compiled is not None:
+            self._type, self._value_tuple = compiled
+            if self._type == VALTYPE_NUMERIC:
+                self._numeric = _create_numeric_spec(self._value_tuple)
+            return
 
         value  = utils.findfirst(r"^<.+>$", value_string)
         if value:
             if "string" in value_string:
+                # Quoted string, e.g. 'Hello' or "Say ""Hello""".
                 # Todo: find a better way to define ASCII_STRING type
                 self._type = VALTYPE_ASCII_STRING
+            elif "expression" in value_string:
+                # Expression data, e.g. (1+2)
+                self._type = VALTYPE_EXPRESSION
+            elif "block" in value_string:
+                # Arbitrary block data, e.g. #15hello
+                self._type = VALTYPE_BLOCK
+            elif value.lower() in CHANNEL_LIST_NAMES:
+                # Channel list, e.g. (@1,3,5:8)
+                self._type = VALTYPE_CHANNEL_LIST
             else:
                 self._type = VALTYPE_NUMERIC
-            self._value_tuple = value
+                self._numeric = _create_numeric_spec(value)
+            self._value_tuple = utils.intern(value)
         elif value_string:
             self._type = VALTYPE_DISCRETE
             req_string = utils.findfirst(r"[A-Z0-9]+", value_string)
@@ -45,7 +103,8 @@ class SCPIValue():
                 self._type = VALTYPE_BOOLEAN
             if num_string:
                 self._type = VALTYPE_DISCRETE_N
-            self._value_tuple = (req_string, opt_string, num_string)
+            self._value_tuple = (utils.intern(req_string),
+                utils.intern(opt_string), num_string)
 
     def __repr__(self):
         return ("<{!r}:{}>".format(self._value_tuple, self._type))
@@ -53,6 +112,10 @@ class SCPIValue():
     def __str__(self):
         return str(self._value_tuple)
 
+    def to_tuple(self):
+        """Return the compiled representation ``(type, value_tuple)``."""
+        return (self._type, self._value_tuple)
+
     def get_type(self):
         """Return the type of the value."""
         return self._type
@@ -61,32 +124,113 @@ class SCPIValue():
         """Return the value tuple."""
         return self._value_tuple
 
+    def get_numeric_spec(self):
+        """Return ``(unit, minimum, maximum, default)`` of a numeric value.
+        ``None`` for other types."""
+        return self._numeric
+
     def match(self, test_string):
         """Test if ``test_string`` matches the SCPIValue. Returns ``True`` for
         a match. ``False`` otherwise. A ``ValueError`` is raised if an
+        unsupported type is used. Limits and suffixes of numeric values are
+        not checked, see ``parse()``."""
+        try:
+            return self.parse(lexer.create_token(test_string)) is not NO_MATCH
+        except errors.SCPIError:
+            return True
+
+    def parse(self, token):
+        """Return the value of the parameter ``token`` as returned by
+        ``lexer.tokenize()`` or ``NO_MATCH``. Numeric values are returned as
+        ``float`` scaled by the multiplier of their suffix, quoted strings
+        without quotes, block data as ``bytes`` and all other values as
+        received.
+
+        Raise a ``SCPIError`` if a numeric value has an invalid suffix or
+        is out of the declared limits. A ``ValueError`` is raised if an
         unsupported type is used."""
-        test_string = test_string.lower()
+        token_type, text, number, suffix = token
         type = self._type
         if type == VALTYPE_NUMERIC:
-            if utils.REGEXP_NRF.match(test_string):
-                return True
-        elif type == VALTYPE_BOOLEAN:
-            if (test_string == "ON"
-                    or test_string == "OFF"
-                    or test_string == "1"
-                    or test_string == "0"):
-                return True
-        elif type == VALTYPE_DISCRETE or type == VALTYPE_DISCRETE_N:
+            if token_type == lexer.TOKEN_NUMERIC:
+                value = float(number)
+                if suffix:
+                    try:
+                        value = value * utils.get_multiplier(suffix,
+                            self._numeric[0])
+                    except ValueError:
+                        raise errors.SCPIError(errors.ERR_INVALID_SUFFIX, text)
+            elif token_type == lexer.TOKEN_CHARACTER:
+                value = utils.NUMERIC_CONSTANTS.get(text.upper())
+                if value is None:
+                    return NO_MATCH
+            else:
+                return NO_MATCH
+            _, minimum, maximum, _ = self._numeric
+            if (minimum is not None and value < minimum) \
+                    or (maximum is not None and value > maximum):
+                raise errors.SCPIError(errors.ERR_DATA_OUT_OF_RANGE,
+                    "{} not in [{}, {}]".format(text, minimum, maximum))
+            return value
+        if type == VALTYPE_ASCII_STRING:
+            if token_type == lexer.TOKEN_STRING:
+                return utils.unquote(text)
+            return NO_MATCH
+        if type == VALTYPE_CHANNEL_LIST:
+            if token_type == lexer.TOKEN_EXPRESSION \
+                    and utils.REGEXP_CHANNEL_LIST.match(text):
+                # The parsed list is cached for the action.
+                try:
+                    create_channel_list(text)
+                    return text
+                except ValueError:
+                    pass
+            return NO_MATCH
+        if type == VALTYPE_EXPRESSION:
+            if token_type == lexer.TOKEN_EXPRESSION:
+                return text
+            return NO_MATCH
+        if type == VALTYPE_BLOCK:
+            if token_type == lexer.TOKEN_BLOCK:
+                return text
+            return NO_MATCH
+        if type != VALTYPE_BOOLEAN and type != VALTYPE_DISCRETE \
+                and type != VALTYPE_DISCRETE_N:
+            raise ValueError("Unknown SCPIValue type.")
+        if token_type != lexer.TOKEN_CHARACTER \
+                and token_type != lexer.TOKEN_NUMERIC:
+            return NO_MATCH
+        lower_string = text.lower()
+        if type == VALTYPE_BOOLEAN:
+            if (lower_string == "on"
+                    or lower_string == "off"
+                    or lower_string == "1"
+                    or lower_string == "0"):
+                return text
+        else:
             req_string = self._value_tuple[0].lower()
             opt_string = req_string + self._value_tuple[1].lower()
-            if test_string.startswith(req_string):
-                if opt_string.startswith(test_string):
-                    return True
-        elif type == VALTYPE_ASCII_STRING:
-            raise NotImplementedError("ASCII_STRING values not yet supported")
-        else:
-            raise ValueError("Unknown SCPIValue type.")
-        return False
+            if lower_string.startswith(req_string):
+                if opt_string.startswith(lower_string):
+                    return text
+        return NO_MATCH
+
+
+# Equal values of different parameters share the same instance.
+_VALUE_CACHE = dict()
+
+def create_value(value_string="", compiled=None):
+    """Return a shared ``SCPIValue`` instance for ``value_string`` or the
+    ``compiled`` value tuple."""
+    if compiled is not None:
+        key = compiled
+    else:
+        key = value_string
+    value = _VALUE_CACHE.get(key)
+    if value is None:
+        value = SCPIValue(value_string, compiled)
+        _VALUE_CACHE[key] = value
+    return value
 
 
 class SCPIValueList(list):
@@ -96,6 +240,7 @@ class SCPIValueList(list):
     use ``"MAX" in value_list`` where ``value_list`` is an instance of an
     SCPIValueList.
     """
+    __slots__ = ()
 
     # def __init__(self, values_string):
     #     """Create a SCPIValueList from ``values_string``. ``values_string``
@@ -106,9 +251,19 @@ class SCPIValueList(list):
         inner = re.findall(r"{(.+)}", values_string)
         if inner:
             for val in inner[0].split("|"):
-                self.append(SCPIValue(val))
+                self.append(create_value(val))
         else:
-            self.append(SCPIValue(values_string))
+            self.append(create_value(values_string))
+
+    def init_compiled(self, compiled_values):
+        """Initialize from a tuple of compiled values as returned by
+        ``to_tuple()``."""
+        for compiled in compiled_values:
+            self.append(create_value(compiled=compiled))
+
+    def to_tuple(self):
+        """Return the compiled representation of all values."""
+        return tuple(value.to_tuple() for value in self)
 
     def __repr__(self):
         ret = "["
@@ -0,0 +1,114 @@
+"""
+The watchdog supervises the threads of a ``SCPIDevice``:
+
+- The action which is currently executed is flagged if it runs longer than
+  its deadline (see ``SCPIDevice.add_command(deadline=...)``).
+- An interface whose data handler loop did not report a heartbeat within
+  ``heartbeat_timeout`` seconds is flagged as stalled.
+- An interface whose data handler thread has died is replaced by a new
+  instance with fresh sockets.
+
+Every finding is logged, pushed into the error queue of the device and
+reflected in the status bits of the device (``SCPIDevice.get_status()``).
+"""
+import time
+
+from . import errors
+from . import log
+
+# Status bits. ``STATUS_ACTION_OVERDUE`` and ``STATUS_HANDLER_STALLED`` are
+# conditions, which are cleared by the watchdog when the condition is gone.
+# ``STATUS_HANDLER_RESTARTED`` is an event, which must be cleared by the
+# application.
+STATUS_ACTION_OVERDUE = 0x01
+STATUS_HANDLER_STALLED = 0x02
+STATUS_HANDLER_RESTARTED = 0x04
+
+
+class SCPIWatchdog(object):
+    """Checks the device every ``interval`` seconds. If an action with a
+    deadline is running, the next check is scheduled at its deadline, so
+    overdue actions are flagged in time even with a long ``interval``.
+
+    ``heartbeat_timeout`` must be longer than the select timeout of the
+    interfaces. ``None`` disables the check."""
+    def __init__(self, device, interval=1., heartbeat_timeout=5.,
+            restart=True):
+        self._device = device
+        self._interval = interval
+        self._heartbeat_timeout = heartbeat_timeout
+        self._restart = restart
+        self._overdue = None
+        self._stalled = set()
+
+    def check(self):
+        """Check the device once. Return the time in seconds until the next
+        check is due."""
+        now = time.monotonic()
+        wait = self._check_action(now)
+        self._check_handlers(now)
+        return min(wait, self._interval)
+
+    def _check_action(self, now):
+        device = self._device
+        running = device.get_running_action()
+        deadline = None
+        if running is not None:
+            deadline = device.get_deadline(running[0])
+        if self._overdue is not None and self._overdue is not running:
+            # The overdue action has finished.
+            self._overdue = None
+            device.clear_status(STATUS_ACTION_OVERDUE)
+        if deadline is None:
+            return self._interval
+        cmd, t_start = running
+        remaining = t_start + deadline - now
+        if remaining > 0:
+            return remaining
+        if self._overdue is not running:
+            self._overdue = running
+            device.set_status(STATUS_ACTION_OVERDUE)
+            info = "Action of {!r} exceeded its deadline of {} s".format(
+                cmd.get_name(), deadline)
+            log.warning("Watchdog: {}.", info)
+            device.push_error(errors.ERR_HARDWARE, info)
+        return self._interval
+
+    def _check_handlers(self, now):
+        device = self._device
+        for interface, thread in device.get_handlers():
+            if not thread.is_alive():
+                self._stalled.discard(interface)
+                # A data handler which was stopped on purpose is not
+                # running anymore.
+                if not self._restart or not interface.is_running():
+                    continue
+                log.warning("Watchdog: Data handler of {} has died. "
+                    "Restarting.", interface)
+                try:
+                    device.restart_interface(interface)
+                except Exception as e:
+                    log.error("Watchdog: Could not restart {}: {}",
+                        interface, e)
+                    continue
+                device.set_status(STATUS_HANDLER_RESTARTED)
+                device.push_error(errors.ERR_SYSTEM,
+                    "Data handler of {} restarted".format(interface))
+                continue
+            heartbeat = interface.get_heartbeat()
+            if (self._heartbeat_timeout is None or heartbeat is None
+                    or now - heartbeat <= self._heartbeat_timeout):
+                self._stalled.discard(interface)
+                continue
+            if interface not in self._stalled:
+                self._stalled.add(interface)
+                info = "Data handler of {} stalled".format(interface)
+                log.warning("Watchdog: {}.", info)
+                device.push_error(errors.ERR_SYSTEM, info)
+        # Interfaces which were replaced are dropped from the stalled set.
+        interfaces = set(interface for interface, _ in device.get_handlers())
+        self._stalled &= interfaces
+        if self._stalled:
+            device.set_status(STATUS_HANDLER_STALLED)
+        else:
+            device.clear_status(STATUS_HANDLER_STALLED)
@@ -0,0 +1,211 @@
+"""
+Execution of actions outside of the dispatch thread.
+
+Blocking actions with a timeout are offloaded to a ``SCPIWorkerPool``. The
+dispatch thread waits at most until the timeout has elapsed. A worker whose
+action does not return is abandoned. It exits when the action returns and
+does not count against ``max_workers`` anymore. The pool starts a new worker
+for the next job if no worker is idle, up to ``max_workers``. The workers
+are daemon threads, so abandoned workers do not prevent the process from
+exiting.
+
+Actions which return a coroutine are run on an event loop of the calling
+thread. On timeout the coroutine is cancelled, i.e. ``CancelledError`` is
+raised at its current ``await``.
+"""
+import threading
+import time
+try:
+    import asyncio
+except ImportError:
+    try:
+        import uasyncio as asyncio
+    except ImportError:
+        asyncio = None
+try:
+    from queue import Queue
+except ImportError:
+    # Python2 compatibility
+    from Queue import Queue
+
+
+# States of a job. They are changed with the lock of the pool.
+JOB_QUEUED = 0
+JOB_RUNNING = 1
+JOB_DONE = 2
+JOB_ABANDONED = 3
+
+
+class SCPIJob(object):
+    """A function call which is executed by a worker."""
+    __slots__ = ("_fn", "_args", "_kwargs", "_done", "_result", "_exception",
+        "_state", "_queue")
+
+    def __init__(self, fn, args, kwargs):
+        self._fn = fn
+        self._args = args
+        self._kwargs = kwargs
+        self._done = threading.Event()
+        self._result = None
+        self._exception = None
+        self._state = JOB_QUEUED
+        # The queue of the pool when the job was submitted.
+        self._queue = None
+
+    def run(self):
+        try:
+            self._result = self._fn(*self._args, **self._kwargs)
+        except Exception as e:
+            self._exception = e
+        finally:
+            self._done.set()
+
+    def wait(self, timeout=None):
+        """Wait until the job is done. Return ``False`` if the ``timeout``
+        elapsed before."""
+        return self._done.wait(timeout)
+
+    def get_result(self):
+        """Return the result of the function. Exceptions of the function are
+        raised."""
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+
+class SCPIWorkerPool(object):
+    def __init__(self, max_workers=4, name="SCPIWorker"):
+        self._max_workers = max_workers
+        self._name = name
+        self._queue = Queue()
+        self._workers = list()
+        # Number of workers which count against ``max_workers``, i.e. all
+        # workers which were not abandoned.
+        self._count = 0
+        self._idle = 0
+        self._lock = threading.Lock()
+
+    def get_workers(self):
+        """Return the list of worker threads which are alive."""
+        return [t for t in self._workers if t.is_alive()]
+
+    def submit(self, fn, *args, **kwargs):
+        """Execute ``fn(*args, **kwargs)`` in a worker. Return a
+        ``SCPIJob``."""
+        job = SCPIJob(fn, args, kwargs)
+        with self._lock:
+            job._queue = self._queue
+            if not self._idle:
+                self._workers = self.get_workers()
+                if self._count < self._max_workers:
+                    t = threading.Thread(target=self._work,
+                        args=(self._queue,), name="{}-{}".format(
+                            self._name, len(self._workers)))
+                    t.daemon = True
+                    self._workers.append(t)
+                    self._count += 1
+                    self._idle += 1
+                    t.start()
+            queue = self._queue
+        queue.put(job)
+        return job
+
+    def abandon(self, job):
+        """Give up waiting for ``job``. A queued job is not executed. The
+        worker of a running job is replaced by a new worker if needed. It
+        exits when the job returns."""
+        with self._lock:
+            if job._state == JOB_RUNNING and job._queue is self._queue:
+                self._count -= 1
+            if job._state != JOB_DONE:
+                job._state = JOB_ABANDONED
+
+    def shutdown(self):
+        """Let all workers exit after the jobs which were already submitted.
+        Abandoned workers exit when their job returns. The pool can be used
+        again afterwards."""
+        with self._lock:
+            queue = self._queue
+            workers = self.get_workers()
+            self._queue = Queue()
+            self._workers = list()
+            self._count = 0
+            self._idle = 0
+        for _ in workers:
+            queue.put(None)
+
+    def _work(self, queue):
+        # Workers of a pool which was shut down do not touch the idle count
+        # anymore.
+        while True:
+            job = queue.get()
+            with self._lock:
+                if queue is self._queue:
+                    self._idle -= 1
+                if job is not None and job._state == JOB_QUEUED:
+                    job._state = JOB_RUNNING
+            if job is None:
+                break
+            if job._state == JOB_RUNNING:
+                job.run()
+            with self._lock:
+                if job._state == JOB_RUNNING:
+                    job._state = JOB_DONE
+                elif job._state == JOB_ABANDONED and job._done.is_set():
+                    # Abandoned while running, a new worker replaced this
+                    # one.
+                    break
+                if queue is self._queue:
+                    self._idle += 1
+
+
+class ActionTimeout(Exception):
+    """Raised if an action did not finish within its timeout."""
+
+
+_local = threading.local()
+
+
+def run_coroutine(coro, timeout=None):
+    """Run ``coro`` on the event loop of the calling thread and return its
+    result. If ``timeout`` is given, the coroutine is cancelled when the
+    timeout elapsed and ``ActionTimeout`` is raised."""
+    loop = getattr(_local, "loop", None)
+    if loop is None:
+        loop = asyncio.new_event_loop()
+        _local.loop = loop
+    if timeout is None:
+        return loop.run_until_complete(coro)
+    try:
+        return loop.run_until_complete(asyncio.wait_for(coro, timeout))
+    except asyncio.TimeoutError:
+        raise ActionTimeout()
+
+
+def is_coroutine(obj):
+    return asyncio is not None and asyncio.iscoroutine(obj)
+
+
+def call(pool, cmd, command_string, timeout=None, args=None):
+    """Execute the action of ``cmd`` with the already parsed ``args`` and
+    return the result. If ``timeout`` is given, a blocking action is
+    executed by a worker of ``pool`` and ``ActionTimeout`` is raised if it
+    did not return in time. Coroutines are run in the calling thread and
+    cancelled on timeout."""
+    if timeout is None:
+        result = cmd.execute(command_string, args)
+        if is_coroutine(result):
+            result = run_coroutine(result)
+        return result
+    if asyncio is not None and asyncio.iscoroutinefunction(cmd.get_action()):
+        return run_coroutine(cmd.execute(command_string, args),
+            timeout)
+    t_end = time.monotonic() + timeout
+    job = pool.submit(cmd.execute, command_string, args)
+    if not job.wait(timeout):
+        pool.abandon(job)
+        raise ActionTimeout()
+    result = job.get_result()
+    if is_coroutine(result):
+        result = run_coroutine(result, max(t_end - time.monotonic(), 0.))
+    return result